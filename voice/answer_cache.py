@@ -0,0 +1,201 @@
+"""
+Answer Cache - Exact + semantic cache in front of the RAG chain
+
+Two tiers:
+    exact     normalized question text ("Store hours?" == "store hours")
+    semantic  a cached question whose embedding is close enough (cosine)
+
+Entries expire after a TTL, the least recently used ones are evicted when
+the cache is full (entries or bytes), and everything is dropped when the
+knowledge base changes (a new index generation).
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation, collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+@dataclass
+class CacheEntry:
+    value: dict         # {"answer": ..., "sources": [...]}
+    slot: int           # row in the vector matrix
+    created: float      # time.monotonic() when stored
+    size: int           # approximate bytes held by this entry
+
+
+class AnswerCache:
+    """
+    LRU + TTL answer cache with an embedding-similarity tier
+
+    Usage:
+        cache = AnswerCache(max_entries=1000, ttl_seconds=3600, similarity_threshold=0.95)
+        hit = cache.get_exact(query, generation)
+        hit = hit or cache.get_similar(query_vector, generation)
+        ...
+        cache.put(query, query_vector, {"answer": answer}, generation)
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: float = 3600, similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        self._entries = OrderedDict()    # normalized query -> CacheEntry (LRU order)
+        self._vectors = None             # (max_entries, dim) unit vectors, made on first put
+        self._slot_keys = [None] * max_entries
+        self._used = np.zeros(max_entries, dtype=bool)
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._bytes = 0
+        self._generation = None
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    # ----- lookups -----
+
+    def get_exact(self, query: str, generation: int):
+        """Cached value for the same (normalized) question, or None"""
+        key = normalize_query(query)
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is None or self._expire_if_old(key, entry):
+                return None
+            self._entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            return entry.value
+
+    def get_similar(self, vector, generation: int):
+        """
+        Cached value for the most similar question above the threshold, or None
+
+        Call after get_exact() missed; a None here counts as a cache miss.
+        """
+        with self._lock:
+            self._check_generation(generation)
+            if not self._entries:
+                self.stats["misses"] += 1
+                return None
+
+            # Free slots hold stale rows, never let them win
+            scores = np.where(self._used, self._vectors @ _unit(vector), -1.0)
+
+            while True:
+                slot = int(np.argmax(scores))
+                if scores[slot] < self.similarity_threshold:
+                    self.stats["misses"] += 1
+                    return None
+
+                key = self._slot_keys[slot]
+                entry = self._entries[key]
+                if not self._expire_if_old(key, entry):
+                    self._entries.move_to_end(key)
+                    self.stats["semantic_hits"] += 1
+                    return entry.value
+                scores[slot] = -1.0
+
+    # ----- updates -----
+
+    def put(self, query: str, vector, value: dict, generation: int):
+        """
+        Store an answer (ignored if the knowledge base changed meanwhile)
+
+        Args:
+            query: Question as asked
+            vector: Query embedding
+            value: {"answer": ..., "sources": [...]}
+            generation: Index generation the answer was produced from
+        """
+        key = normalize_query(query)
+        vector = _unit(vector)
+        size = len(key) + len(value.get("answer", "")) + vector.nbytes
+
+        with self._lock:
+            # Answer was produced from an index that has changed since
+            if self._generation is not None and generation < self._generation:
+                return
+            self._check_generation(generation)
+
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and (not self._free_slots or self._bytes + size > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+            if not self._free_slots:
+                return
+
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._slot_keys[slot] = key
+            self._used[slot] = True
+            self._entries[key] = CacheEntry(value=value, slot=slot, created=time.monotonic(), size=size)
+            self._bytes += size
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    # ----- internals (call with the lock held) -----
+
+    def _check_generation(self, generation: int):
+        """New knowledge base generation -> every cached answer may be wrong"""
+        if generation == self._generation:
+            return
+        if self._entries:
+            self.stats["invalidations"] += 1
+        for key in list(self._entries):
+            self._remove(key)
+        self._generation = generation
+
+    def _expire_if_old(self, key: str, entry: CacheEntry) -> bool:
+        if time.monotonic() - entry.created <= self.ttl_seconds:
+            return False
+        self._remove(key)
+        self.stats["expirations"] += 1
+        return True
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._slot_keys[entry.slot] = None
+        self._used[entry.slot] = False
+        self._free_slots.append(entry.slot)
+        self._bytes -= entry.size
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -5,38 +5,73 @@ Endpoints to interact with the voice assistant via HTTP requests
 
 # ===== IMPORTS =====
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from typing import List
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
 # FileResponse - to send audio files back to the client
-from fastapi.responses import FileResponse
+# StreamingResponse - to send the answer piece by piece (Server-Sent Events)
+from fastapi.responses import FileResponse, StreamingResponse, Response
+# MultiPartParser - decides when uploads spill from memory to a temp file
+from starlette.formparsers import MultiPartParser
 from pydantic import BaseModel
 
-# tempfile - to create temporary files for audio processing
-import tempfile
 import os
+import json
 
 # Import our existing voice assistant functions
 from voice_assistant import (
-    initialize_rag,      # Sets up the RAG pipeline
-    get_response,        # Gets answer from RAG
-    text_to_speech,      # Converts text to audio
-    transcribe_file      # Converts audio to text
+    warm_up,             # Loads the WARMUP backends (RAG by default) at startup
+    aget_response,       # Gets answer from RAG (async)
+    astream_response,    # Streams sources + answer tokens from RAG
+    astream_speech_response,  # Streams answer audio sentence by sentence
+    get_index_stats,     # Vector index cache hit/miss counts
+    get_cache_stats,     # Answer cache hit rates
+    get_rerank_stats,    # Reranker pair cache + adaptive initial_k
+    get_embedding_stats, # Question embedding cache + batch sizes
+    ingest_files,        # Adds/updates knowledge files in the live index
+    remove_files,        # Removes knowledge files from the live index
+    KNOWLEDGE_DIR,       # Where uploaded knowledge files are stored
+    SHARED_INDEX_DIR,    # Set = read-only shared index (built by build_index.py)
+    audio_retention,     # Size/age limits for audio_responses/
+    atext_to_speech,     # Converts text to audio (on the TTS thread pool)
+    asynthesize_speech,  # Converts text to audio bytes, no file written
+    SAVE_AUDIO_RESPONSES,  # Whether answers are also saved to audio_responses/
+    atranscribe_file     # Converts audio to text (on the STT thread pool)
 )
+from tts import get_tts_backend, get_tts_cache_stats
+from stt import get_stt_stats
+from voice_session import VoiceSession
 
 
 # ===== APP SETUP =====
+
+# Uploads stay in memory up to this size and only larger ones spill to a
+# temp file (Starlette's default is 1 MB)
+UPLOAD_SPOOL_MB = int(os.getenv("UPLOAD_SPOOL_MB", "16"))
+MultiPartParser.spool_max_size = UPLOAD_SPOOL_MB * 1024 * 1024
+
 app = FastAPI(
     title="Voice Assistant API",
     description="STT → RAG → TTS Pipeline via REST API"
 )
 
-# Initialize RAG when the app starts (not on every request)
-# This runs once when the server boots up
+# Load the WARMUP backends when the app starts (not on a first request)
+# This runs once when the server boots up; anything not warmed (e.g. STT on a
+# text-only worker) is imported the first time an endpoint needs it
 @app.on_event("startup")
 def startup_event():
-    """Initialize RAG pipeline on server startup"""
-    print("Starting up... Initializing RAG pipeline...")
-    initialize_rag()
-    print("Ready to accept requests!")
+    """Warm up the configured backends on server startup"""
+    print("Starting up... Warming up backends...")
+    timings = warm_up()
+    # Start deleting old audio_responses/ files in the background
+    audio_retention.start()
+    print(f"Ready to accept requests! (warm-up seconds: {timings})")
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Stop the audio retention sweeper"""
+    audio_retention.stop()
 
 
 # ===== REQUEST/RESPONSE MODELS =====
@@ -50,6 +85,55 @@ class TextResponse(BaseModel):
     answer: str     # The RAG-generated answer
 
 
+# ===== HELPERS =====
+
+class PinnedFileResponse(FileResponse):
+    """FileResponse that releases its audio_retention pin however sending ends"""
+
+    async def __call__(self, scope, receive, send):
+        # A background task would be skipped if the client disconnects or sending
+        # fails, leaving the file pinned (never swept) for good
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            audio_retention.unpin(self.path)
+
+
+def audio_file_response(audio_path: str, headers: dict = None) -> FileResponse:
+    """
+    FileResponse for a generated audio file
+
+    The file is pinned so the retention sweeper can't delete it while it
+    is being sent; the pin is released once sending is over (finished or not).
+    """
+    audio_retention.pin(audio_path)
+    return PinnedFileResponse(
+        audio_path,
+        media_type=get_tts_backend().media_type,
+        filename="response" + os.path.splitext(audio_path)[1],
+        headers=headers
+    )
+
+
+async def speak(answer: str, headers: dict = None):
+    """Audio response for an answer: from memory, or saved to audio_responses/"""
+    if not SAVE_AUDIO_RESPONSES:
+        audio = await asynthesize_speech(answer)
+        media_type = get_tts_backend().media_type
+        extension = "wav" if media_type == "audio/wav" else "mp3"
+        return Response(
+            content=audio,
+            media_type=media_type,
+            headers={
+                "Content-Disposition": f'attachment; filename="response.{extension}"',
+                **(headers or {})
+            }
+        )
+
+    audio_path = await atext_to_speech(answer)
+    return audio_file_response(audio_path, headers=headers)
+
+
 # ===== ENDPOINTS =====
 # GET request to /health
 @app.get("/health")
@@ -58,45 +142,220 @@ def health_check():
     return {"status": "ok", "message": "Voice Assistant API is running"}
 
 
+# GET request to /index/stats
+@app.get("/index/stats")
+def index_stats():
+    """How many chunks were reused from disk vs embedded at startup"""
+    return get_index_stats()
+
+
+# GET request to /cache/stats
+@app.get("/cache/stats")
+def cache_stats():
+    """Answer cache hit rate (exact + semantic), size and evictions"""
+    return get_cache_stats()
+
+
+# GET request to /rerank/stats
+@app.get("/rerank/stats")
+def rerank_stats():
+    """Cross-encoder pair cache hit rate, batch sizes and current initial_k"""
+    return get_rerank_stats()
+
+
+# GET request to /embeddings/stats
+@app.get("/embeddings/stats")
+def embedding_stats():
+    """Question embedding cache hit rate and batch-size histogram"""
+    return get_embedding_stats()
+
+
+# GET request to /tts/cache/stats
+@app.get("/tts/cache/stats")
+def tts_cache_stats():
+    """Audio bytes served from cache vs synthesized"""
+    return get_tts_cache_stats()
+
+
+# GET request to /stt/stats
+@app.get("/stt/stats")
+def stt_stats():
+    """STT backend in use and its batch-size histogram (local engine)"""
+    return get_stt_stats()
+
+
+# GET request to /audio/retention/stats
+@app.get("/audio/retention/stats")
+def audio_retention_stats():
+    """Files and bytes the audio_responses/ sweeper has reclaimed"""
+    return audio_retention.get_stats()
+
+
+# ----- Knowledge Base Updates -----
+# Upload new or edited text files; only changed chunks get re-embedded
+# POST request to /knowledge
+@app.post("/knowledge")
+def upload_knowledge(files: List[UploadFile] = File(...)):
+    """
+    Add or update knowledge files while the server keeps answering
+
+    - Send: One or more .txt files (same filename = update)
+    - Receive: {"hits": ..., "misses": ..., "deleted": ..., "total": ...}
+    """
+    if SHARED_INDEX_DIR:
+        raise HTTPException(status_code=409, detail="Read-only shared index: run build_index.py to update it")
+    os.makedirs(KNOWLEDGE_DIR, exist_ok=True)
+
+    paths = []
+    for upload in files:
+        # basename() so a client can't write outside the knowledge folder
+        path = os.path.join(KNOWLEDGE_DIR, os.path.basename(upload.filename))
+        with open(path, "wb") as f:
+            f.write(upload.file.read())
+        paths.append(path)
+
+    return ingest_files(paths)
+
+
+# DELETE request to /knowledge/{filename}
+@app.delete("/knowledge/{filename}")
+def delete_knowledge(filename: str):
+    """Remove an uploaded knowledge file and its chunks"""
+    if SHARED_INDEX_DIR:
+        raise HTTPException(status_code=409, detail="Read-only shared index: run build_index.py to update it")
+    name = os.path.basename(filename)
+    # "", "." and ".." would point at the knowledge folder or its parent
+    if name in ("", ".", ".."):
+        raise HTTPException(status_code=400, detail=f"Invalid knowledge file name: {filename}")
+    path = os.path.join(KNOWLEDGE_DIR, name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Unknown knowledge file: {filename}")
+
+    stats = remove_files([path])
+    os.unlink(path)
+    return stats
+
+
 # ----- Text-to-Text (Simplest) -----
 # Send text question, get text answer
 # POST request to /ask/text
 @app.post("/ask/text", response_model=TextResponse)
-def ask_text(request: TextRequest):
+async def ask_text(request: TextRequest):
     """
     Text-only endpoint (no audio)
 
     - Send: {"question": "What are store hours?"}
     - Receive: {"question": "...", "answer": "..."}
     """
-    # Get response from RAG pipeline
-    answer = get_response(request.question)
+    # Get response from RAG pipeline (awaited - no worker thread is held)
+    answer = await aget_response(request.question)
 
     # Return both question and answer
     return TextResponse(question=request.question, answer=answer)
 
 
+# ----- Streaming Text (Server-Sent Events) -----
+# Sources arrive as soon as retrieval is done, then tokens as the LLM writes them
+# GET request to /ask/stream?question=...
+@app.get("/ask/stream")
+async def ask_text_stream(question: str):
+    """
+    Stream the answer as Server-Sent Events (works with browser EventSource)
+
+    - Send: GET /ask/stream?question=What are store hours?
+    - Receive: event: sources / event: token (many) / event: done
+    """
+    async def event_stream():
+        answer = ""
+        async for event in astream_response(question):
+            if event["type"] == "token":
+                answer += event["text"]
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        yield f"event: done\ndata: {json.dumps({'type': 'done', 'answer': answer})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Stop proxies (e.g. nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ----- Streaming Text (WebSocket) -----
+# One socket, many questions: send {"question": "..."} and read events back
+@app.websocket("/ws/ask")
+async def ask_text_websocket(websocket: WebSocket):
+    """
+    Stream answers over a WebSocket
+
+    - Send: {"question": "What are store hours?"}
+    - Receive: {"type": "sources"}, {"type": "token"} (many), {"type": "done", "answer": "..."}
+    """
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive_json()
+            question = message.get("question", "").strip()
+            if not question:
+                await websocket.send_json({"type": "error", "detail": "Missing question"})
+                continue
+
+            answer = ""
+            async for event in astream_response(question):
+                if event["type"] == "token":
+                    answer += event["text"]
+                await websocket.send_json(event)
+            await websocket.send_json({"type": "done", "answer": answer})
+    except WebSocketDisconnect:
+        pass
+
+
+# ----- Voice Conversation (WebSocket) -----
+# Stream microphone audio up, get transcripts, tokens and audio back
+@app.websocket("/ws/voice")
+async def voice_websocket(websocket: WebSocket):
+    """
+    Full-duplex voice session (protocol in voice_session.py)
+
+    - Send: binary 16-bit mono PCM frames (16 kHz), optional {"type": "end"}
+    - Receive: {"type": "partial_transcript"}, {"type": "transcript"},
+      {"type": "token"} (many), {"type": "audio"} + binary audio per sentence,
+      {"type": "done", "timings": {...}}
+    """
+    await VoiceSession(websocket).run()
+
+
 # ----- Text-to-Audio -----
 # Send text question, get audio response back
 # POST request to /ask/text-to-audio
 @app.post("/ask/text-to-audio")
-def ask_text_get_audio(request: TextRequest):
+async def ask_text_get_audio(request: TextRequest):
     """
     Send text, receive audio response
 
     - Send: {"question": "What are store hours?"}
     - Receive: MP3 audio file
     """
-    answer = get_response(request.question)
+    answer = await aget_response(request.question)
 
     # Step 2: Convert response to speech (saves to audio_responses/ folder)
-    audio_path = text_to_speech(answer)
+    return await speak(answer)
 
 
-    return FileResponse(
-        audio_path,
-        media_type="audio/mpeg",
-        filename="response.mp3"
+# ----- Text-to-Audio (Streaming) -----
+# Audio starts playing after the first sentence, not after the whole answer
+# POST request to /ask/text-to-audio/stream
+@app.post("/ask/text-to-audio/stream")
+async def ask_text_get_audio_stream(request: TextRequest):
+    """
+    Send text, receive the answer as chunked audio (one piece per sentence)
+
+    - Send: {"question": "What are store hours?"}
+    - Receive: Chunked MP3 stream (one WAV stream with the offline backend)
+    """
+    return StreamingResponse(
+        astream_speech_response(request.question),
+        media_type=get_tts_backend().media_type
     )
 
 
@@ -111,28 +370,16 @@ async def ask_audio_get_text(audio: UploadFile = File(...)):
     - Send: Audio file (wav, mp3, flac)
     - Receive: {"question": "transcribed text", "answer": "..."}
     """
-    # Step 1: Save uploaded audio to a temporary file
-    # We need a file on disk for speech_recognition to process
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-        content = await audio.read()
-        # Write it to the temp file
-        tmp.write(content)
-        tmp_path = tmp.name
-
-    try:
-        # Step 2: Transcribe audio to text (STT)
-        question = transcribe_file(tmp_path)
-
-        # Check if transcription failed
-        if question.startswith("["):
-            raise HTTPException(status_code=400, detail=question)
+    # Step 1: Transcribe audio to text (STT)
+    # audio.file is handed over as-is: no extra copy, no temp file
+    question = await atranscribe_file(audio.file)
 
-        answer = get_response(question)
-        return TextResponse(question=question, answer=answer)
+    # Check if transcription failed
+    if question.startswith("["):
+        raise HTTPException(status_code=400, detail=question)
 
-    finally:
-        # Clean up: delete the temporary file
-        os.unlink(tmp_path)
+    answer = await aget_response(question)
+    return TextResponse(question=question, answer=answer)
 
 
 # ----- Full Pipeline: Audio-to-Audio -----
@@ -146,36 +393,44 @@ async def ask_audio_get_audio(audio: UploadFile = File(...)):
     - Send: Audio file with your question
     - Receive: MP3 audio file with the answer
     """
-    # Step 1: Save uploaded audio to temp file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-        content = await audio.read()
-        tmp.write(content)
-        tmp_path = tmp.name
+    # Step 1: STT - Convert audio to text (read straight from the upload)
+    question = await atranscribe_file(audio.file)
 
-    try:
-        # Step 2: STT - Convert audio to text
-        question = transcribe_file(tmp_path)
+    if question.startswith("["):
+        raise HTTPException(status_code=400, detail="Could not understand audio")
 
-        if question.startswith("["):
-            raise HTTPException(status_code=400, detail="Could not understand audio")
+    answer = await aget_response(question)
 
-        answer = get_response(question)
-        audio_path = text_to_speech(answer)
+    return await speak(
+        answer,
+        # Include transcription in response headers (optional metadata)
+        headers={
+            "X-Transcription": question[:100],  
+            "X-Answer": answer[:100]            
+        }
+    )
 
-        return FileResponse(
-            audio_path,
-            media_type="audio/mpeg",
-            filename="response.mp3",
-            # Include transcription in response headers (optional metadata)
-            headers={
-                "X-Transcription": question[:100],  
-                "X-Answer": answer[:100]            
-            }
-        )
 
-    finally:
-        # Clean up temp file
-        os.unlink(tmp_path)
+# ----- Full Pipeline, Streaming: Audio-to-Audio -----
+# POST request to /ask/audio/stream
+@app.post("/ask/audio/stream")
+async def ask_audio_get_audio_stream(audio: UploadFile = File(...)):
+    """
+    Full voice pipeline with streamed audio out
+
+    - Send: Audio file with your question
+    - Receive: Chunked MP3 stream, first sentence first
+    """
+    question = await atranscribe_file(audio.file)
+
+    if question.startswith("["):
+        raise HTTPException(status_code=400, detail="Could not understand audio")
+
+    return StreamingResponse(
+        astream_speech_response(question),
+        media_type=get_tts_backend().media_type,
+        headers={"X-Transcription": question[:100]}
+    )
 
 
 # ===== RUN SERVER =====
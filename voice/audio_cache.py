@@ -0,0 +1,160 @@
+"""
+Audio Cache - Content-addressed store for synthesized speech
+
+Audio is keyed by a hash of the text plus the TTS backend and its voice
+settings, so the same answer spoken the same way is synthesized once.
+Entries live on disk (size-bounded, least recently used evicted first)
+with the hottest ones also kept in memory.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from audio_store import write_atomic
+
+
+def audio_key(text: str, backend_name: str, settings: dict) -> str:
+    """Hash of everything that changes the generated audio"""
+    payload = json.dumps({"backend": backend_name, "settings": settings, "text": text}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Disk + memory LRU cache of audio bytes
+
+    Usage:
+        cache = AudioCache("audio_cache", max_bytes=256 * 1024 * 1024)
+        audio = cache.get(key)
+        if audio is None:
+            audio = synthesize(text)
+            cache.put(key, audio)
+    """
+
+    def __init__(self, cache_dir: str = "audio_cache", max_bytes: int = 256 * 1024 * 1024,
+                 memory_bytes: int = 16 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._disk = OrderedDict()      # key -> size, least recently used first
+        self._disk_bytes = 0
+        self._memory = OrderedDict()    # key -> bytes, least recently used first
+        self._memory_bytes = 0
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "bytes_from_cache": 0,
+            "bytes_synthesized": 0,
+        }
+
+        # Rebuild the LRU order from what is already on disk (oldest mtime first)
+        entries = []
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if name.endswith(".audio"):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name[:-len(".audio")], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        with self._lock:
+            self._evict_disk()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.audio")
+
+    def get(self, key: str):
+        """Cached audio bytes, or None"""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                self.stats["bytes_from_cache"] += len(audio)
+                return audio
+            on_disk = key in self._disk
+
+        if not on_disk:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+
+        try:
+            with open(self._path(key), "rb") as f:
+                audio = f.read()
+            # Keep the recency across restarts
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            # Evicted between the check and the read
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self._remember(key, audio)
+            self.stats["disk_hits"] += 1
+            self.stats["bytes_from_cache"] += len(audio)
+        return audio
+
+    def put(self, key: str, audio: bytes):
+        """Store freshly synthesized audio"""
+        # Temp file + rename: readers never see a partial file
+        write_atomic(self._path(key), audio)
+
+        with self._lock:
+            self.stats["bytes_synthesized"] += len(audio)
+            if key in self._disk:
+                self._disk_bytes -= self._disk.pop(key)
+            self._disk[key] = len(audio)
+            self._disk_bytes += len(audio)
+            self._remember(key, audio)
+            self._evict_disk()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+            }
+
+    # ----- internals (call with the lock held) -----
+
+    def _remember(self, key: str, audio: bytes):
+        """Keep a hot copy in memory (skipped for entries bigger than the budget)"""
+        if len(audio) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            if key in self._memory:
+                self._memory_bytes -= len(self._memory.pop(key))
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+            self.stats["evictions"] += 1
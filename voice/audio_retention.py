@@ -0,0 +1,154 @@
+"""
+Audio Retention - Keeps the audio_responses folder from growing forever
+
+A background sweeper deletes the oldest response files once the folder is
+over its byte or file-count budget, and any file older than the max age.
+Files that are still being streamed to a client are pinned and never
+deleted; brand-new files get a short grace period before they count.
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class AudioRetention:
+    """
+    Size/age/count limits for a folder of generated audio
+
+    Usage:
+        retention = AudioRetention("audio_responses", max_bytes=500 * 1024 * 1024)
+        retention.start()                 # background sweeper thread
+        retention.pin(path)               # before streaming a file
+        retention.unpin(path)             # after the response is sent
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 500 * 1024 * 1024,
+                 max_age_seconds: float = 24 * 3600, max_files: int = 10000,
+                 interval_seconds: float = 60, grace_seconds: float = 60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.max_files = max_files
+        self.interval_seconds = interval_seconds
+        self.grace_seconds = grace_seconds
+
+        self._pins = Counter()          # path -> number of in-flight responses
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.stats = {
+            "sweeps": 0,
+            "files_deleted": 0,
+            "bytes_reclaimed": 0,
+            "last_sweep_files": 0,
+            "last_sweep_bytes": 0,
+        }
+
+    # ----- pinning -----
+
+    def pin(self, path: str):
+        """Protect a file from deletion (e.g. while a FileResponse streams it)"""
+        with self._lock:
+            self._pins[os.path.abspath(path)] += 1
+
+    def unpin(self, path: str):
+        """Release a pin taken with pin()"""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._pins[path] -= 1
+            if self._pins[path] <= 0:
+                del self._pins[path]
+
+    @contextmanager
+    def pinned(self, path: str):
+        self.pin(path)
+        try:
+            yield path
+        finally:
+            self.unpin(path)
+
+    # ----- sweeping -----
+
+    def sweep(self) -> dict:
+        """
+        Delete files until the folder is within its limits
+
+        Returns:
+            {"files": deleted this sweep, "bytes": reclaimed this sweep}
+        """
+        if not os.path.isdir(self.directory):
+            # Nothing saved yet (the folder is created with the first file)
+            return {"files": 0, "bytes": 0}
+        now = time.time()
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, os.path.abspath(entry.path)))
+        files.sort()    # oldest first
+
+        total_bytes = sum(size for _, size, _ in files)
+        total_files = len(files)
+        deleted_files = 0
+        deleted_bytes = 0
+
+        for mtime, size, path in files:
+            age = now - mtime
+            over_budget = total_bytes > self.max_bytes or total_files > self.max_files
+            if age <= self.max_age_seconds and not over_budget:
+                # Sorted by age: nothing younger will need deleting either
+                break
+            if age < self.grace_seconds:
+                break
+
+            # Check the pin and delete under the lock so a pin can't slip in between
+            with self._lock:
+                if path in self._pins:
+                    continue
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            total_bytes -= size
+            total_files -= 1
+            deleted_files += 1
+            deleted_bytes += size
+
+        with self._lock:
+            self.stats["sweeps"] += 1
+            self.stats["files_deleted"] += deleted_files
+            self.stats["bytes_reclaimed"] += deleted_bytes
+            self.stats["last_sweep_files"] = deleted_files
+            self.stats["last_sweep_bytes"] = deleted_bytes
+        return {"files": deleted_files, "bytes": deleted_bytes}
+
+    def start(self):
+        """Run sweep() every interval_seconds on a daemon thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audio-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except OSError as e:
+                print(f"Audio retention sweep failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "pinned_files": len(self._pins)}
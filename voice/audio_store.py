@@ -0,0 +1,51 @@
+"""
+Audio Store - Safe file naming and writing for generated audio
+
+Every file gets a unique name (timestamp + random suffix), so requests
+finishing in the same second can never overwrite each other, and is
+written to a temp file first and renamed into place, so nobody ever
+reads a half-written file.
+"""
+
+import os
+import tempfile
+import uuid
+from datetime import datetime
+
+
+def unique_audio_path(directory: str, extension: str = "mp3", prefix: str = "response") -> str:
+    """
+    New, collision-free path for an audio file
+
+    Args:
+        directory: Folder the file goes in
+        extension: File extension without the dot
+        prefix: Start of the file name
+
+    Returns:
+        e.g. audio_responses/response_20250101_120000_3f2a9c1b7d4e.mp3
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(directory, f"{prefix}_{timestamp}_{uuid.uuid4().hex[:12]}.{extension}")
+
+
+def write_atomic(path: str, data: bytes):
+    """Write bytes to path via a temp file in the same folder + rename"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Don't leave a stray temp file behind
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def save_audio(data: bytes, directory: str, extension: str = "mp3") -> str:
+    """Write audio under a unique name and return its path"""
+    path = unique_audio_path(directory, extension)
+    write_atomic(path, data)
+    return path
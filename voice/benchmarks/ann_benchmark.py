@@ -0,0 +1,134 @@
+"""
+ANN Benchmark - Recall and latency of the exact and HNSW vector indexes
+
+Builds vector_index.ExactIndex and vector_index.HNSWIndex over synthetic
+clustered embeddings at each size in --sizes and reports, per engine and
+HNSW ef_search value:
+
+    build s         time to insert every vector
+    recall@k        share of the true top-k that was returned
+    p50/p95 ms      single-query latency
+    QPS             queries per second (one thread)
+
+The exact index is the baseline (recall 1.0); its latency grows linearly
+with the collection while HNSW's grows roughly with log(n). HNSW inserts
+run one at a time in Python (a few hundred per second), so building the 1M
+graph takes close to an hour; use --sizes 10000 100000 for a quick run.
+
+--churn deletes most of an HNSW graph (like many edited files on a running
+server) and checks that KnowledgeIndex-style compaction (rebuilt()) brings
+the graph back to the live vectors without losing recall.
+
+Run from the voice/ folder:
+    python benchmarks/ann_benchmark.py
+    python benchmarks/ann_benchmark.py --sizes 10000 100000 --dim 384 --ef 16 32 64 128
+    python benchmarks/ann_benchmark.py --churn 0.8 --sizes 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Make voice/ importable when run as benchmarks/ann_benchmark.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quantization_benchmark import exact_top_k, make_embeddings, make_queries  # noqa: E402
+from vector_index import ExactIndex, HNSWIndex  # noqa: E402
+
+
+def measure(search, queries: np.ndarray, truth: list, k: int) -> dict:
+    latencies = []
+    recalls = []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = search(query)
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len({doc_id for doc_id, _ in found} & expected) / k)
+    latencies.sort()
+    return {
+        "recall": float(np.mean(recalls)),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "qps": len(latencies) / sum(latencies),
+    }
+
+
+def churn_check(size: int, dim: int, queries: int, k: int, share: float):
+    """Delete `share` of an HNSW graph, compare recall / latency / graph size before and after a rebuild"""
+    vectors = make_embeddings(size, dim)
+    hnsw = HNSWIndex()
+    hnsw.add(list(range(size)), vectors)
+
+    removed = np.random.default_rng(1).permutation(size)[:int(size * share)]
+    hnsw.remove(removed.tolist())
+    live = np.setdiff1d(np.arange(size), removed)
+    query_vectors = make_queries(vectors[live], queries)
+    # exact_top_k numbers rows 0..n-1: map them back to the surviving IDs
+    truth = [{int(live[row]) for row in expected} for expected in exact_top_k(vectors[live], query_vectors, k)]
+
+    print(f"\nChurn: {size} vectors, {share:.0%} deleted")
+    print(f"{'graph':>9} {'nodes':>7} {'deleted':>8} {'recall':>7} {'p50 ms':>8}")
+    before = measure(lambda query: hnsw.search(query, k=k), query_vectors, truth, k)
+    print(f"{'tombstone':>9} {hnsw.count:>7} {hnsw.deleted_share:>8.0%} {before['recall']:>7.3f} {before['p50_ms']:>8.2f}")
+    hnsw = hnsw.rebuilt()
+    after = measure(lambda query: hnsw.search(query, k=k), query_vectors, truth, k)
+    print(f"{'rebuilt':>9} {hnsw.count:>7} {hnsw.deleted_share:>8.0%} {after['recall']:>7.3f} {after['p50_ms']:>8.2f}")
+
+    assert hnsw.count == len(hnsw) == len(live), "rebuilt graph should hold only the live vectors"
+    assert after["recall"] >= min(0.9, before["recall"] - 0.02), "rebuild lost recall"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--M", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=100)
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128],
+                        help="HNSW ef_search values to try")
+    parser.add_argument("--churn", type=float, default=0,
+                        help="Only run the delete + rebuild check, deleting this share (e.g. 0.8) of --sizes[0]")
+    args = parser.parse_args()
+
+    if args.churn:
+        churn_check(args.sizes[0], args.dim, args.queries, args.k, args.churn)
+        return
+
+    print(f"{args.dim} dims, recall@{args.k} over {args.queries} queries, "
+          f"HNSW M={args.M} ef_construction={args.ef_construction}")
+    print(f"{'size':>8} {'engine':>7} {'ef':>5} {'build s':>8} {'recall':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'QPS':>7}")
+    for size in args.sizes:
+        vectors = make_embeddings(size, args.dim)
+        queries = make_queries(vectors, args.queries)
+        truth = exact_top_k(vectors, queries, args.k)
+        ids = list(range(size))
+
+        exact = ExactIndex()
+        start = time.perf_counter()
+        exact.add(ids, vectors)
+        build = time.perf_counter() - start
+        r = measure(lambda query: exact.search(query, k=args.k), queries, truth, args.k)
+        print(f"{size:>8} {'exact':>7} {'-':>5} {build:>8.1f} {r['recall']:>7.3f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['qps']:>7.0f}", flush=True)
+        del exact
+
+        hnsw = HNSWIndex(M=args.M, ef_construction=args.ef_construction)
+        start = time.perf_counter()
+        for batch in range(0, size, 10000):
+            hnsw.add(ids[batch:batch + 10000], vectors[batch:batch + 10000])
+        build = time.perf_counter() - start
+        for ef in args.ef:
+            r = measure(lambda query: hnsw.search(query, k=args.k, ef=ef), queries, truth, args.k)
+            print(f"{size:>8} {'hnsw':>7} {ef:>5} {build:>8.1f} {r['recall']:>7.3f} "
+                  f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['qps']:>7.0f}", flush=True)
+        del hnsw, vectors
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+BM25 Benchmark - Keyword query latency vs corpus size
+
+Compares, on synthetic chunks with a Zipf-like vocabulary:
+    full scan   the notebook's rank_bm25.BM25Okapi.get_scores + argsort over
+                every chunk (Advanced_RAG/02_hybrid_search_bm25_dense.ipynb)
+    inverted    hybrid_search.BM25Index (dict postings, incremental updates)
+    compiled    bm25_engine.CompiledBM25 (CSR + NumPy + MaxScore), also
+                saved and re-opened memory-mapped
+and reports the cost of incremental updates (the notebook has to rebuild).
+The pure-Python indexes are skipped above --max-python-size chunks; the
+compiled engine is then built straight from token IDs.
+
+Run from the voice/ folder (full scan needs: pip install rank-bm25):
+    python benchmarks/bm25_benchmark.py
+    python benchmarks/bm25_benchmark.py --sizes 10000 100000 1000000 --queries 50
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Make voice/ importable when run as benchmarks/bm25_benchmark.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hybrid_search import BM25Index, tokenize  # noqa: E402
+from bm25_engine import CompiledBM25  # noqa: E402
+
+VOCABULARY = 50000
+
+
+def make_token_ids(size: int, words_per_chunk: int = 80, seed: int = 0) -> np.ndarray:
+    """Word numbers for ~500-character chunks, Zipf-distributed (like real text)"""
+    rng = np.random.default_rng(seed)
+    ranks = np.empty((size, words_per_chunk), dtype=np.int32)
+    for start in range(0, size, 100000):
+        block = rng.zipf(1.2, size=(min(100000, size - start), words_per_chunk))
+        ranks[start:start + len(block)] = np.minimum(block, VOCABULARY) - 1
+    return ranks
+
+
+def make_corpus(size: int, words_per_chunk: int = 80, seed: int = 0) -> list:
+    """The same chunks as text"""
+    return [" ".join(f"w{i}" for i in row) for row in make_token_ids(size, words_per_chunk, seed)]
+
+
+def compile_from_token_ids(token_ids: np.ndarray) -> CompiledBM25:
+    """Build the compiled engine without going through text (fast for 1M chunks)"""
+    size, words_per_chunk = token_ids.shape
+    return CompiledBM25.from_coo(
+        ids=np.arange(size),
+        vocabulary=[f"w{i}" for i in range(VOCABULARY)],
+        term_index=token_ids.ravel(),
+        doc_index=np.repeat(np.arange(size, dtype=np.int32), words_per_chunk),
+        tf=np.ones(token_ids.size, dtype=np.float32),    # duplicates are summed
+        doc_len=np.full(size, words_per_chunk)
+    )
+
+
+def make_queries(token_ids: np.ndarray, count: int, seed: int = 1) -> list:
+    """3-5 word queries taken from random chunks (so they have matches)"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = [f"w{i}" for i in token_ids[rng.randrange(len(token_ids))]]
+        queries.append(" ".join(rng.sample(words, rng.randint(3, 5))))
+    return queries
+
+
+def time_queries(search, queries: list) -> dict:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--k", type=int, default=9)
+    parser.add_argument("--max-python-size", type=int, default=100000)
+    args = parser.parse_args()
+
+    try:
+        from rank_bm25 import BM25Okapi
+    except ImportError:
+        BM25Okapi = None
+        print("rank_bm25 not installed: skipping the full scan (pip install rank-bm25)")
+
+    print(f"{'chunks':>8} {'method':>14} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for size in args.sizes:
+        token_ids = make_token_ids(size)
+        queries = make_queries(token_ids, args.queries)
+
+        if size <= args.max_python_size:
+            corpus = make_corpus(size)
+
+            if BM25Okapi is not None:
+                # Notebook version: lowercase + split, score every chunk, argsort
+                start = time.perf_counter()
+                full_scan = BM25Okapi([chunk.lower().split() for chunk in corpus])
+                build = time.perf_counter() - start
+
+                def scan_search(query):
+                    scores = full_scan.get_scores(query.lower().split())
+                    return np.argsort(scores)[::-1][:args.k]
+
+                r = time_queries(scan_search, queries)
+                print(f"{size:>8} {'full scan':>14} {build:>8.2f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+                del full_scan
+
+            start = time.perf_counter()
+            index = BM25Index()
+            index.add(list(range(size)), corpus)
+            build = time.perf_counter() - start
+            r = time_queries(lambda query: index.search(query, k=args.k), queries)
+            print(f"{size:>8} {'inverted':>14} {build:>8.2f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+
+            # Incremental updates: replace 1% of the chunks
+            changed = list(range(0, size, 100))
+            start = time.perf_counter()
+            index.remove(changed)
+            index.add(changed, [corpus[i][::-1] for i in changed])
+            per_chunk = (time.perf_counter() - start) / len(changed) * 1e6
+            print(f"{'':>8} {'update':>14} {per_chunk:>7.1f}us per chunk (remove + add), "
+                  f"{len(tokenize(corpus[0]))} tokens/chunk")
+            del index, corpus
+
+        start = time.perf_counter()
+        engine = compile_from_token_ids(token_ids)
+        build = time.perf_counter() - start
+        r = time_queries(lambda query: engine.search(query, k=args.k), queries)
+        print(f"{size:>8} {'compiled':>14} {build:>8.2f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+
+        # On disk: how long opening takes, and latency on the memory-mapped arrays
+        directory = tempfile.mkdtemp(prefix="bm25-")
+        try:
+            engine.save(directory)
+            postings_mb = (engine.docs.nbytes + engine.weights.nbytes) / 1e6
+            del engine
+            start = time.perf_counter()
+            engine = CompiledBM25.load(directory)
+            opened = time.perf_counter() - start
+            r = time_queries(lambda query: engine.search(query, k=args.k), queries)
+            print(f"{size:>8} {'compiled mmap':>14} {opened:>8.3f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}"
+                  f"   ({postings_mb:.0f} MB postings, build s = open time)")
+            del engine
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Embedding Benchmark - Per-request vs micro-batched query embedding
+
+Sends a stream of questions from many concurrent callers and compares:
+
+    direct     every request calls embeddings.embed_query() on its own
+               (what the retrievers did before)
+    batched    embedding_service.QueryEmbedder, cache disabled
+    cached     QueryEmbedder with its cache, on a stream where questions
+               repeat (--repeat share)
+
+Reports p50/p95 latency, requests per second, how many embedding calls
+were made and the batch-size histogram. By default the embedding model is
+simulated (fixed cost per call + cost per text, like an API round-trip);
+--openai uses OpenAIEmbeddings for real (costs API credits).
+
+Run from the voice/ folder:
+    python benchmarks/embedding_benchmark.py
+    python benchmarks/embedding_benchmark.py --concurrency 1 50 200 --wait-ms 2 5 10
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Make voice/ importable when run as benchmarks/embedding_benchmark.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_service import QueryEmbedder  # noqa: E402
+
+
+WORDS = ("return policy warranty shipping order refund store hours laptop phone battery "
+         "screen delivery payment card discount member account password support repair").split()
+
+
+class StubEmbeddings:
+    """Pretend embedding API: each call costs call_ms + item_ms per text"""
+
+    def __init__(self, call_ms: float, item_ms: float, dim: int = 1536):
+        self.call_ms = call_ms
+        self.item_ms = item_ms
+        self.dim = dim
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: list) -> list:
+        with self._lock:
+            self.calls += 1
+        time.sleep((self.call_ms + self.item_ms * len(texts)) / 1000)
+        return [[float(len(text))] * self.dim for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+
+def make_questions(count: int, repeat: float, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(count):
+        if questions and rng.random() < repeat:
+            questions.append(rng.choice(questions))
+        else:
+            questions.append(" ".join(rng.sample(WORDS, 6)) + "?")
+    return questions
+
+
+def run(embed, questions: list, concurrency: int) -> dict:
+    def timed(question):
+        start = time.perf_counter()
+        embed(question)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        latencies = sorted(pool.map(timed, questions))
+        elapsed = time.perf_counter() - start
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "rps": len(questions) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--openai", action="store_true", help="real OpenAIEmbeddings instead of the stub")
+    parser.add_argument("--stub-call-ms", type=float, default=80.0)
+    parser.add_argument("--stub-item-ms", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 200])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--wait-ms", type=float, nargs="+", default=[5])
+    parser.add_argument("--repeat", type=float, default=0.3, help="share of repeated questions")
+    args = parser.parse_args()
+
+    if args.openai:
+        from langchain_openai import OpenAIEmbeddings
+        embeddings = OpenAIEmbeddings(model="text-embedding-ada-002")
+    else:
+        embeddings = StubEmbeddings(args.stub_call_ms, args.stub_item_ms)
+
+    def calls():
+        return getattr(embeddings, "calls", 0)
+
+    print(f"{'conc':>5} {'method':>8} {'wait':>5} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>7} "
+          f"{'calls':>6} {'batch':>6} {'cache':>6}  histogram")
+    for concurrency in args.concurrency:
+        questions = make_questions(args.requests, args.repeat)
+
+        before = calls()
+        r = run(embeddings.embed_query, questions, concurrency)
+        print(f"{concurrency:>5} {'direct':>8} {'-':>5} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['rps']:>7.1f} {calls() - before:>6} {1:>6.1f} {'-':>6}")
+
+        for wait_ms in args.wait_ms:
+            for method, cache_entries in (("batched", 0), ("cached", 1024)):
+                embedder = QueryEmbedder(
+                    embeddings,
+                    max_batch_size=args.batch_size,
+                    max_wait_ms=wait_ms,
+                    cache_entries=cache_entries
+                )
+                before = calls()
+                r = run(embedder.embed_query, questions, concurrency)
+                stats = embedder.get_stats()
+                print(f"{concurrency:>5} {method:>8} {wait_ms:>5g} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+                      f"{r['rps']:>7.1f} {calls() - before:>6} {stats['batches']['mean_batch_size']:>6.1f} "
+                      f"{stats['cache']['hit_rate']:>6.0%}  {stats['batches']['batch_size_histogram']}")
+
+
+if __name__ == "__main__":
+    main()
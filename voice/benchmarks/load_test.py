@@ -0,0 +1,161 @@
+"""
+Load Test - Concurrency scaling of the async FastAPI app with stubbed backends
+
+The OpenAI / Google calls are replaced with stubs that just wait a fixed
+time, so the numbers show how well the server overlaps requests (not how
+fast the real APIs are). With a non-blocking request path, throughput
+should grow almost linearly with concurrency while the event loop lag
+stays near zero.
+
+Run from the voice/ folder:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --endpoint /ask/audio --levels 1 10 50 100
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+import numpy as np
+
+# Make voice/ importable when run as benchmarks/load_test.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import voice_assistant  # noqa: E402
+from app import app  # noqa: E402
+
+
+# ===== STUB BACKENDS =====
+
+LLM_LATENCY = 0.30   # seconds per answer (retrieval + generation)
+STT_LATENCY = 0.20   # seconds per transcription (blocking, runs on the STT pool)
+TTS_LATENCY = 0.15   # seconds per synthesis (blocking, runs on the TTS pool)
+
+
+class StubChain:
+    """Stands in for the RetrievalQA chain"""
+
+    def invoke(self, query):
+        time.sleep(LLM_LATENCY)
+        return {"result": f"Stub answer to: {query}"}
+
+    async def ainvoke(self, query):
+        await asyncio.sleep(LLM_LATENCY)
+        return {"result": f"Stub answer to: {query}"}
+
+
+# Zero-mean and high-dimensional: two random vectors are nearly orthogonal, so
+# the semantic answer cache never matches (np.random.rand(8) often did, > 0.95)
+EMBEDDING_DIM = 384
+
+
+class StubIndex:
+    """Stands in for the KnowledgeIndex (random query vectors -> no cache hits)"""
+
+    generation = 0
+
+    def embed_query(self, query):
+        return np.random.randn(EMBEDDING_DIM)
+
+    async def aembed_query(self, query):
+        return np.random.randn(EMBEDDING_DIM)
+
+
+def stub_transcribe_file(audio_path):
+    time.sleep(STT_LATENCY)
+    return f"what are your store hours #{np.random.randint(1_000_000_000)}"
+
+
+def stub_text_to_speech(text):
+    time.sleep(TTS_LATENCY)
+    return __file__  # any existing file works for FileResponse
+
+
+def install_stubs():
+    voice_assistant.qa_chain = StubChain()
+    voice_assistant.knowledge_index = StubIndex()
+    voice_assistant.transcribe_file = stub_transcribe_file
+    voice_assistant.text_to_speech = stub_text_to_speech
+
+
+# ===== LOAD GENERATOR =====
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list):
+    """Ticks every 10ms and records how late each tick fires"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+
+
+async def one_request(client: httpx.AsyncClient, endpoint: str) -> float:
+    # A different question every time so the answer cache never short-circuits
+    question = f"What are store hours? #{np.random.randint(1_000_000_000)}"
+    start = time.perf_counter()
+    if endpoint.startswith("/ask/audio"):
+        files = {"audio": ("question.wav", b"RIFF" + b"\0" * 1024, "audio/wav")}
+        response = await client.post(endpoint, files=files)
+    else:
+        response = await client.post(endpoint, json={"question": question})
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run_level(endpoint: str, concurrency: int, rounds: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        stop = asyncio.Event()
+        lags = []
+        lag_task = asyncio.create_task(measure_loop_lag(stop, lags))
+
+        start = time.perf_counter()
+        latencies = []
+        for _ in range(rounds):
+            latencies += await asyncio.gather(
+                *(one_request(client, endpoint) for _ in range(concurrency))
+            )
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await lag_task
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "max_loop_lag_ms": max(lags, default=0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--endpoint", default="/ask/text",
+                        choices=["/ask/text", "/ask/text-to-audio", "/ask/audio-to-text", "/ask/audio"])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    install_stubs()
+
+    print(f"Endpoint: {args.endpoint}  (LLM {LLM_LATENCY}s, STT {STT_LATENCY}s, TTS {TTS_LATENCY}s stubs)")
+    print(f"{'concurrency':>11} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'loop lag ms':>11}")
+    for level in args.levels:
+        r = asyncio.run(run_level(args.endpoint, level, args.rounds))
+        print(f"{r['concurrency']:>11} {r['requests']:>8} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} {r['max_loop_lag_ms']:>11.1f}")
+
+    # Every request must have gone through the stubbed chain, or the numbers mean nothing
+    cache = voice_assistant.get_cache_stats()
+    print(f"answer cache hit rate: {cache['hit_rate']:.1%}")
+    assert cache["exact_hits"] + cache["semantic_hits"] == 0, "requests were served from the answer cache"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Local Embedding Benchmark - Throughput of the ONNX embedding backend
+
+Embeds a batch of synthetic chunks of mixed length (like an ingestion run)
+with local_embeddings.LocalEmbeddings in several configurations:
+
+    in order     batches in input order (padded to the longest text around)
+    bucketed     batches of similar length (the default)
+    threads      ONNX Runtime intra-op threads per process
+    processes    worker processes, each with its own model copy
+
+and reports texts/s, padding waste (share of computed tokens that were
+padding) and single-question latency. Needs onnxruntime, tokenizers and
+the model (downloaded from Hugging Face on the first run).
+
+Run from the voice/ folder:
+    python benchmarks/local_embedding_benchmark.py
+    python benchmarks/local_embedding_benchmark.py --texts 5000 --threads 1 4 --processes 0 2 4
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Make voice/ importable when run as benchmarks/local_embedding_benchmark.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_embeddings import DEFAULT_MODEL, LocalEmbeddings  # noqa: E402
+
+
+WORDS = ("return policy warranty shipping order refund store hours laptop phone battery "
+         "screen delivery payment card discount member account password support repair").split()
+
+
+def make_texts(count: int, seed: int = 0) -> list:
+    """Chunks of 5 to 200 words, mostly short (like the tail ends of split files)"""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=min(200, int(rng.expovariate(1 / 60)) + 5))) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Hugging Face name or local folder")
+    parser.add_argument("--float32", action="store_true", help="float32 weights instead of int8")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--processes", type=int, nargs="+", default=[0, 2])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    questions = make_texts(args.queries, seed=1)
+    configs = [("in order", threads, 0, False) for threads in args.threads[:1]]
+    configs += [("bucketed", threads, 0, True) for threads in args.threads]
+    configs += [("bucketed", None, processes, True) for processes in args.processes if processes > 1]
+
+    print(f"{args.texts} texts, batch size {args.batch_size}, {os.cpu_count()} cores")
+    print(f"{'batching':>9} {'threads':>7} {'procs':>5} {'texts/s':>8} {'padding':>8} {'query ms':>9}")
+    for batching, threads, processes, bucket in dict.fromkeys(configs):
+        embeddings = LocalEmbeddings(
+            model=args.model,
+            quantized=not args.float32,
+            threads=threads,
+            processes=processes,
+            max_batch_size=args.batch_size,
+            bucket_by_length=bucket
+        )
+        embeddings.embed_documents(texts[:args.batch_size * max(processes, 1) * 2])  # load + warm up
+        before = embeddings.get_stats()
+
+        start = time.perf_counter()
+        embeddings.embed_documents(texts)
+        rate = len(texts) / (time.perf_counter() - start)
+        after = embeddings.get_stats()
+        padded = after["padded_tokens"] - before["padded_tokens"]
+        waste = 1 - (after["tokens"] - before["tokens"]) / padded
+
+        latencies = []
+        for question in questions:
+            start = time.perf_counter()
+            embeddings.embed_query(question)
+            latencies.append(time.perf_counter() - start)
+        print(f"{batching:>9} {embeddings.threads:>7} {processes:>5} {rate:>8.0f} {waste:>8.0%} "
+              f"{statistics.median(latencies) * 1000:>9.2f}")
+        embeddings.close()
+
+    print(f"model file: {after['onnx_file']}")
+
+
+if __name__ == "__main__":
+    main()
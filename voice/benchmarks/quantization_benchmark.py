@@ -0,0 +1,107 @@
+"""
+Quantization Benchmark - Recall, speed and memory of the vector index modes
+
+Builds a quantized_index.QuantizedIndex in every mode over synthetic
+embeddings (clustered, like real text embeddings) and reports, against
+an exact float32 search:
+
+    recall@k        share of the true top-k that was returned
+    QPS             queries per second (first pass + exact re-scoring)
+    bytes/vector    in-memory size of the codes (float32 vectors stay on disk)
+
+Each mode runs with its default re-score factor and the ones in --rescore.
+
+Run from the voice/ folder:
+    python benchmarks/quantization_benchmark.py
+    python benchmarks/quantization_benchmark.py --size 200000 --dim 1536 --rescore 2 10 50
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Make voice/ importable when run as benchmarks/quantization_benchmark.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quantized_index import DEFAULT_RESCORE, QUANTIZERS, QuantizedIndex, normalize  # noqa: E402
+
+
+def make_embeddings(size: int, dim: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Unit vectors around random topic centers (plus a shared offset, as real embeddings have)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    offset = rng.normal(size=dim).astype(np.float32)
+    vectors = np.empty((size, dim), dtype=np.float32)
+    for start in range(0, size, 50000):
+        count = min(50000, size - start)
+        topic = centers[rng.integers(0, clusters, count)]
+        vectors[start:start + count] = topic + 0.8 * rng.normal(size=(count, dim)) + offset
+    return normalize(vectors)
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    """Perturbed copies of stored vectors (a question close to some chunks)"""
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.integers(0, len(vectors), count)]
+    return normalize(picked + 0.05 * rng.normal(size=picked.shape).astype(np.float32))
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> list:
+    truth = []
+    for query in queries:
+        scores = vectors @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        truth.append(set(top.tolist()))
+    return truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", default=list(QUANTIZERS), choices=list(QUANTIZERS))
+    parser.add_argument("--rescore", type=int, nargs="*", default=[],
+                        help="extra re-score factors to try per mode")
+    args = parser.parse_args()
+
+    vectors = make_embeddings(args.size, args.dim)
+    queries = make_queries(vectors, args.queries)
+    truth = exact_top_k(vectors, queries, args.k)
+    ids = list(range(args.size))
+
+    print(f"{args.size} vectors x {args.dim} dims, recall@{args.k} over {args.queries} queries")
+    print(f"{'mode':>8} {'rescore':>8} {'build s':>8} {'recall':>7} {'QPS':>8} {'bytes/vec':>10}")
+    for mode in args.modes:
+        directory = tempfile.mkdtemp(prefix=f"qindex-{mode}-")
+        try:
+            index = QuantizedIndex(directory, mode=mode)
+            start = time.perf_counter()
+            for batch in range(0, args.size, 10000):
+                index.add(ids[batch:batch + 10000], vectors[batch:batch + 10000])
+            build = time.perf_counter() - start
+
+            factors = [DEFAULT_RESCORE[mode]] + [f for f in args.rescore if mode != "float32"]
+            for factor in dict.fromkeys(factors):
+                index.rescore = factor
+                start = time.perf_counter()
+                results = [index.search(query, k=args.k) for query in queries]
+                qps = len(queries) / (time.perf_counter() - start)
+                recall = np.mean([
+                    len({doc_id for doc_id, _ in found} & expected) / args.k
+                    for found, expected in zip(results, truth)
+                ])
+                print(f"{mode:>8} {factor:>8} {build:>8.1f} {recall:>7.3f} {qps:>8.0f} {index.bytes_per_vector:>10}")
+            del index
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Rerank Benchmark - Cross-encoder reranking latency under concurrent load
+
+Replaces measure_performance() from Advanced_RAG/03_reranking_cross_encoder.ipynb
+(one query, one timing) with percentiles over many concurrent requests:
+
+    notebook   cross_encoder.predict() on initial_k pairs per request
+               (one shared model, so concurrent requests queue for it)
+    batched    rerank.CrossEncoderReranker, pair cache disabled
+    cached     rerank.CrossEncoderReranker with its pair cache, on a query
+               stream where questions repeat (--repeat share)
+
+Also reports the adaptive initial_k and how often the latency budget was
+missed. Uses the real model when sentence-transformers is installed;
+--stub simulates one (fixed cost per call + cost per pair) instead.
+
+Run from the voice/ folder:
+    python benchmarks/rerank_benchmark.py
+    python benchmarks/rerank_benchmark.py --stub --concurrency 1 8 32 --budget-ms 100
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.documents import Document
+
+# Make voice/ importable when run as benchmarks/rerank_benchmark.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rerank import CrossEncoderReranker, load_cross_encoder  # noqa: E402
+
+
+WORDS = ("return policy warranty shipping order refund store hours laptop phone battery "
+         "screen delivery payment card discount member account password support repair").split()
+
+
+def make_stub_scorer(call_ms: float, pair_ms: float):
+    """Pretend model: one call costs call_ms + pair_ms per pair (and only one call runs at a time)"""
+    lock = threading.Lock()
+
+    def score(pairs):
+        with lock:
+            time.sleep((call_ms + pair_ms * len(pairs)) / 1000)
+        return [float(len(set(q.split()) & set(text.split()))) for q, text in pairs]
+    return score
+
+
+def make_requests(count: int, candidates: int, repeat: float, seed: int = 0) -> list:
+    """(query, candidate Documents) pairs; a `repeat` share re-asks an earlier question"""
+    rng = random.Random(seed)
+    chunks = [Document(page_content=" ".join(rng.choices(WORDS, k=60)), id=f"chunk-{i}") for i in range(2000)]
+    requests = []
+    for _ in range(count):
+        if requests and rng.random() < repeat:
+            requests.append(rng.choice(requests))
+        else:
+            query = " ".join(rng.sample(WORDS, 5))
+            requests.append((query, rng.sample(chunks, candidates)))
+    return requests
+
+
+def percentiles(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+    }
+
+
+def run(rerank_one, requests: list, concurrency: int) -> dict:
+    def timed(request):
+        start = time.perf_counter()
+        rerank_one(*request)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        latencies = list(pool.map(timed, requests))
+        elapsed = time.perf_counter() - start
+    return {**percentiles(latencies), "rps": len(requests) / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--stub", action="store_true", help="simulated model instead of the real one")
+    parser.add_argument("--stub-call-ms", type=float, default=8.0)
+    parser.add_argument("--stub-pair-ms", type=float, default=1.5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--initial-k", type=int, default=20)
+    parser.add_argument("--final-k", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=150)
+    parser.add_argument("--repeat", type=float, default=0.3, help="share of repeated questions")
+    args = parser.parse_args()
+
+    if args.stub:
+        scorer = make_stub_scorer(args.stub_call_ms, args.stub_pair_ms)
+    else:
+        try:
+            scorer = load_cross_encoder(args.model)
+        except ImportError:
+            print("sentence-transformers not installed: using --stub (pip install sentence-transformers)")
+            scorer = make_stub_scorer(args.stub_call_ms, args.stub_pair_ms)
+    model_lock = threading.Lock()
+    scorer([("warm up", "the model")])
+
+    def notebook(query, docs):
+        # As in retrieve_and_rerank(): score all initial_k pairs, sort, keep final_k
+        with model_lock:
+            scores = scorer([(query, doc.page_content) for doc in docs])
+        return sorted(zip(docs, scores), key=lambda x: x[1], reverse=True)[:args.final_k]
+
+    print(f"{'conc':>5} {'method':>9} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>7} "
+          f"{'init_k':>7} {'over':>5} {'batch':>6} {'cache':>6}")
+    for concurrency in args.concurrency:
+        requests = make_requests(args.requests, args.initial_k, args.repeat)
+
+        r = run(notebook, requests, concurrency)
+        print(f"{concurrency:>5} {'notebook':>9} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['rps']:>7.1f} "
+              f"{args.initial_k:>7} {'-':>5} {args.initial_k:>6} {'-':>6}")
+
+        for method, cache_entries in (("batched", 0), ("cached", 10000)):
+            reranker = CrossEncoderReranker(
+                scorer=scorer,
+                max_initial_k=args.initial_k,
+                latency_budget_ms=args.budget_ms,
+                cache_entries=cache_entries
+            )
+            r = run(lambda query, docs: reranker.rerank(query, docs, k=args.final_k), requests, concurrency)
+            stats = reranker.get_stats()
+            print(f"{concurrency:>5} {method:>9} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['rps']:>7.1f} "
+                  f"{stats['mean_initial_k']:>7.1f} {stats['over_budget']:>5} "
+                  f"{stats['batches']['mean_batch_size']:>6.1f} {stats['cache']['hit_rate']:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Startup Benchmark - Import-time profile and cold start of the API server
+
+Every measurement runs in a fresh interpreter (nothing cached in
+sys.modules), like a new uvicorn worker:
+
+    cold start   import app + the first GET /health (median of --runs)
+    warm-up      warm_up() per backend (--warmup, e.g. stt,tts; rag needs OpenAI)
+    libraries    which heavy libraries got imported along the way
+    profile      python -X importtime, slowest modules and time per package
+
+Run from the voice/ folder:
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --module voice_assistant --warmup stt,tts --top 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+VOICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries a text-only worker should not need until it answers a question
+HEAVY = ["speech_recognition", "gtts", "pyttsx3", "torch", "transformers", "langchain_openai",
+         "langchain_chroma", "chromadb", "langchain_classic", "langchain_text_splitters", "openai",
+         "onnxruntime", "sentence_transformers"]
+
+# Runs in the child interpreter: prints one JSON line
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+module = __import__(MODULE)
+imported = time.perf_counter() - start
+result = {"import": imported}
+if MODULE == "app":
+    import asyncio, httpx
+
+    async def health():
+        transport = httpx.ASGITransport(app=module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            (await client.get("/health")).raise_for_status()
+            return time.perf_counter() - start
+    result["health"] = asyncio.run(health())
+result["loaded_after_import"] = sorted(name for name in HEAVY if name in sys.modules)
+if WARMUP:
+    import voice_assistant
+    result["warmup"] = voice_assistant.warm_up(WARMUP)
+result["loaded"] = sorted(name for name in HEAVY if name in sys.modules)
+print(json.dumps(result))
+"""
+
+
+def run_child(module: str, warmup: str) -> dict:
+    code = f"MODULE = {module!r}\nWARMUP = {warmup!r}\nHEAVY = {HEAVY!r}\n" + CHILD
+    output = subprocess.run([sys.executable, "-c", code], cwd=VOICE_DIR, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_profile(module: str) -> list:
+    """[(module, self_us, cumulative_us)] from python -X importtime"""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=VOICE_DIR,
+                            check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="app", help="Module to import (app or voice_assistant)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", default="", help="Backends to warm up after the import, e.g. stt,tts")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [run_child(args.module, "") for _ in range(args.runs)]
+    print(f"Cold start, median of {args.runs} fresh interpreters:")
+    print(f"  import {args.module:<20} {statistics.median(r['import'] for r in runs) * 1000:>8.0f} ms")
+    if "health" in runs[0]:
+        print(f"  first GET /health{'':<9} {statistics.median(r['health'] for r in runs) * 1000:>8.1f} ms")
+    print(f"  heavy libraries loaded: {', '.join(runs[0]['loaded_after_import']) or 'none'}")
+
+    if args.warmup:
+        warm = run_child(args.module, args.warmup)
+        for name, seconds in warm["warmup"].items():
+            print(f"  warm_up({name!r}){'':<{12 - len(name)}} {seconds * 1000:>8.0f} ms")
+        print(f"  heavy libraries after warm-up: {', '.join(warm['loaded']) or 'none'}")
+
+    rows = import_profile(args.module)
+    print(f"\nSlowest imports (python -X importtime -c 'import {args.module}'), cumulative:")
+    print(f"  {'module':<48} {'self ms':>8} {'total ms':>9}")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: -row[2])[:args.top]:
+        print(f"  {name[-48:]:<48} {self_us / 1000:>8.1f} {cumulative_us / 1000:>9.1f}")
+
+    packages = defaultdict(int)
+    for name, self_us, _ in rows:
+        packages[name.split(".")[0]] += self_us
+    print("\nImport time by package (self time of all its modules):")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<48} {self_us / 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
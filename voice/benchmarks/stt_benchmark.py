@@ -0,0 +1,78 @@
+"""
+STT Benchmark - Per-request latency and throughput of the STT backends
+
+Sends the same recording through each backend from many threads at once
+(like concurrent uploads on the STT thread pool) and reports latency
+percentiles, requests/s and, for the local engine, the batch sizes it
+actually ran.
+
+Run from the voice/ folder (needs a WAV file with speech):
+    python benchmarks/stt_benchmark.py --audio question.wav
+    python benchmarks/stt_benchmark.py --audio question.wav --backends whisper --concurrency 1 8 16
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import speech_recognition as sr
+
+# Make voice/ importable when run as benchmarks/stt_benchmark.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stt import BACKENDS  # noqa: E402
+
+
+def timed_transcribe(backend, audio) -> float:
+    start = time.perf_counter()
+    try:
+        backend.transcribe(audio)
+    except (sr.UnknownValueError, sr.RequestError) as e:
+        print(f"  {backend.name}: {type(e).__name__}: {e}")
+    return time.perf_counter() - start
+
+
+def run(backend, audio, concurrency: int, requests: int) -> dict:
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        latencies = list(pool.map(lambda _: timed_transcribe(backend, audio), range(requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--audio", required=True, help="WAV/AIFF/FLAC file with speech")
+    parser.add_argument("--backends", nargs="+", default=["google", "whisper"], choices=list(BACKENDS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32)
+    args = parser.parse_args()
+
+    with sr.AudioFile(args.audio) as source:
+        audio = sr.Recognizer().record(source)
+    print(f"Audio: {args.audio} ({len(audio.frame_data) / audio.sample_rate / audio.sample_width:.1f} s)")
+
+    for name in args.backends:
+        start = time.perf_counter()
+        backend = BACKENDS[name]()
+        print(f"\n{name}: loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
+        print(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for concurrency in args.concurrency:
+            r = run(backend, audio, concurrency, args.requests)
+            print(f"{concurrency:>11} {r['rps']:>8.2f} {r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f}")
+        stats = backend.get_stats()
+        if stats:
+            print(f"batch sizes: {stats['batch_size_histogram']} (mean {stats['mean_batch_size']:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+TTS Pipeline Benchmark - Time to first audio: full answer vs sentence pipeline
+
+Uses a stub LLM (tokens at a fixed rate) and a stub TTS backend (fixed
+latency per call plus a per-character cost), so it runs offline.
+
+Run from the voice/ folder:
+    python benchmarks/tts_pipeline.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Make voice/ importable when run as benchmarks/tts_pipeline.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts import TTSBackend, split_sentences, stream_speech  # noqa: E402
+
+
+ANSWER = (
+    "Our store is open Monday to Friday from 9 AM to 6 PM. "
+    "On Saturdays we open at 10 AM and close at 4 PM. "
+    "We are closed on Sundays and public holidays. "
+    "You can also reach phone support until 8 PM on weekdays. "
+    "Is there anything else I can help you with today?"
+)
+TOKEN_DELAY = 0.02        # seconds between LLM tokens
+TTS_BASE_LATENCY = 0.25   # seconds per TTS call
+TTS_PER_CHAR = 0.002      # extra seconds per character
+
+
+class StubBackend(TTSBackend):
+    name = "stub"
+
+    def synthesize(self, text: str) -> bytes:
+        time.sleep(TTS_BASE_LATENCY + TTS_PER_CHAR * len(text))
+        return text.encode("utf-8")
+
+
+async def stub_tokens():
+    for word in ANSWER.split(" "):
+        await asyncio.sleep(TOKEN_DELAY)
+        yield word + " "
+
+
+async def full_answer_then_tts(executor) -> tuple:
+    start = time.perf_counter()
+    answer = "".join([token async for token in stub_tokens()])
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(executor, StubBackend().synthesize, answer)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+async def sentence_pipeline(executor) -> tuple:
+    start = time.perf_counter()
+    first = None
+    async for _ in stream_speech(split_sentences(stub_tokens()), executor, backend=StubBackend()):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+async def main():
+    executor = ThreadPoolExecutor(max_workers=4)
+    print(f"{'mode':<24} {'first audio ms':>14} {'last audio ms':>13}")
+    for name, run in [("full answer, then TTS", full_answer_then_tts),
+                      ("sentence pipeline", sentence_pipeline)]:
+        first, total = await run(executor)
+        print(f"{name:<24} {first * 1000:>14.0f} {total * 1000:>13.0f}")
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,274 @@
+"""
+BM25 Engine - Compiled, vectorized BM25 with MaxScore top-k pruning
+
+A read-only snapshot of a keyword index laid out for speed:
+
+    terms     sorted vocabulary (fixed-width bytes, binary-searched)
+    indptr    CSR row pointers: postings of term t are indptr[t]:indptr[t + 1]
+    docs      document numbers of every posting (sorted within a term)
+    weights   precomputed idf * BM25 term-frequency factor per posting
+    max_weight  best weight per term (upper bound for MaxScore)
+
+A query adds up NumPy slices of `weights` instead of looping over chunks.
+Terms are processed from the highest upper bound down; once the terms
+left can no longer lift an unseen chunk into the top-k (MaxScore), the
+rest only update the surviving candidates via binary search, so very
+common words cost almost nothing. The final top-k uses argpartition.
+
+save()/load() use plain .npy files, and load() memory-maps them, so a big
+index opens instantly and several processes share one copy in the page cache.
+"""
+
+import json
+import os
+import threading
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from hybrid_search import tokenize
+
+
+# Longer tokens are cut (keeps the vocabulary array fixed-width)
+MAX_TERM_BYTES = 32
+
+
+def term_key(term: str) -> bytes:
+    return term.encode("utf-8")[:MAX_TERM_BYTES]
+
+
+class CompiledBM25:
+    """
+    Read-only BM25 index over a CSR postings matrix
+
+    Usage:
+        engine = CompiledBM25.build(ids, texts)
+        engine.search("return policy", k=10)     # -> [(id, score)]
+        engine.save("bm25_index")
+        engine = CompiledBM25.load("bm25_index")   # memory-mapped
+    """
+
+    def __init__(self, ids, terms, indptr, docs, weights, max_weight, meta: dict):
+        self.ids = ids
+        self.terms = terms
+        self.indptr = indptr
+        self.docs = docs
+        self.weights = weights
+        self.max_weight = max_weight
+        self.meta = meta
+        # Per-thread scratch arrays (reset after each query, never reallocated)
+        self._scratch = threading.local()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # ----- building -----
+
+    @classmethod
+    def from_coo(cls, ids: list, vocabulary: list, term_index, doc_index, tf, doc_len,
+                 k1: float = 1.5, b: float = 0.75):
+        """
+        Compile (term, document, tf) triples
+
+        Args:
+            ids: External ID per document number
+            vocabulary: Term strings (term_index points into this list)
+            term_index: Term number per triple
+            doc_index: Document number per triple
+            tf: Term frequency per triple
+            doc_len: Token count per document number
+        """
+        n_docs = len(ids)
+        doc_len = np.asarray(doc_len, dtype=np.float32)
+        avgdl = float(doc_len.mean()) if n_docs else 0.0
+
+        # Sorted, truncated vocabulary; terms that collide after truncation merge
+        keys, remap = np.unique(np.array([term_key(term) for term in vocabulary], dtype=f"S{MAX_TERM_BYTES}"),
+                                return_inverse=True)
+        term_index = remap[np.asarray(term_index, dtype=np.int64)]
+
+        # Sort by (term, document) and add up duplicates (few temporaries: this
+        # runs over every token of the corpus)
+        width = max(n_docs, 1)
+        pair = term_index * width
+        del term_index
+        pair += np.asarray(doc_index, dtype=np.int64)
+        order = np.argsort(pair, kind="stable")
+        pair = pair[order]
+        tfs = np.asarray(tf, dtype=np.float32)[order]
+        del order
+        starts = np.flatnonzero(np.concatenate(([len(pair) > 0], pair[1:] != pair[:-1])))
+        tfs = np.add.reduceat(tfs, starts) if len(starts) else tfs
+        pair = pair[starts]
+        del starts
+        docs = (pair % width).astype(np.int32)
+        counts = np.bincount(pair // width, minlength=len(keys))
+        del pair
+
+        indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(counts)
+        return cls._finish(ids, keys, indptr, docs, tfs, doc_len, avgdl, k1, b)
+
+    @classmethod
+    def from_postings(cls, ids: list, postings: dict, doc_len: list, k1: float = 1.5, b: float = 0.75):
+        """
+        Compile term -> {doc number: tf} postings
+
+        Args:
+            ids: External ID per document number
+            postings: term -> {doc number: term frequency}
+            doc_len: Token count per document number
+        """
+        vocabulary = list(postings)
+        sizes = [len(postings[term]) for term in vocabulary]
+        total = sum(sizes)
+        term_index = np.repeat(np.arange(len(vocabulary), dtype=np.int64), sizes)
+        doc_index = np.fromiter((d for term in vocabulary for d in postings[term]), dtype=np.int64, count=total)
+        tf = np.fromiter((f for term in vocabulary for f in postings[term].values()), dtype=np.float32, count=total)
+        return cls.from_coo(ids, vocabulary, term_index, doc_index, tf, doc_len, k1, b)
+
+    @classmethod
+    def build(cls, ids: list, texts: list, k1: float = 1.5, b: float = 0.75):
+        """Tokenize and compile a list of texts"""
+        vocabulary = {}
+        term_index, doc_index, tf, doc_len = array("q"), array("q"), array("f"), array("q")
+        for number, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            for term, count in counts.items():
+                term_index.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_index.append(number)
+                tf.append(count)
+            doc_len.append(sum(counts.values()))
+        return cls.from_coo(ids, list(vocabulary), np.frombuffer(term_index, dtype=np.int64),
+                            np.frombuffer(doc_index, dtype=np.int64), np.frombuffer(tf, dtype=np.float32),
+                            np.frombuffer(doc_len, dtype=np.int64), k1, b)
+
+    @classmethod
+    def _finish(cls, ids, keys, indptr, docs, tfs, doc_len, avgdl, k1, b):
+        n_docs = len(ids)
+        df = np.diff(indptr).astype(np.float32)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        # weight = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+        if avgdl:
+            norm = k1 * (1 - b + b * doc_len[docs] / avgdl)
+        else:
+            norm = np.full(len(docs), k1, dtype=np.float32)
+        term_of_posting = np.repeat(np.arange(len(keys)), np.diff(indptr))
+        weights = (idf[term_of_posting] * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32)
+        del norm, term_of_posting
+
+        max_weight = np.zeros(len(keys), dtype=np.float32)
+        nonempty = np.diff(indptr) > 0
+        max_weight[nonempty] = np.maximum.reduceat(weights, indptr[:-1][nonempty])
+
+        meta = {"k1": k1, "b": b, "avgdl": avgdl, "n_docs": n_docs, "n_terms": len(keys)}
+        return cls(np.asarray(ids), keys, indptr, docs, weights, max_weight, meta)
+
+    # ----- on disk -----
+
+    def save(self, directory: str):
+        """Write the index as .npy files (+ meta.json) into a directory"""
+        os.makedirs(directory, exist_ok=True)
+        for name in ("ids", "terms", "indptr", "docs", "weights", "max_weight"):
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True):
+        """Open a saved index (memory-mapped: nothing is read until queried)"""
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+            for name in ("ids", "terms", "indptr", "docs", "weights", "max_weight")
+        }
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(meta=meta, **arrays)
+
+    # ----- searching -----
+
+    def _term_ids(self, query: str) -> Counter:
+        """Query terms that exist in the vocabulary -> query term frequency"""
+        found = Counter()
+        for term, count in Counter(tokenize(query)).items():
+            key = term_key(term)
+            t = int(np.searchsorted(self.terms, key))
+            if t < len(self.terms) and self.terms[t] == key:
+                found[t] += count
+        return found
+
+    def _buffers(self):
+        scratch = self._scratch
+        if getattr(scratch, "scores", None) is None:
+            scratch.scores = np.zeros(len(self.ids), dtype=np.float32)
+            scratch.seen = np.zeros(len(self.ids), dtype=bool)
+        return scratch.scores, scratch.seen
+
+    def search(self, query: str, k: int = 10) -> list:
+        """
+        Exact BM25 top-k (same scores as hybrid_search.BM25Index)
+
+        Returns:
+            [(id, score)] best first
+        """
+        query_terms = self._term_ids(query)
+        if not query_terms or not len(self.ids):
+            return []
+
+        # Highest possible contribution of each term, best first
+        terms = list(query_terms)
+        upper = np.array([self.max_weight[t] * query_terms[t] for t in terms], dtype=np.float32)
+        order = np.argsort(-upper)
+        # remaining_after[i]: most the terms after the i-th can still add (exactly 0 at the end)
+        remaining_after = np.append(np.cumsum(upper[order][::-1].astype(np.float64))[::-1][1:], 0.0)
+
+        scores, seen = self._buffers()
+        touched = []
+        candidates = None       # set once MaxScore pruning kicks in
+        threshold = 0.0
+        try:
+            for i, position in enumerate(order):
+                t = terms[position]
+                remaining = remaining_after[i]
+                start, end = self.indptr[t], self.indptr[t + 1]
+                docs = self.docs[start:end]
+                weights = self.weights[start:end] * query_terms[t]
+
+                if candidates is None:
+                    # Essential term: every posting may still reach the top-k
+                    scores[docs] += weights
+                    new = docs[~seen[docs]]
+                    seen[new] = True
+                    touched.append(new)
+                    seen_count = sum(len(chunk) for chunk in touched)
+                    if seen_count >= k:
+                        pool = np.concatenate(touched)
+                        threshold = float(np.partition(scores[pool], -k)[-k])
+                        # Terms left can't lift an unseen chunk past the k-th score
+                        if remaining < threshold:
+                            candidates = pool[scores[pool] + remaining >= threshold]
+                else:
+                    # Non-essential term: only update the surviving candidates
+                    hits = np.searchsorted(docs, candidates)
+                    hits[hits == len(docs)] = 0
+                    matched = docs[hits] == candidates if len(docs) else np.zeros(len(candidates), dtype=bool)
+                    scores[candidates[matched]] += weights[hits[matched]]
+                    if len(candidates) > k:
+                        threshold = float(np.partition(scores[candidates], -k)[-k])
+                        candidates = candidates[scores[candidates] + remaining >= threshold]
+
+            pool = candidates if candidates is not None else np.concatenate(touched)
+            pool_scores = scores[pool]
+            if len(pool) > k:
+                top = np.argpartition(pool_scores, -k)[-k:]
+                pool, pool_scores = pool[top], pool_scores[top]
+            best = np.argsort(-pool_scores, kind="stable")
+            return [(self.ids[pool[i]].item(), float(pool_scores[i])) for i in best]
+        finally:
+            # Reset only what this query wrote
+            for chunk in touched:
+                scores[chunk] = 0.0
+                seen[chunk] = False
@@ -0,0 +1,68 @@
+"""
+Build Index - Build the knowledge index once and publish it for all workers
+
+The builder side of multi-worker mode (see shared_index.py). It runs the
+normal ingestion (only new or changed chunks are embedded, chroma_db/
+stays the builder's working store) and publishes a read-only snapshot
+into SHARED_INDEX_DIR. Workers started with the same SHARED_INDEX_DIR
+memory-map it and switch to each new generation without a restart.
+
+Run from the voice/ folder:
+    python build_index.py                                 # once
+    python build_index.py --watch 60                      # re-check the files every minute
+    SHARED_INDEX_DIR=shared_index uvicorn app:app --workers 4
+"""
+
+import argparse
+import os
+import time
+
+# Publish where the workers look; the builder itself must not open the shared index
+OUT_DIR = os.getenv("SHARED_INDEX_DIR") or "shared_index"
+os.environ["SHARED_INDEX_DIR"] = ""
+
+import voice_assistant  # noqa: E402
+from shared_index import publish_snapshot  # noqa: E402
+from streaming_loader import expand_paths  # noqa: E402
+
+
+def knowledge_files(knowledge_path: str) -> list:
+    """Files to index right now: the knowledge base plus knowledge/ (only ones that exist)"""
+    specs = [knowledge_path]
+    if os.path.isdir(voice_assistant.KNOWLEDGE_DIR):
+        specs.append(voice_assistant.KNOWLEDGE_DIR)
+    return [path for path in expand_paths(specs) if os.path.isfile(path)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("knowledge_path", nargs="?", default="knowledge_base.txt",
+                        help="Knowledge base file, directory or glob (plus knowledge/)")
+    parser.add_argument("--out", default=OUT_DIR, help="Folder the workers read (their SHARED_INDEX_DIR)")
+    parser.add_argument("--keep", type=int, default=2, help="Generations kept on disk")
+    parser.add_argument("--watch", type=float, default=0,
+                        help="Seconds between re-ingestion runs (0 = build once and exit)")
+    args = parser.parse_args()
+
+    index = voice_assistant.build_knowledge_index(args.knowledge_path)
+    path = publish_snapshot(index, args.out, keep=args.keep)
+    print(f"Published {path} ({index.stats.total} chunks)")
+
+    # build_knowledge_index() already dropped files deleted while the builder was down
+    while args.watch:
+        time.sleep(args.watch)
+        paths = knowledge_files(args.knowledge_path)
+        # Files with chunks in the index that are gone now: drop their chunks too
+        gone = sorted(index.indexed_sources() - set(paths))
+        removed = index.remove_sources(gone).deleted if gone else 0
+        progress = voice_assistant.ingest_pipeline.run(paths)
+        voice_assistant.finish_index_update()
+        # Unchanged files: keep serving the current generation
+        if progress.chunks_embedded or progress.chunks_deleted or removed:
+            path = publish_snapshot(index, args.out, keep=args.keep)
+            print(f"Published {path} ({index.stats.total} chunks"
+                  + (f", {len(gone)} deleted file(s)" if gone else "") + ")")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Embedding Service - Micro-batched, cached query embeddings
+
+Each question used to be embedded on its own: 200 concurrent requests meant
+200 embedding round-trips. QueryEmbedder sends concurrent questions through
+a MicroBatcher instead: they are collected for up to max_wait_ms (or until
+max_batch_size are waiting), embedded with one embed_documents() call, and
+every caller gets its own vector back.
+
+    cache       LRU of recent question -> vector (the answer cache and the
+                retriever share one embedding per question)
+    in flight   a question that is already queued is not queued again:
+                callers asking it at the same time share one Future
+    histogram   batch size -> number of calls, to see the batching happen
+
+Batches go through embed_documents(), which gives the same vectors as
+embed_query() for OpenAI and plain sentence-transformers models (not for
+models that prefix queries with an instruction).
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from micro_batch import MicroBatcher
+
+
+class QueryEmbedder:
+    """
+    Shared query embedding front end for one embeddings model
+
+    Usage:
+        embedder = QueryEmbedder(OpenAIEmbeddings(), max_batch_size=64, max_wait_ms=5)
+        vector = embedder.embed_query("What is the return policy?")
+        vector = await embedder.aembed_query("What is the return policy?")
+        embedder.get_stats()["batches"]["batch_size_histogram"]
+
+    max_wait_ms is the most a lone question waits for company; raise it
+    (and max_batch_size) when requests arrive in bursts, lower it for
+    lowest single-request latency. workers = embedding calls in flight.
+    """
+
+    def __init__(self, embeddings, max_batch_size: int = 64, max_wait_ms: float = 5,
+                 cache_entries: int = 1024, workers: int = 4):
+        self.embeddings = embeddings
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()     # question -> vector, oldest first
+        self._in_flight = {}            # question -> Future, while it is queued
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "shared": 0, "calls": 0, "call_seconds": 0.0}
+        self.batcher = MicroBatcher(
+            self._embed_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            workers=workers,
+            name="query-embed"
+        )
+
+    def _embed_batch(self, queries: list) -> list:
+        """MicroBatcher handler: one embedding call for the whole batch"""
+        start = time.perf_counter()
+        try:
+            vectors = self.embeddings.embed_documents(queries)
+        finally:
+            with self._lock:
+                # A failed batch is not remembered: the next caller retries it
+                for query in queries:
+                    self._in_flight.pop(query, None)
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["call_seconds"] += time.perf_counter() - start
+            for query, vector in zip(queries, vectors):
+                self._cache[query] = vector
+                self._cache.move_to_end(query)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return vectors
+
+    def _lookup(self, query: str):
+        """(cached vector, None) or (None, Future of the vector)"""
+        with self._lock:
+            vector = self._cache.get(query)
+            if vector is not None:
+                self._cache.move_to_end(query)
+                self.stats["hits"] += 1
+                return vector, None
+            future = self._in_flight.get(query)
+            if future is None:
+                self.stats["misses"] += 1
+                future = self._in_flight[query] = self.batcher.submit(query)
+            else:
+                self.stats["shared"] += 1
+            return None, future
+
+    def embed_query(self, query: str) -> list:
+        """Embed a question (cached, batched with concurrent questions)"""
+        vector, future = self._lookup(query)
+        return vector if future is None else future.result()
+
+    async def aembed_query(self, query: str) -> list:
+        """Async version of embed_query (doesn't block the event loop)"""
+        vector, future = self._lookup(query)
+        return vector if future is None else await asyncio.wrap_future(future)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"] + self.stats["shared"]
+            calls = self.stats["calls"]
+            cache = {
+                "hits": self.stats["hits"],
+                "misses": self.stats["misses"],
+                "shared": self.stats["shared"],
+                "entries": len(self._cache),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            }
+            mean_call_ms = self.stats["call_seconds"] / calls * 1000 if calls else 0.0
+        return {
+            "cache": cache,
+            "batches": self.batcher.get_stats(),
+            "mean_call_ms": mean_call_ms,
+        }
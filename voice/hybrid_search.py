@@ -0,0 +1,256 @@
+"""
+Hybrid Search - BM25 keyword search + dense vectors, fused
+
+The notebook version (Advanced_RAG/02_hybrid_search_bm25_dense.ipynb)
+rebuilds BM25Okapi over Python lists and scores every chunk for every
+query. Here the keyword side is an inverted index kept up to date as
+chunks are added and removed: term document frequencies and document
+lengths are maintained incrementally, and a query only touches the
+postings of its own terms.
+
+The retriever runs the keyword and vector searches at the same time and
+fuses them with Reciprocal Rank Fusion (or a weighted sum of normalized
+scores), so exact terms ("QLoRA", order numbers, product names) and
+paraphrases both find their chunks.
+"""
+
+import asyncio
+import heapq
+import math
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from langchain_core.retrievers import BaseRetriever
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Keyword searches run next to the (network-bound) query embedding
+_sparse_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="bm25")
+
+
+def tokenize(text: str) -> list:
+    """Lowercase words (punctuation dropped, so "LoRA?" matches "lora")"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Incrementally updatable BM25 inverted index
+
+    Usage:
+        bm25 = BM25Index()
+        bm25.add(["id1", "id2"], ["first chunk", "second chunk"])
+        bm25.remove(["id1"])
+        bm25.search("chunk", k=5)    # -> [("id2", 0.42)]
+
+    Not thread-safe on its own: KnowledgeIndex updates it under its write
+    lock and HybridRetriever searches it under the read lock.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}      # term -> {doc_id: term frequency}
+        self.doc_len = {}       # doc_id -> number of tokens
+        self.doc_terms = {}     # doc_id -> its distinct terms (to remove it again)
+        self.total_len = 0
+        self.compiled = None    # CompiledBM25 snapshot, dropped on every change
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def add(self, ids: list, texts: list):
+        """Index chunks (an ID that is already indexed is replaced)"""
+        self.compiled = None
+        for doc_id, text in zip(ids, texts):
+            if doc_id in self.doc_len:
+                self.remove([doc_id])
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+            length = sum(counts.values())
+            self.doc_len[doc_id] = length
+            self.doc_terms[doc_id] = tuple(counts)
+            self.total_len += length
+
+    def remove(self, ids: list):
+        """Drop chunks from the index (unknown IDs are ignored)"""
+        self.compiled = None
+        for doc_id in ids:
+            length = self.doc_len.pop(doc_id, None)
+            if length is None:
+                continue
+            self.total_len -= length
+            for term in self.doc_terms.pop(doc_id):
+                posting = self.postings[term]
+                del posting[doc_id]
+                if not posting:
+                    del self.postings[term]
+
+    def idf(self, term: str) -> float:
+        """BM25 idf from the live document frequency (Lucene variant, never negative)"""
+        df = len(self.postings.get(term, ()))
+        n = len(self.doc_len)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def compile(self):
+        """
+        Build a vectorized read-only snapshot (bm25_engine.CompiledBM25)
+
+        search() uses it until the next add/remove. Worth it for big
+        indexes that change rarely (call again after each batch of updates).
+        """
+        from bm25_engine import CompiledBM25
+
+        ids = list(self.doc_len)
+        number = {doc_id: i for i, doc_id in enumerate(ids)}
+        postings = {
+            term: {number[doc_id]: tf for doc_id, tf in posting.items()}
+            for term, posting in self.postings.items()
+        }
+        self.compiled = CompiledBM25.from_postings(ids, postings, [self.doc_len[doc_id] for doc_id in ids],
+                                                   self.k1, self.b)
+        return self.compiled
+
+    def search(self, query: str, k: int = 10) -> list:
+        """
+        Top-k chunks for a query
+
+        Returns:
+            [(doc_id, score)] best first; only chunks sharing a term with
+            the query are scored
+        """
+        compiled = self.compiled
+        if compiled is not None:
+            return compiled.search(query, k)
+        if not self.doc_len:
+            return []
+        avgdl = self.total_len / len(self.doc_len)
+        k1, b = self.k1, self.b
+        doc_len = self.doc_len
+
+        scores = {}
+        for term, query_tf in Counter(tokenize(query)).items():
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            weight = self.idf(term) * (k1 + 1) * query_tf
+            for doc_id, tf in posting.items():
+                norm = k1 * (1 - b + b * doc_len[doc_id] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * tf / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def rrf_fuse(rankings: list, weights: list = None, rrf_k: int = 60) -> list:
+    """
+    Reciprocal Rank Fusion
+
+    Args:
+        rankings: One list of IDs per search, best first
+        weights: Optional weight per search (equal by default)
+        rrf_k: Damping constant (60 is the usual value)
+
+    Returns:
+        [(id, fused score)] best first
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def score_fuse(results: list, weights: list) -> list:
+    """
+    Weighted sum of min-max normalized scores
+
+    Args:
+        results: One list of (id, score) per search, higher score = better
+        weights: Weight per search
+
+    Returns:
+        [(id, fused score)] best first
+    """
+    fused = {}
+    for scored, weight in zip(results, weights):
+        if not scored:
+            continue
+        low = min(score for _, score in scored)
+        high = max(score for _, score in scored)
+        for doc_id, score in scored:
+            normalized = (score - low) / (high - low) if high > low else 1.0
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight * normalized
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    BM25 + dense search over a KnowledgeIndex, fused
+
+    Usage:
+        index.enable_keyword_index(BM25Index())
+        retriever = HybridRetriever(index=index, k=3)
+        retriever.invoke("What is your return policy?")
+
+    fusion="rrf" fuses ranks (robust, the default); fusion="weighted" fuses
+    normalized scores. sparse_weight sets the keyword share in both.
+    """
+
+    index: Any      # KnowledgeIndex, or a shared_index.SharedIndex in multi-worker mode
+    k: int = 3
+    candidates: int = 0         # per search; 0 = 3 * k (as in the notebook)
+    fusion: str = "rrf"
+    sparse_weight: float = 0.5
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> list:
+        # The keyword search runs while we wait for the embedding API
+        sparse = _sparse_executor.submit(self._sparse_search, query)
+        dense = self._dense_search(self.index.embed_query(query))
+        return self._fuse(dense, sparse.result())
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> list:
+        async def dense():
+            query_vector = await self.index.aembed_query(query)
+            return await asyncio.to_thread(self._dense_search, query_vector)
+
+        dense_results, sparse_results = await asyncio.gather(
+            dense(),
+            asyncio.to_thread(self._sparse_search, query)
+        )
+        return await asyncio.to_thread(self._fuse, dense_results, sparse_results)
+
+    def _num_candidates(self) -> int:
+        return self.candidates or 3 * self.k
+
+    def _sparse_search(self, query: str) -> list:
+        with self.index.lock.read():
+            return self.index.keyword_index.search(query, k=self._num_candidates())
+
+    def _dense_search(self, query_vector: list) -> list:
+        results = self.index.search_by_vector(query_vector, self._num_candidates())
+        return [(doc.id, score, doc) for doc, score in results]
+
+    def _fuse(self, dense: list, sparse: list) -> list:
+        weights = [1 - self.sparse_weight, self.sparse_weight]
+        if self.fusion == "weighted":
+            fused = score_fuse([[(doc_id, score) for doc_id, score, _ in dense], sparse], weights)
+        else:
+            fused = rrf_fuse(
+                [[doc_id for doc_id, _, _ in dense], [doc_id for doc_id, _ in sparse]],
+                weights=weights,
+                rrf_k=self.rrf_k
+            )
+        top_ids = [doc_id for doc_id, _ in fused[:self.k]]
+
+        # Dense hits come with their Documents, keyword-only hits are fetched
+        docs = {doc_id: doc for doc_id, _, doc in dense}
+        missing = [doc_id for doc_id in top_ids if doc_id not in docs]
+        if missing:
+            docs.update(zip(missing, self.index.get_documents(missing)))
+        return [docs[doc_id] for doc_id in top_ids if docs.get(doc_id) is not None]
@@ -0,0 +1,396 @@
+"""
+Ingestion - Batched, parallel, rate-limited embedding of knowledge files
+
+Files stream through four stages instead of being loaded and embedded in
+one shot:
+
+    load + split   (background thread, chunk by chunk, a little ahead)
+    diff           (chunk IDs checked against the index as they stream past)
+    embed          (batches on a bounded worker pool, rate limited, retried)
+    upsert         (per file, once all of its chunks are embedded)
+
+Only a bounded number of chunks and embedding batches are in flight at any
+time, so memory stays flat however big the corpus (or a single file) is;
+per file only the chunk IDs are kept, to find chunks that disappeared.
+A file's new chunks are held back (beyond stage_chunks of them, in a
+staging collection on disk) and written together with the deletion of its
+stale chunks in one KnowledgeIndex write: readers see the old or the new
+version of a file, never both. If a run fails, files already finished stay
+updated and the file in progress is left as it was.
+"""
+
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+
+import openai
+
+from knowledge_index import ADD_BATCH_SIZE, document_id
+
+
+# Errors worth retrying: rate limits, timeouts, dropped connections, 5xx
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket (e.g. tokens or requests per minute)
+
+    acquire() takes what it needs straight away and sleeps off any debt, so
+    callers are served in arrival order and the long-run rate never exceeds
+    rate_per_minute. A rate of 0 means unlimited.
+    """
+
+    def __init__(self, rate_per_minute: float, burst_seconds: float = 10):
+        self.rate = rate_per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1) -> float:
+        """Take `amount` tokens, returns how many seconds we had to wait"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = max(0.0, -self._tokens / self.rate)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+def retry_with_backoff(fn, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                       retry_on: tuple = RETRYABLE_ERRORS, on_retry=None):
+    """
+    Call fn(), retrying retryable errors with exponential backoff + jitter
+
+    Args:
+        fn: Function with no arguments
+        max_retries: Retries after the first attempt
+        base_delay: Delay before the first retry (doubles every time)
+        max_delay: Upper bound for one delay
+        retry_on: Exception types to retry (anything else is raised at once)
+        on_retry: Optional callback(attempt, error, delay)
+
+    Returns:
+        What fn() returns
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except retry_on as error:
+            if attempt == max_retries:
+                raise
+            # "Full jitter": spread the retries of parallel workers apart
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            if on_retry:
+                on_retry(attempt + 1, error, delay)
+            time.sleep(delay)
+
+
+class SourceStage:
+    """New chunks of one file, held back until the whole file is embedded"""
+
+    def __init__(self):
+        self.ids = []
+        self.vectors = []
+        self.docs = []
+        self.staging = None     # staging collection, once the file outgrows memory
+
+    def add(self, cid: str, vector: list, doc):
+        self.ids.append(cid)
+        self.vectors.append(vector)
+        self.docs.append(doc)
+
+    def spill(self, index):
+        """Move the chunks held in memory to the staging collection"""
+        if self.staging is None:
+            self.staging = index.create_staging()
+        for start in range(0, len(self.ids), ADD_BATCH_SIZE):
+            end = start + ADD_BATCH_SIZE
+            self.staging.upsert(
+                ids=self.ids[start:end],
+                embeddings=self.vectors[start:end],
+                documents=[doc.page_content for doc in self.docs[start:end]],
+                metadatas=[doc.metadata or None for doc in self.docs[start:end]],
+            )
+        self.ids, self.vectors, self.docs = [], [], []
+
+    def commit(self, index, stale_ids: list, hits: int):
+        """Write the new chunks and delete the stale ones in one step"""
+        if self.staging is None:
+            return index.write(self.ids, self.vectors, self.docs, stale_ids, hits=hits)
+        self.spill(index)
+        staging, self.staging = self.staging, None
+        return index.write_staged(staging, stale_ids, hits=hits)
+
+    def discard(self, index):
+        if self.staging is not None:
+            index.drop_staging(self.staging)
+            self.staging = None
+
+
+@dataclass
+class IngestProgress:
+    """Counters for one ingestion run"""
+    sources_total: int = 0
+    sources_done: int = 0
+    chunks_reused: int = 0          # already embedded on disk
+    chunks_embedded: int = 0
+    chunks_deleted: int = 0
+    batches: int = 0
+    retries: int = 0
+    rate_limited_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+    chunks_per_second: float = 0.0  # embedding throughput
+    running: bool = False
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class IngestionPipeline:
+    """
+    Stream files into a KnowledgeIndex with batched parallel embedding
+
+    Usage:
+        pipeline = IngestionPipeline(index, load=lambda path: iter_chunks(path, splitter))
+        progress = pipeline.run(paths)
+        print(progress.chunks_per_second)
+    """
+
+    def __init__(self, index, load, batch_size: int = 256, workers: int = 4,
+                 tokens_per_minute: float = 0, requests_per_minute: float = 0,
+                 max_retries: int = 5, prefetch_chunks: int = 1024, stage_chunks: int = 2048,
+                 log_every_seconds: float = 5):
+        """
+        Args:
+            index: KnowledgeIndex to update
+            load: Function path -> iterable of chunk Documents (load + split one file)
+            batch_size: Chunks per embedding request
+            workers: Embedding requests in flight at once
+            tokens_per_minute: Embedding token budget (0 = unlimited)
+            requests_per_minute: Embedding request budget (0 = unlimited)
+            max_retries: Retries per batch on rate limits / network errors
+            prefetch_chunks: How many chunks may be loaded ahead of the embedder
+            stage_chunks: Embedded chunks of one file kept in memory until it is
+                          finished (more go to a staging collection)
+            log_every_seconds: How often progress is printed
+        """
+        self.index = index
+        self.load = load
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_retries = max_retries
+        self.prefetch_chunks = prefetch_chunks
+        self.stage_chunks = stage_chunks
+        self.log_every_seconds = log_every_seconds
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.request_bucket = TokenBucket(requests_per_minute)
+
+        self.progress = IngestProgress()
+        self._stages = {}                   # source -> SourceStage of files not finished yet
+        self._lock = threading.Lock()       # workers update the counters too
+        self._started = 0.0
+        self._last_log = 0.0
+
+    def run(self, paths: list) -> IngestProgress:
+        """
+        Load, split, embed and upsert these files
+
+        Returns:
+            IngestProgress for the run (also available as .progress while it runs)
+        """
+        self.progress = IngestProgress(sources_total=len(paths), running=True)
+        self._started = self._last_log = time.perf_counter()
+
+        # Embedding batches and "source finished" markers, in order
+        in_flight = deque()
+        batch = []
+        # Markers of files whose last chunks are still in `batch`: they go after it
+        waiting = []
+
+        def submit():
+            nonlocal batch
+            in_flight.append(self._submit(executor, batch))
+            in_flight.extend(waiting)
+            batch = []
+            waiting.clear()
+
+        try:
+            # One update at a time: the diff must still be true when it's written
+            with self.index.update_lock, ThreadPoolExecutor(self.workers, thread_name_prefix="embed") as executor:
+                for source, chunks in self._load_ahead(paths):
+                    # Diff as the chunks stream past: only the IDs are remembered
+                    existing = self.index.indexed_ids(source)
+                    seen = set()
+                    hits = 0
+                    for chunk in chunks:
+                        cid = document_id(chunk, self.index.fingerprint)
+                        if cid in seen:
+                            continue
+                        seen.add(cid)
+                        if cid in existing:
+                            hits += 1
+                            continue
+                        batch.append((cid, chunk, source))
+                        if len(batch) == self.batch_size:
+                            submit()
+                            # Backpressure: never more than 2 batches per worker queued
+                            while len(in_flight) > 2 * self.workers:
+                                self._finish(in_flight.popleft())
+
+                    # The file is written (and its stale chunks deleted) once all its batches are embedded
+                    marker = ("source_done", source, list(existing - seen), hits)
+                    (waiting if batch else in_flight).append(marker)
+
+                if batch:
+                    submit()
+                while in_flight:
+                    self._finish(in_flight.popleft())
+        finally:
+            # A failed run leaves the unfinished files untouched
+            for stage in self._stages.values():
+                stage.discard(self.index)
+            self._stages = {}
+            self.progress.running = False
+            self._update_timing()
+        self._log(force=True)
+        return self.progress
+
+    # ----- stages -----
+
+    def _load_ahead(self, paths: list):
+        """
+        Yield (source, chunk iterator) per file, reading ahead on a background thread
+
+        At most prefetch_chunks chunks are buffered, so a slow embedder
+        holds back the loader instead of letting it fill memory.
+        """
+        loaded = queue.Queue(maxsize=self.prefetch_chunks)
+        end_of_file = object()
+        done = object()
+        stop = threading.Event()
+
+        def loader():
+            try:
+                for path in paths:
+                    loaded.put(path)
+                    for chunk in self.load(path):
+                        if stop.is_set():
+                            return
+                        loaded.put(chunk)
+                    loaded.put(end_of_file)
+            except Exception as error:
+                loaded.put(error)
+            loaded.put(done)
+
+        def chunks():
+            while True:
+                item = loaded.get()
+                if item is end_of_file:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+
+        thread = threading.Thread(target=loader, name="ingest-loader", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = loaded.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item, chunks()
+        finally:
+            # Unblock the loader if we stopped early
+            stop.set()
+            while thread.is_alive():
+                try:
+                    loaded.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    def _submit(self, executor, batch: list):
+        texts = [chunk.page_content for _, chunk, _ in batch]
+        return "batch", executor.submit(self._embed_batch, texts), batch
+
+    def _embed_batch(self, texts: list) -> list:
+        # ~4 characters per token is close enough for budgeting
+        waited = self.request_bucket.acquire(1)
+        waited += self.token_bucket.acquire(sum(len(text) for text in texts) / 4)
+
+        def on_retry(attempt, error, delay):
+            with self._lock:
+                self.progress.retries += 1
+            print(f"Embedding batch failed ({type(error).__name__}), retry {attempt} in {delay:.1f}s")
+
+        vectors = retry_with_backoff(
+            lambda: self.index.embeddings.embed_documents(texts),
+            max_retries=self.max_retries,
+            on_retry=on_retry
+        )
+        with self._lock:
+            self.progress.batches += 1
+            self.progress.chunks_embedded += len(texts)
+            self.progress.rate_limited_seconds += waited
+        return vectors
+
+    def _finish(self, item: tuple):
+        """Handle one finished stage item: stage an embedded batch, or write a finished source"""
+        if item[0] == "batch":
+            _, future, batch = item
+            for (cid, chunk, source), vector in zip(batch, future.result()):
+                stage = self._stages.setdefault(source, SourceStage())
+                stage.add(cid, vector, chunk)
+                if len(stage.ids) >= self.stage_chunks:
+                    stage.spill(self.index)
+        else:
+            _, source, stale_ids, hits = item
+            stage = self._stages.pop(source, None) or SourceStage()
+            change = stage.commit(self.index, stale_ids, hits=hits)
+            with self._lock:
+                self.progress.sources_done += 1
+                self.progress.chunks_reused += change.hits
+                self.progress.chunks_deleted += change.deleted
+        self._log()
+
+    # ----- progress -----
+
+    def get_stats(self) -> dict:
+        if self.progress.running:
+            self._update_timing()
+        return self.progress.as_dict()
+
+    def _update_timing(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self._started
+            self.progress.elapsed_seconds = round(elapsed, 2)
+            self.progress.chunks_per_second = round(self.progress.chunks_embedded / elapsed, 1) if elapsed else 0.0
+
+    def _log(self, force: bool = False):
+        now = time.perf_counter()
+        if not force and now - self._last_log < self.log_every_seconds:
+            return
+        self._last_log = now
+        self._update_timing()
+        p = self.progress
+        print(f"Ingest: {p.sources_done}/{p.sources_total} files, {p.chunks_embedded} embedded, "
+              f"{p.chunks_reused} cached, {p.chunks_per_second} chunks/s")
@@ -0,0 +1,486 @@
+"""
+Knowledge Index - Persistent, content-hashed vector store for the RAG pipeline
+
+Every chunk gets an ID built from a hash of its text, its source file, the
+splitter settings and the embedding model. The Chroma collection lives on disk, so a
+restart only opens the directory and embeds chunks it has never seen.
+
+Sources (files) can be added, edited or removed while the server runs:
+only the changed chunks are embedded, and the swap happens under a write
+lock so a reader never sees half of an update.
+"""
+
+import asyncio
+import hashlib
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Any
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from embedding_service import QueryEmbedder
+
+
+# Chroma rejects very large single writes, so we write chunks in batches
+ADD_BATCH_SIZE = 1000
+
+# Collections holding a large file's new chunks until the whole file is embedded
+STAGING_PREFIX = "staging-"
+
+@dataclass
+class IndexStats:
+    """Chunk counts (hits = reused from disk, misses = had to embed)"""
+    hits: int = 0       # chunks already embedded on disk
+    misses: int = 0     # chunks we had to embed
+    deleted: int = 0    # stale chunks removed from the collection
+    total: int = 0      # chunks in the collection
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class SourceUpdate:
+    """What has to change in the collection to bring one source up to date"""
+    source: str
+    new_chunks: dict        # chunk ID -> Document still to embed
+    stale_ids: list         # chunk IDs no longer in the source
+    hits: int = 0           # chunks already embedded on disk
+
+
+def index_fingerprint(chunk_size: int, chunk_overlap: int, embedding_model: str) -> str:
+    """
+    Describe everything (besides the text) that changes a chunk's vector
+
+    Args:
+        chunk_size: Splitter chunk size
+        chunk_overlap: Splitter chunk overlap
+        embedding_model: Name of the embedding model
+
+    Returns:
+        Fingerprint string mixed into every chunk ID
+    """
+    return f"size={chunk_size}|overlap={chunk_overlap}|model={embedding_model}"
+
+
+def chunk_id(text: str, fingerprint: str) -> str:
+    """Content hash of a chunk under the given index settings"""
+    return hashlib.sha256(f"{fingerprint}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def document_id(doc: Document, fingerprint: str) -> str:
+    """
+    Chunk ID of a Document
+
+    The source is part of the hash: two files sharing a chunk's text get a
+    row each, so syncing or removing one file never touches the other's copy.
+    A child chunk (metadata["parent_id"] set) also hashes its parent ID, so
+    the same child text under an edited parent is re-indexed with the new
+    parent instead of being reused with a link to the old one.
+    """
+    fingerprint = f"{fingerprint}|source={doc.metadata.get('source', '')}"
+    parent_id = doc.metadata.get("parent_id")
+    if parent_id is not None:
+        fingerprint = f"{fingerprint}|parent={parent_id}"
+    return chunk_id(doc.page_content, fingerprint)
+
+
+def collection_name_for(embedding_model: str) -> str:
+    """One collection per embedding model (vector sizes differ between models)"""
+    # Chroma only allows [a-zA-Z0-9._-] in collection names
+    safe_model = re.sub(r"[^a-zA-Z0-9._-]", "-", embedding_model)
+    return f"knowledge-{safe_model}"[:63]
+
+
+class ReadWriteLock:
+    """
+    Many readers or one writer (writers get priority so updates are not starved)
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class KnowledgeIndex:
+    """
+    Chroma collection on disk whose IDs are chunk content hashes
+
+    Usage:
+        index = KnowledgeIndex(embeddings, "chroma_db", fingerprint, "text-embedding-ada-002")
+        index.sync(chunks)                  # embeds only new/changed chunks
+        index.remove_sources(["old.txt"])   # drops a whole file
+        index.indexed_sources()             # files with chunks on disk
+        retriever = index.as_retriever(k=3)
+    """
+
+    def __init__(self, embeddings, persist_dir: str, fingerprint: str, embedding_model: str,
+                 query_embedder: QueryEmbedder = None):
+        self.embeddings = embeddings
+        self.fingerprint = fingerprint
+        self.vectorstore = Chroma(
+            collection_name=collection_name_for(embedding_model),
+            embedding_function=embeddings,
+            persist_directory=persist_dir,
+        )
+        self.stats = IndexStats(total=len(self.indexed_ids()))
+
+        # Staging collections left behind by an interrupted ingestion run
+        client = self.vectorstore._client
+        for collection in client.list_collections():
+            if collection.name.startswith(STAGING_PREFIX):
+                client.delete_collection(collection.name)
+
+        # Readers (retrievers) share the lock, updates take it exclusively
+        self.lock = ReadWriteLock()
+        # Only one update at a time may diff + embed + write
+        # (the ingestion pipeline holds it for a whole run)
+        self.update_lock = threading.Lock()
+        # Bumped after every applied update (lets caches notice changes)
+        self.generation = 0
+
+        # Optional keyword (BM25) index kept in step with the collection
+        self.keyword_index = None
+        # Optional vector index searched instead of Chroma's (HNSWIndex, QuantizedIndex, ...)
+        self.vector_index = None
+
+        # Questions are embedded in micro-batches and cached (shared by the
+        # answer cache and the retrievers)
+        self.query_embedder = query_embedder or QueryEmbedder(embeddings)
+
+    def embed_query(self, query: str) -> list:
+        """Embed a question (cached, batched with concurrent questions)"""
+        return self.query_embedder.embed_query(query)
+
+    async def aembed_query(self, query: str) -> list:
+        """Async version of embed_query"""
+        return await self.query_embedder.aembed_query(query)
+
+    def enable_keyword_index(self, keyword_index, page_size: int = ADD_BATCH_SIZE):
+        """
+        Fill a keyword index (e.g. hybrid_search.BM25Index) from the collection
+        and keep it updated on every write from now on
+        """
+        collection = self.vectorstore._collection
+        with self.update_lock:
+            offset = 0
+            while True:
+                page = collection.get(include=["documents"], limit=page_size, offset=offset)
+                if not page["ids"]:
+                    break
+                keyword_index.add(page["ids"], page["documents"])
+                offset += len(page["ids"])
+            with self.lock.write():
+                self.keyword_index = keyword_index
+
+    def enable_vector_index(self, vector_index, page_size: int = ADD_BATCH_SIZE):
+        """
+        Bring a vector index (e.g. quantized_index.QuantizedIndex) in line with
+        the collection, search it instead of Chroma's, and keep it updated
+
+        An index loaded from disk only gets the vectors it is missing (and
+        loses the ones no longer in the collection), so nothing is re-embedded.
+        """
+        collection = self.vectorstore._collection
+        with self.update_lock:
+            stored = set(collection.get(include=[])["ids"])
+            present = set(vector_index.ids())
+            vector_index.remove(list(present - stored))
+            missing = list(stored - present)
+            for start in range(0, len(missing), page_size):
+                page = collection.get(ids=missing[start:start + page_size], include=["embeddings"])
+                vector_index.add(page["ids"], page["embeddings"])
+            with self.lock.write():
+                self.vector_index = vector_index
+
+    def compact_vector_index(self, max_deleted_share: float = 0.2) -> bool:
+        """
+        Rebuild the vector index once deleted entries pass max_deleted_share
+
+        HNSW only marks deleted nodes, and searches widen to step over them,
+        so on a long-running server every edit makes queries slower. The new
+        graph is built while searches go on (no writes meanwhile) and swapped
+        in under the write lock.
+
+        Returns:
+            True if the index was rebuilt
+        """
+        index = self.vector_index
+        if index is None or not hasattr(index, "rebuilt") or index.deleted_share <= max_deleted_share:
+            return False
+        with self.update_lock:
+            with self.lock.read():
+                fresh = index.rebuilt()
+            with self.lock.write():
+                self.vector_index = fresh
+        return True
+
+    def search_by_vector(self, query_vector: list, k: int) -> list:
+        """
+        Nearest chunks to a query embedding, under the read lock
+
+        Returns:
+            [(Document, score)] best first (higher score = closer)
+        """
+        with self.lock.read():
+            if self.vector_index is None:
+                results = self.vectorstore.similarity_search_by_vector_with_relevance_scores(query_vector, k=k)
+                # Chroma returns distances (lower = closer): flip them into scores
+                return [(doc, -distance) for doc, distance in results]
+            hits = self.vector_index.search(query_vector, k=k)
+            docs = self._get_documents([cid for cid, _ in hits])
+        return [(doc, score) for doc, (_, score) in zip(docs, hits) if doc is not None]
+
+    def get_documents(self, ids: list) -> list:
+        """Documents for chunk IDs, in the same order (None for unknown IDs)"""
+        with self.lock.read():
+            return self._get_documents(ids)
+
+    def _get_documents(self, ids: list) -> list:
+        found = self.vectorstore._collection.get(ids=ids, include=["documents", "metadatas"])
+        docs = {
+            cid: Document(page_content=text, metadata=metadata or {}, id=cid)
+            for cid, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        return [docs.get(cid) for cid in ids]
+
+    def indexed_ids(self, source: str = None) -> set:
+        """IDs of the chunks stored for one source (or for the whole collection)"""
+        where = {"source": source} if source is not None else None
+        return set(self.vectorstore.get(where=where, include=[])["ids"])
+
+    def indexed_sources(self) -> set:
+        """Every source (file path) that has chunks in the collection"""
+        metadatas = self.vectorstore.get(include=["metadatas"])["metadatas"]
+        return {metadata.get("source", "") for metadata in metadatas if metadata}
+
+    def diff(self, chunks: list) -> list:
+        """
+        Compare chunks with what is stored, one SourceUpdate per source
+
+        Call with update_lock held, and apply the updates before releasing it.
+
+        Args:
+            chunks: List of Documents from the text splitter (metadata["source"] set)
+
+        Returns:
+            List of SourceUpdate (nothing is embedded or written yet)
+        """
+        # Group by source, same text twice -> same ID, keep the first one only
+        wanted_by_source = {}
+        for chunk in chunks:
+            wanted = wanted_by_source.setdefault(chunk.metadata.get("source", ""), {})
+            wanted.setdefault(document_id(chunk, self.fingerprint), chunk)
+
+        updates = []
+        for source, wanted in wanted_by_source.items():
+            existing = self.indexed_ids(source)
+            updates.append(SourceUpdate(
+                source=source,
+                new_chunks={cid: doc for cid, doc in wanted.items() if cid not in existing},
+                stale_ids=[cid for cid in existing if cid not in wanted],
+                hits=len(wanted.keys() & existing),
+            ))
+        return updates
+
+    def sync(self, chunks: list) -> IndexStats:
+        """
+        Make the collection hold exactly these chunks for each of their sources
+
+        Chunks already on disk are reused (cache hits), new or edited ones
+        are embedded (misses), and chunks that disappeared from a source are
+        deleted. Sources not present in `chunks` are left untouched.
+        (For many or large files, IngestionPipeline does the same streaming,
+        in parallel batches.)
+
+        Args:
+            chunks: List of Documents from the text splitter (metadata["source"] set)
+
+        Returns:
+            IndexStats for this sync
+        """
+        with self.update_lock:
+            total = IndexStats()
+            for update in self.diff(chunks):
+                change = self.apply(update)
+                total.hits += change.hits
+                total.misses += change.misses
+                total.deleted += change.deleted
+                total.total = change.total
+            return total
+
+    def remove_sources(self, sources: list) -> IndexStats:
+        """Delete every chunk that came from the given sources"""
+        with self.update_lock:
+            stale_ids = []
+            for source in sources:
+                stale_ids += list(self.indexed_ids(source))
+            return self.apply(SourceUpdate(source="", new_chunks={}, stale_ids=stale_ids))
+
+    def apply(self, update: SourceUpdate, vectors: dict = None) -> IndexStats:
+        """
+        Swap a source's new chunks in and its stale ones out atomically
+
+        Args:
+            update: From diff()
+            vectors: chunk ID -> embedding for update.new_chunks; embedded
+                     here (in ADD_BATCH_SIZE batches) if not given
+
+        Returns:
+            IndexStats for this update
+        """
+        ids = list(update.new_chunks)
+        docs = [update.new_chunks[cid] for cid in ids]
+
+        # The slow part (embedding API calls) runs before taking the write lock
+        if vectors is None:
+            embedded = []
+            for start in range(0, len(docs), ADD_BATCH_SIZE):
+                batch = docs[start:start + ADD_BATCH_SIZE]
+                embedded += self.embeddings.embed_documents([doc.page_content for doc in batch])
+        else:
+            embedded = [vectors[cid] for cid in ids]
+
+        return self.write(ids, embedded, docs, update.stale_ids, hits=update.hits)
+
+    def write(self, ids: list, vectors: list, docs: list, stale_ids: list = (), hits: int = 0) -> IndexStats:
+        """
+        Upsert embedded chunks and delete stale ones in one step (under the write lock)
+
+        Args:
+            ids: Chunk IDs
+            vectors: Their embeddings
+            docs: Their Documents
+            stale_ids: Chunk IDs to delete
+            hits: Chunks that were reused (only counted in the stats)
+
+        Returns:
+            IndexStats for this write
+        """
+        if ids or stale_ids:
+            with self.lock.write():
+                self._delete(stale_ids)
+                self._upsert(ids, vectors, [doc.page_content for doc in docs], [doc.metadata or None for doc in docs])
+                self.generation += 1
+        return self._count(hits, len(ids), len(stale_ids))
+
+    def create_staging(self):
+        """Empty collection to collect a large source's new chunks in (see write_staged)"""
+        return self.vectorstore._client.create_collection(
+            f"{STAGING_PREFIX}{uuid.uuid4().hex[:16]}", embedding_function=None
+        )
+
+    def drop_staging(self, staging):
+        self.vectorstore._client.delete_collection(staging.name)
+
+    def write_staged(self, staging, stale_ids: list = (), hits: int = 0, page_size: int = ADD_BATCH_SIZE) -> IndexStats:
+        """
+        Like write(), for chunks collected in a staging collection, which is dropped afterwards
+
+        The copy runs under the write lock, so readers see the source either
+        before or after the update, never a mix.
+        """
+        added = staging.count()
+        with self.lock.write():
+            self._delete(stale_ids)
+            for offset in range(0, added, page_size):
+                page = staging.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+                self._upsert(page["ids"], page["embeddings"], page["documents"], page["metadatas"])
+            self.generation += 1
+        self.drop_staging(staging)
+        return self._count(hits, added, len(stale_ids))
+
+    def _delete(self, stale_ids: list):
+        if not stale_ids:
+            return
+        self.vectorstore._collection.delete(ids=list(stale_ids))
+        if self.keyword_index is not None:
+            self.keyword_index.remove(stale_ids)
+        if self.vector_index is not None:
+            self.vector_index.remove(stale_ids)
+
+    def _upsert(self, ids: list, vectors: list, texts: list, metadatas: list):
+        collection = self.vectorstore._collection
+        for start in range(0, len(ids), ADD_BATCH_SIZE):
+            end = start + ADD_BATCH_SIZE
+            collection.upsert(
+                ids=ids[start:end],
+                embeddings=vectors[start:end],
+                documents=texts[start:end],
+                metadatas=metadatas[start:end],
+            )
+        if ids and self.keyword_index is not None:
+            self.keyword_index.add(ids, texts)
+        if ids and self.vector_index is not None:
+            self.vector_index.add(ids, vectors)
+
+    def _count(self, hits: int, misses: int, deleted: int) -> IndexStats:
+        change = IndexStats(hits=hits, misses=misses, deleted=deleted)
+        change.total = self.vectorstore._collection.count()
+
+        # Keep running totals for the lifetime of the process
+        self.stats.hits += change.hits
+        self.stats.misses += change.misses
+        self.stats.deleted += change.deleted
+        self.stats.total = change.total
+        return change
+
+    def as_retriever(self, k: int = 3) -> "IndexRetriever":
+        """Retriever that never reads the collection in the middle of an update"""
+        return IndexRetriever(index=self, k=k)
+
+
+class IndexRetriever(BaseRetriever):
+    """Similarity search over a KnowledgeIndex, holding its read lock"""
+
+    index: Any      # KnowledgeIndex, or a shared_index.SharedIndex in multi-worker mode
+    k: int = 3
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> list:
+        # Embed outside the lock so a slow API call never delays an update
+        query_vector = self.index.embed_query(query)
+        return self._search(query_vector)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> list:
+        # Async embedding call, then the (fast, local) Chroma search on a thread
+        query_vector = await self.index.aembed_query(query)
+        return await asyncio.to_thread(self._search, query_vector)
+
+    def _search(self, query_vector: list) -> list:
+        return [doc for doc, _ in self.index.search_by_vector(query_vector, self.k)]
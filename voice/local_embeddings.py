@@ -0,0 +1,314 @@
+"""
+Local Embeddings - Offline sentence embeddings on CPU with ONNX Runtime
+
+initialize_rag only had OpenAIEmbeddings: every ingested chunk and every
+question was a network call. LocalEmbeddings runs a sentence-transformers
+model (default all-MiniLM-L6-v2, the one the notebooks use) in-process:
+
+    ONNX Runtime     the model's ONNX export, int8-quantized weights by
+                     default (about 4x smaller, faster on CPU), with the
+                     number of intra-op threads set explicitly
+    length buckets   texts are tokenized first and batched by length, so a
+                     batch is padded to its own longest text instead of
+                     short chunks being padded to the longest one around
+    process pool     large embed_documents() calls (ingestion) are spread
+                     over worker processes, each with its own model copy
+                     and cores / processes threads
+
+The model is loaded once per process, on first use. Small calls (questions)
+always run in this process. LocalEmbeddings is a LangChain Embeddings, so
+Chroma, the ingestion pipeline and the query embedder use it exactly like
+OpenAIEmbeddings.
+
+Needs: pip install onnxruntime tokenizers huggingface_hub
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# ONNX exports published next to the model, first match wins
+QUANTIZED_ONNX_FILES = [
+    "onnx/model_quint8_avx2.onnx",
+    "onnx/model_qint8_avx512.onnx",
+    "onnx/model_qint8_arm64.onnx",
+    "onnx/model_quantized.onnx",
+    "model_quantized.onnx",
+]
+ONNX_FILES = ["onnx/model.onnx", "model.onnx"]
+
+
+def model_files(model: str, quantized: bool = True) -> tuple:
+    """
+    Find (tokenizer.json, .onnx) for a model
+
+    Args:
+        model: Local folder, or Hugging Face model name (downloaded once into
+               the Hugging Face cache; works offline after that)
+        quantized: Prefer an int8 export (falls back to float32)
+    """
+    if os.path.isdir(model):
+        def fetch(name):
+            path = os.path.join(model, name)
+            return path if os.path.exists(path) else None
+    else:
+        from huggingface_hub import hf_hub_download
+        from huggingface_hub.errors import EntryNotFoundError
+
+        def fetch(name):
+            try:
+                return hf_hub_download(model, name)
+            except EntryNotFoundError:
+                return None
+
+    tokenizer = fetch("tokenizer.json")
+    onnx_path = next(filter(None, map(fetch, QUANTIZED_ONNX_FILES)), None) if quantized else None
+    if onnx_path is None:
+        onnx_path = next(filter(None, map(fetch, ONNX_FILES)), None)
+        if quantized and onnx_path is not None:
+            onnx_path = quantize_model(onnx_path)
+    if tokenizer is None or onnx_path is None:
+        raise FileNotFoundError(
+            f"{model} has no tokenizer.json / ONNX export "
+            f"(export one with: optimum-cli export onnx --model {model} <folder>)"
+        )
+    return tokenizer, onnx_path
+
+
+def quantize_model(onnx_path: str) -> str:
+    """int8 copy of a float32 ONNX model (made once, next to it); the original if that fails"""
+    target = onnx_path[:-len(".onnx")] + "_quantized.onnx"
+    if os.path.exists(target):
+        return target
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(onnx_path, target, weight_type=QuantType.QInt8)
+    except (ImportError, OSError) as error:
+        print(f"Could not quantize {onnx_path} ({error}), using float32 weights (pip install onnx)")
+        return onnx_path
+    print(f"Quantized {onnx_path} -> {target}")
+    return target
+
+
+def bucket_batches(lengths: list, max_batch_size: int, max_batch_tokens: int) -> list:
+    """
+    Group text indices into batches of similar length
+
+    Texts are taken shortest first, so each batch is padded to the length of
+    its last text; a batch closes at max_batch_size texts or when padding it
+    would exceed max_batch_tokens.
+
+    Returns:
+        List of index lists (every index exactly once)
+    """
+    batches = []
+    batch = []
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+        if batch and (len(batch) == max_batch_size or (len(batch) + 1) * lengths[i] > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def padded_tokens(lengths: list, batches: list) -> int:
+    """Tokens actually computed when each batch is padded to its longest text"""
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+
+
+class OnnxEncoder:
+    """
+    One tokenizer + ONNX Runtime session (mean pooling, unit-length output)
+
+    Usage:
+        encoder = OnnxEncoder(*model_files(DEFAULT_MODEL), threads=2)
+        vectors = encoder.encode(encoder.tokenize(["first text", "second"]))
+    """
+
+    def __init__(self, tokenizer_path: str, onnx_path: str, threads: int = 1, max_length: int = 256):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(max_length)
+        self.pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+
+        # One request at a time uses all `threads`; no thread pool between operators
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        outputs = [node.name for node in self.session.get_outputs()]
+        self.output_name = "last_hidden_state" if "last_hidden_state" in outputs else outputs[0]
+
+    def tokenize(self, texts: list) -> list:
+        """Token ID lists (truncated, not padded)"""
+        return [encoding.ids for encoding in self.tokenizer.encode_batch(texts)]
+
+    def encode(self, token_ids: list) -> np.ndarray:
+        """Embed one batch of token ID lists, padded to the longest of them"""
+        longest = max(len(ids) for ids in token_ids)
+        input_ids = np.full((len(token_ids), longest), self.pad_id, dtype=np.int64)
+        mask = np.zeros((len(token_ids), longest), dtype=np.int64)
+        for row, ids in enumerate(token_ids):
+            input_ids[row, :len(ids)] = ids
+            mask[row, :len(ids)] = 1
+
+        feed = {"input_ids": input_ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run([self.output_name], feed)[0]
+
+        # Mean over the real tokens, then unit length (what sentence-transformers does)
+        summed = np.einsum("btd,bt->bd", hidden, mask.astype(hidden.dtype))
+        vectors = summed / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+        return (vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)).astype(np.float32)
+
+
+# ----- worker processes -----
+
+_worker_encoder = None
+
+
+def _init_worker(tokenizer_path: str, onnx_path: str, threads: int, max_length: int):
+    global _worker_encoder
+    _worker_encoder = OnnxEncoder(tokenizer_path, onnx_path, threads, max_length)
+
+
+def _encode_in_worker(token_ids: list) -> np.ndarray:
+    return _worker_encoder.encode(token_ids)
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    LangChain Embeddings backed by a local ONNX model
+
+    Usage:
+        embeddings = LocalEmbeddings(processes=2)   # 2 worker processes for ingestion
+        embeddings.embed_documents(chunks)
+        embeddings.embed_query("What is the return policy?")
+    """
+
+    def __init__(self, model: str = DEFAULT_MODEL, quantized: bool = True, threads: int = None,
+                 processes: int = 0, max_batch_size: int = 32, max_batch_tokens: int = 8192,
+                 max_length: int = 256, min_pool_texts: int = 64, bucket_by_length: bool = True):
+        """
+        Args:
+            model: Hugging Face model name or local folder with tokenizer.json + ONNX export
+            quantized: Prefer int8 weights
+            threads: ONNX Runtime threads per process (default: cores / processes)
+            processes: Worker processes for large calls (0 or 1 = this process only)
+            max_batch_size: Texts per model call
+            max_batch_tokens: Padded tokens per model call (bounds memory for long texts)
+            max_length: Tokens kept per text (the model's training length)
+            min_pool_texts: Calls with fewer texts skip the worker processes
+            bucket_by_length: Batch texts of similar length together (False = in order)
+        """
+        self.model = model
+        self.quantized = quantized
+        self.processes = processes
+        self.threads = threads or max(1, (os.cpu_count() or 1) // max(processes, 1))
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_length = max_length
+        self.min_pool_texts = min_pool_texts
+        self.bucket_by_length = bucket_by_length
+
+        self._files = None
+        self._encoder = None
+        self._pool = None
+        self._load_lock = threading.Lock()
+        # Concurrent calls would fight over the same cores: run one at a time
+        self._run_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"texts": 0, "batches": 0, "tokens": 0, "padded_tokens": 0, "unbucketed_tokens": 0}
+
+    @property
+    def name(self) -> str:
+        """Model name plus runtime, for index fingerprints (int8 vectors differ slightly)"""
+        self._load()
+        return f"{self.model}-onnx-{os.path.splitext(os.path.basename(self._files[1]))[0]}"
+
+    def _load(self) -> OnnxEncoder:
+        if self._encoder is None:
+            with self._load_lock:
+                if self._encoder is None:
+                    self._files = model_files(self.model, self.quantized)
+                    self._encoder = OnnxEncoder(*self._files, self.threads, self.max_length)
+        return self._encoder
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._load_lock:
+            if self._pool is None:
+                # spawn, not fork: this process already runs threads (batchers, servers)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(*self._files, self.threads, self.max_length)
+                )
+        return self._pool
+
+    def embed_documents(self, texts: list) -> list:
+        if not texts:
+            return []
+        encoder = self._load()
+        token_ids = encoder.tokenize(texts)
+        lengths = [len(ids) for ids in token_ids]
+        in_order = [list(range(start, min(start + self.max_batch_size, len(texts))))
+                    for start in range(0, len(texts), self.max_batch_size)]
+        if self.bucket_by_length:
+            batches = bucket_batches(lengths, self.max_batch_size, self.max_batch_tokens)
+        else:
+            batches = in_order
+        inputs = [[token_ids[i] for i in batch] for batch in batches]
+
+        if self.processes > 1 and len(texts) >= self.min_pool_texts:
+            outputs = list(self._get_pool().map(_encode_in_worker, inputs))
+        else:
+            with self._run_lock:
+                outputs = [encoder.encode(batch) for batch in inputs]
+
+        vectors = np.empty((len(texts), outputs[0].shape[1]), dtype=np.float32)
+        for batch, output in zip(batches, outputs):
+            vectors[batch] = output
+
+        with self._stats_lock:
+            self.stats["texts"] += len(texts)
+            self.stats["batches"] += len(batches)
+            self.stats["tokens"] += sum(lengths)
+            self.stats["padded_tokens"] += padded_tokens(lengths, batches)
+            self.stats["unbucketed_tokens"] += padded_tokens(lengths, in_order)
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+    def get_stats(self) -> dict:
+        """Texts embedded and padding overhead (with vs without length buckets)"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        tokens = stats["tokens"]
+        stats["padding_waste"] = 1 - tokens / stats["padded_tokens"] if tokens else 0.0
+        stats["padding_waste_unbucketed"] = 1 - tokens / stats["unbucketed_tokens"] if tokens else 0.0
+        stats.update(model=self.model, threads=self.threads, processes=self.processes,
+                     onnx_file=self._files[1] if self._files else None)
+        return stats
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
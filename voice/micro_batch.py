@@ -0,0 +1,125 @@
+"""
+Micro Batch - Group requests from many threads into one batched call
+
+Callers submit single items and get a Future back. Worker threads wait a
+few milliseconds (or until the batch is full), call the handler once for
+the whole batch and hand each caller its own result. Used wherever a
+model or API is much cheaper per item in batches (STT, reranking,
+embeddings).
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+
+class MicroBatcher:
+    """
+    Collects items into batches for handler(list_of_items) -> list_of_results
+
+    Usage:
+        batcher = MicroBatcher(model.predict_batch, max_batch_size=16, max_wait_ms=10)
+        result = batcher.process(item)            # blocking
+        result = await batcher.aprocess(item)     # async
+    """
+
+    def __init__(self, handler, max_batch_size: int = 16, max_wait_ms: float = 10,
+                 workers: int = 1, name: str = "batcher"):
+        self.handler = handler
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batch_sizes = Counter()    # batch size -> how many batches had that size
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, item) -> Future:
+        """Queue one item, returns a Future for its result"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def process(self, item):
+        """Queue one item and wait for its result"""
+        return self.submit(item).result()
+
+    async def aprocess(self, item):
+        """Async version of process (doesn't block the event loop)"""
+        return await asyncio.wrap_future(self.submit(item))
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            batches = sum(self.batch_sizes.values())
+            items = sum(size * count for size, count in self.batch_sizes.items())
+            return {
+                "batches": batches,
+                "items": items,
+                "mean_batch_size": items / batches if batches else 0.0,
+                "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            }
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            with self._lock:
+                self.batch_sizes[len(batch)] += 1
+
+            items = [item for item, _ in batch]
+            try:
+                results = list(self.handler(items))
+                if len(results) != len(batch):
+                    # zip() would leave the callers past the end waiting forever
+                    raise ValueError(f"{self.name} handler returned {len(results)} results "
+                                     f"for {len(batch)} items")
+            except Exception as error:
+                for _, future in batch:
+                    future.set_exception(error)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+class ModelPool:
+    """
+    A fixed set of loaded models, each used by one thread at a time
+
+    Usage:
+        pool = ModelPool(load_model, size=2)
+        with pool.acquire() as model:
+            model.predict(...)
+    """
+
+    def __init__(self, factory, size: int = 1):
+        self.size = size
+        self._models = queue.Queue()
+        for _ in range(size):
+            self._models.put(factory())
+
+    @contextmanager
+    def acquire(self):
+        model = self._models.get()
+        try:
+            yield model
+        finally:
+            self._models.put(model)
@@ -0,0 +1,211 @@
+"""
+Parent Store - Parent-child retrieval with parents kept on disk
+
+The notebook version (Advanced_RAG/01_advanced_chunking_strategies.ipynb)
+keeps every 1500-character parent as a Python string and maps child text
+back to it through a dict. Here:
+
+    children   small chunks (the ones embedded and searched), each carrying
+               an integer metadata["parent_id"]
+    parents    UTF-8 text appended to one file and read back through a
+               memory map, found by (offset, length) from a small index file
+
+Parent text is never loaded as a whole: a query decodes only the parents
+it returns. The same parent text always gets the same ID, so re-ingesting
+an unchanged file writes nothing. The store is append-only: text of parents
+whose file was edited or removed stays behind until the directory is deleted.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from array import array
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from streaming_loader import iter_chunks
+
+
+# One index record per parent: offset, length (bytes in parents.txt), content hash
+RECORD = struct.Struct("<qq16s")
+
+
+class ParentStore:
+    """
+    Append-only, memory-mapped store of parent chunk texts with integer IDs
+
+    Usage:
+        store = ParentStore("parent_store")
+        parent_id = store.add(parent_text)      # same text -> same ID
+        store.get(parent_id)                    # -> parent_text
+    """
+
+    def __init__(self, directory: str, read_only: bool = False):
+        """
+        Args:
+            directory: Where parents.txt / parents.idx live
+            read_only: Only read (workers in shared mode): parents another
+                       process appends later are picked up on demand
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.data_path = os.path.join(directory, "parents.txt")
+        self.index_path = os.path.join(directory, "parents.idx")
+        self.read_only = read_only
+
+        self._positions = array("q")    # offset, length for parent 0, 1, ...
+        self._ids = {}                  # content hash -> parent ID
+        self._lock = threading.Lock()
+        self._map = None                # current mmap of parents.txt (re-made when it grows)
+        self._index_read = 0            # bytes of parents.idx loaded so far
+
+        self._load_index()
+        self._data = None if read_only else open(self.data_path, "ab")
+        self._index = None if read_only else open(self.index_path, "ab")
+
+    def __len__(self) -> int:
+        return len(self._positions) // 2
+
+    def _load_index(self):
+        """Read the index records not loaded yet"""
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_read)
+            raw = f.read()
+        valid = 0
+        for offset, length, digest in RECORD.iter_unpack(raw[:len(raw) // RECORD.size * RECORD.size]):
+            # Stop at a record whose text never made it to disk (interrupted write)
+            if offset + length > data_size:
+                break
+            self._ids[digest] = len(self._positions) // 2
+            self._positions.extend((offset, length))
+            valid += RECORD.size
+        self._index_read += valid
+        # A reader may be looking at a write in progress: only the writer repairs
+        if valid < len(raw) and not self.read_only:
+            with open(self.index_path, "r+b") as f:
+                f.truncate(self._index_read)
+
+    # ----- writing -----
+
+    def add(self, text: str) -> int:
+        """Store a parent text (once), returns its ID"""
+        encoded = text.encode("utf-8")
+        digest = hashlib.sha256(encoded).digest()[:16]
+        with self._lock:
+            parent_id = self._ids.get(digest)
+            if parent_id is not None:
+                return parent_id
+
+            offset = self._data.tell()
+            self._data.write(encoded)
+            # Text first, then its index record: a crash never leaves a record without text
+            self._data.flush()
+            self._index.write(RECORD.pack(offset, len(encoded), digest))
+            self._index.flush()
+
+            parent_id = len(self._positions) // 2
+            self._positions.extend((offset, len(encoded)))
+            self._ids[digest] = parent_id
+            return parent_id
+
+    # ----- reading -----
+
+    def _view(self, end: int):
+        """A memory map covering at least the first `end` bytes"""
+        view = self._map
+        if view is None or len(view) < end:
+            with self._lock:
+                if self._map is None or len(self._map) < end:
+                    # Old maps are left for the garbage collector: a reader may still use one
+                    with open(self.data_path, "rb") as f:
+                        self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                view = self._map
+        return view
+
+    def get(self, parent_id: int) -> str:
+        """Text of one parent (IndexError for an unknown ID)"""
+        if self.read_only and parent_id >= len(self):
+            # Appended by the builder after we loaded
+            with self._lock:
+                self._load_index()
+        if not 0 <= parent_id < len(self):
+            raise IndexError(f"unknown parent ID {parent_id}")
+        offset, length = self._positions[2 * parent_id], self._positions[2 * parent_id + 1]
+        if length == 0:
+            return ""
+        return self._view(offset + length)[offset:offset + length].decode("utf-8")
+
+    def get_stats(self) -> dict:
+        return {"parents": len(self), "bytes": self._positions[-2] + self._positions[-1] if len(self) else 0}
+
+    def close(self):
+        if not self.read_only:
+            self._data.close()
+            self._index.close()
+
+
+def iter_parent_child(path: str, parent_splitter, child_splitter, store: ParentStore):
+    """
+    Load a file as parent chunks (stored) and yield their child chunks
+
+    Args:
+        path: Text file
+        parent_splitter: Splitter for the large context chunks
+        child_splitter: Splitter for the small search chunks
+        store: Where parent texts go
+
+    Yields:
+        Child Documents with metadata source and parent_id
+    """
+    for parent in iter_chunks(path, parent_splitter):
+        parent_id = store.add(parent.page_content)
+        for text in child_splitter.split_text(parent.page_content):
+            yield Document(page_content=text, metadata={"source": path, "parent_id": parent_id})
+
+
+class ParentChildRetriever(BaseRetriever):
+    """
+    Search small child chunks, return their (deduplicated) parents
+
+    Usage:
+        children = index.as_retriever(k=9)
+        retriever = ParentChildRetriever(child_retriever=children, store=store, k=3)
+
+    The child retriever should return a few times k children: several of
+    them usually share a parent. Returned parents keep the best child's
+    metadata plus "matched_child" (the text that matched).
+    """
+
+    child_retriever: BaseRetriever
+    store: ParentStore
+    k: int = 3
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> list:
+        return self._parents(self.child_retriever.invoke(query))
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> list:
+        return self._parents(await self.child_retriever.ainvoke(query))
+
+    def _parents(self, children: list) -> list:
+        parents = []
+        seen = set()
+        for child in children:
+            parent_id = child.metadata.get("parent_id")
+            if parent_id is None:
+                # Indexed without parents: pass the chunk through
+                parents.append(child)
+            elif parent_id not in seen:
+                seen.add(parent_id)
+                parents.append(Document(
+                    page_content=self.store.get(int(parent_id)),
+                    metadata={**child.metadata, "matched_child": child.page_content},
+                    id=f"parent-{parent_id}"
+                ))
+            if len(parents) == self.k:
+                break
+        return parents
@@ -0,0 +1,493 @@
+"""
+Quantized Index - Compressed embeddings in memory, full vectors on disk
+
+Chroma (and the embedding matrices in RAG/rag_from_scratch.ipynb) keep
+every vector as float32: 6 KB per chunk for text-embedding-ada-002. Here
+the in-memory copy is compressed and only used for a first pass; the few
+best candidates are then re-scored exactly against the float32 vectors,
+which stay in a memory-mapped file on disk.
+
+    mode      bytes/vector (1536 dims)   first pass
+    float32   6144                       exact (no re-scoring needed)
+    int8      1536                       per-dimension scaled int8 dot product
+    pq        192                        product quantization (8 dims -> 1 byte)
+    binary    192                        sign bits, Hamming distance
+
+The `rescore` factor sets how many candidates per result are re-scored
+(more = better recall, more disk reads): that plus the mode is the
+memory/recall trade-off. benchmarks/quantization_benchmark.py measures it.
+"""
+
+import json
+import os
+
+import numpy as np
+
+
+# Candidates re-scored per requested result, by mode
+DEFAULT_RESCORE = {"float32": 1, "int8": 3, "pq": 40, "binary": 40}
+
+# Rows scored per block in the first pass (bounds the float32 temporaries)
+BLOCK_ROWS = 65536
+
+# Vectors used to (re)train a quantizer
+TRAIN_SAMPLE = 20000
+
+
+def normalize(vectors) -> np.ndarray:
+    """Unit-length float32 rows (dot product = cosine similarity)"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    """Set bits per byte"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _POPCOUNT_TABLE[values]
+
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+# ===== QUANTIZERS =====
+# Each one: fit(sample), encode(vectors) -> codes, scores(codes, query) -> approximate dot products
+
+class Float32Quantizer:
+    """No compression (the baseline)"""
+
+    dtype = np.float32
+    trainable = False
+
+    def code_shape(self, dim: int) -> tuple:
+        return (dim,)
+
+    def fit(self, sample: np.ndarray):
+        pass
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return vectors
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return codes @ query
+
+    def state(self) -> dict:
+        return {}
+
+    def load_state(self, state: dict):
+        pass
+
+
+class Int8Quantizer:
+    """Symmetric int8 per dimension (scale = largest absolute value seen in training / 127)"""
+
+    dtype = np.int8
+    trainable = True
+
+    def __init__(self):
+        self.scale = None
+
+    def code_shape(self, dim: int) -> tuple:
+        return (dim,)
+
+    def fit(self, sample: np.ndarray):
+        self.scale = np.maximum(np.abs(sample).max(axis=0), 1e-12).astype(np.float32) / 127
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # sum(code * scale * q) without dequantizing the whole matrix at once
+        scaled = query * self.scale
+        out = np.empty(len(codes), dtype=np.float32)
+        # Small blocks: the float32 copy stays in the CPU cache
+        for start in range(0, len(codes), 2048):
+            out[start:start + 2048] = codes[start:start + 2048].astype(np.float32) @ scaled
+        return out
+
+    def state(self) -> dict:
+        return {"scale": self.scale}
+
+    def load_state(self, state: dict):
+        self.scale = state["scale"]
+
+
+class BinaryQuantizer:
+    """One bit per dimension: above or below that dimension's mean"""
+
+    dtype = np.uint8
+    trainable = True
+
+    def __init__(self):
+        self.threshold = None
+
+    def code_shape(self, dim: int) -> tuple:
+        return ((dim + 7) // 8,)
+
+    def fit(self, sample: np.ndarray):
+        # Embedding dimensions are rarely centred on 0: split each at its mean
+        self.threshold = sample.mean(axis=0).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(vectors > self.threshold, axis=1)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        query_bits = self.encode(query[None, :])[0]
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS]
+            # Fewer differing bits = more similar
+            out[start:start + len(block)] = -popcount(block ^ query_bits).sum(axis=1, dtype=np.int32)
+        return out
+
+    def state(self) -> dict:
+        return {"threshold": self.threshold}
+
+    def load_state(self, state: dict):
+        self.threshold = state["threshold"]
+
+
+class ProductQuantizer:
+    """
+    Product quantization: the vector is cut into subspaces, each stored as
+    the number (1 byte) of its nearest of 256 k-means centroids
+    """
+
+    dtype = np.uint8
+    trainable = True
+
+    def __init__(self, dims_per_code: int = 8, centroids: int = 256, iterations: int = 8):
+        self.dims_per_code = dims_per_code
+        self.centroids = centroids
+        self.iterations = iterations
+        self.codebooks = None       # (subspaces, centroids, dims_per_code)
+
+    def code_shape(self, dim: int) -> tuple:
+        return (-(-dim // self.dims_per_code),)
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, dim) -> (subspaces, n, dims_per_code), zero-padded"""
+        n, dim = vectors.shape
+        subspaces = self.code_shape(dim)[0]
+        padded = np.zeros((n, subspaces * self.dims_per_code), dtype=np.float32)
+        padded[:, :dim] = vectors
+        return padded.reshape(n, subspaces, self.dims_per_code).transpose(1, 0, 2)
+
+    def fit(self, sample: np.ndarray):
+        rng = np.random.default_rng(0)
+        # ~40 points per centroid is plenty for k-means
+        if len(sample) > 40 * self.centroids:
+            sample = sample[rng.choice(len(sample), 40 * self.centroids, replace=False)]
+        parts = self._split(sample)
+        count = min(self.centroids, len(sample))
+        codebooks = np.zeros((len(parts), self.centroids, self.dims_per_code), dtype=np.float32)
+        for s, part in enumerate(parts):
+            centers = part[rng.choice(len(part), count, replace=False)]
+            for _ in range(self.iterations):
+                assign = self._nearest(part, centers)
+                sums = np.stack([np.bincount(assign, weights=part[:, d], minlength=count)
+                                 for d in range(self.dims_per_code)], axis=1)
+                sizes = np.bincount(assign, minlength=count)[:, None]
+                # Empty clusters keep their old center
+                centers = np.where(sizes > 0, sums / np.maximum(sizes, 1), centers).astype(np.float32)
+            codebooks[s, :count] = centers
+            # Unused centroid slots (tiny samples) repeat the first one
+            codebooks[s, count:] = centers[0]
+        self.codebooks = codebooks
+
+    @staticmethod
+    def _nearest(part: np.ndarray, centers: np.ndarray) -> np.ndarray:
+        # argmin |x - c|^2 = argmin (|c|^2 - 2 x.c)
+        distances = (centers ** 2).sum(axis=1) - 2 * part @ centers.T
+        return distances.argmin(axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(vectors), len(self.codebooks)), dtype=np.uint8)
+        for start in range(0, len(vectors), 4096):
+            parts = self._split(vectors[start:start + 4096])
+            for s, part in enumerate(parts):
+                codes[start:start + len(part), s] = self._nearest(part, self.codebooks[s])
+        return codes
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # Asymmetric distance: dot products of the query with every centroid, looked up per code
+        table = np.einsum("scd,sd->sc", self.codebooks, self._split(query[None, :])[:, 0]).astype(np.float32)
+        out = np.zeros(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS]
+            target = out[start:start + len(block)]
+            for s in range(len(table)):
+                target += table[s][block[:, s]]
+        return out
+
+    def state(self) -> dict:
+        return {"codebooks": self.codebooks}
+
+    def load_state(self, state: dict):
+        self.codebooks = state["codebooks"]
+        self.dims_per_code = self.codebooks.shape[2]
+        self.centroids = self.codebooks.shape[1]
+
+
+QUANTIZERS = {
+    "float32": Float32Quantizer,
+    "int8": Int8Quantizer,
+    "binary": BinaryQuantizer,
+    "pq": ProductQuantizer,
+}
+
+
+# ===== FULL-PRECISION STORE =====
+
+class VectorFile:
+    """float32 rows in a memory-mapped file, grown as needed"""
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self.capacity = 0
+        self.rows = None
+        if os.path.exists(path):
+            self.capacity = os.path.getsize(path) // (4 * dim)
+            self._map()
+
+    def _map(self):
+        self.rows = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+
+    def write(self, row_numbers: np.ndarray, vectors: np.ndarray):
+        needed = int(row_numbers.max()) + 1
+        if needed > self.capacity:
+            # Double the file so appends stay cheap
+            if self.rows is not None:
+                self.rows.flush()
+                self.rows = None
+            self.capacity = max(needed, 2 * self.capacity, 1024)
+            with open(self.path, "ab") as f:
+                f.truncate(self.capacity * 4 * self.dim)
+            self._map()
+        self.rows[row_numbers] = vectors
+
+    def read(self, row_numbers: np.ndarray) -> np.ndarray:
+        # Sorted row order = sequential-ish disk reads
+        order = np.argsort(row_numbers)
+        out = np.empty((len(row_numbers), self.dim), dtype=np.float32)
+        out[order] = self.rows[row_numbers[order]]
+        return out
+
+    def flush(self):
+        if self.rows is not None:
+            self.rows.flush()
+
+
+# ===== INDEX =====
+
+class QuantizedIndex:
+    """
+    Vector index with quantized codes in memory and exact re-scoring from disk
+
+    Usage:
+        index = QuantizedIndex("vector_index", mode="int8")
+        index.add(["id1", "id2"], vectors)
+        index.search(query_vector, k=3)      # -> [("id1", 0.83), ...] (cosine)
+        index.remove(["id2"])
+        index.save()                         # QuantizedIndex.load("vector_index") later
+
+    Not thread-safe on its own: KnowledgeIndex updates it under its write
+    lock and searches it under the read lock.
+    """
+
+    def __init__(self, directory: str, mode: str = "int8", rescore: int = None):
+        if mode not in QUANTIZERS:
+            raise ValueError(f"Unknown mode {mode!r}, choose from {list(QUANTIZERS)}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.mode = mode
+        self.rescore = rescore or DEFAULT_RESCORE[mode]
+        self.quantizer = QUANTIZERS[mode]()
+
+        self.dim = None
+        self.vectors = None             # VectorFile, opened on first add
+        self.codes = None               # (capacity, ...) quantized rows
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_ids = []               # row -> id (None = free)
+        self.rows = {}                  # id -> row
+        self.free_rows = []
+        self.trained_on = 0             # vectors the quantizer was fitted to
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def ids(self) -> list:
+        return list(self.rows)
+
+    @property
+    def bytes_per_vector(self) -> int:
+        """Memory per vector for the in-RAM codes"""
+        if self.dim is None:
+            return 0
+        return int(np.prod(self.quantizer.code_shape(self.dim))) * np.dtype(self.quantizer.dtype).itemsize
+
+    # ----- updates -----
+
+    def add(self, ids: list, vectors):
+        """Insert or replace vectors (normalized, so search scores are cosine similarities)"""
+        if not len(ids):
+            return
+        vectors = normalize(vectors)
+        if self.dim is None:
+            self._start(vectors.shape[1])
+        self.remove([i for i in ids if i in self.rows])
+
+        row_numbers = np.array([self._take_row(doc_id) for doc_id in ids], dtype=np.int64)
+        self.vectors.write(row_numbers, vectors)
+        self._grow_codes(int(row_numbers.max()) + 1)
+        self.alive[row_numbers] = True
+
+        # (Re)fit when the index has grown well past what the quantizer has seen
+        # (each refit re-encodes everything, but they get rarer as it grows)
+        if self.quantizer.trainable and (
+                self.trained_on == 0 or (self.trained_on < TRAIN_SAMPLE and len(self) >= 4 * self.trained_on)):
+            self.retrain()
+        else:
+            self.codes[row_numbers] = self.quantizer.encode(vectors)
+
+    def remove(self, ids: list):
+        """Delete vectors (unknown IDs are ignored)"""
+        for doc_id in ids:
+            row = self.rows.pop(doc_id, None)
+            if row is not None:
+                self.alive[row] = False
+                self.row_ids[row] = None
+                self.free_rows.append(row)
+
+    def retrain(self):
+        """Fit the quantizer on a sample of the stored vectors and re-encode everything"""
+        live = np.flatnonzero(self.alive)
+        if not len(live):
+            return
+        rng = np.random.default_rng(0)
+        sample = live if len(live) <= TRAIN_SAMPLE else np.sort(rng.choice(live, TRAIN_SAMPLE, replace=False))
+        self.quantizer.fit(self.vectors.read(sample))
+        self.trained_on = len(sample)
+        for start in range(0, len(self.row_ids), BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, len(self.row_ids))
+            self.codes[start:end] = self.quantizer.encode(np.asarray(self.vectors.rows[start:end]))
+
+    def _start(self, dim: int):
+        self.dim = dim
+        self.vectors = VectorFile(os.path.join(self.directory, "vectors.f32"), dim)
+        self.codes = np.zeros((0,) + self.quantizer.code_shape(dim), dtype=self.quantizer.dtype)
+
+    def _take_row(self, doc_id) -> int:
+        row = self.free_rows.pop() if self.free_rows else len(self.row_ids)
+        if row == len(self.row_ids):
+            self.row_ids.append(doc_id)
+        else:
+            self.row_ids[row] = doc_id
+        self.rows[doc_id] = row
+        return row
+
+    def _grow_codes(self, rows: int):
+        if rows <= len(self.codes):
+            return
+        capacity = max(rows, 2 * len(self.codes), 1024)
+        codes = np.zeros((capacity,) + self.codes.shape[1:], dtype=self.codes.dtype)
+        codes[:len(self.codes)] = self.codes
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive
+        self.codes, self.alive = codes, alive
+
+    # ----- search -----
+
+    def search(self, query_vector, k: int = 3) -> list:
+        """
+        Top-k by cosine similarity
+
+        Returns:
+            [(id, score)] best first; scores are exact (re-scored in float32)
+        """
+        if not self.rows:
+            return []
+        query = normalize(query_vector)[0]
+        n = len(self.row_ids)
+        approx = self.quantizer.scores(self.codes[:n], query)
+        approx[~self.alive[:n]] = -np.inf
+
+        # First pass: the best rescore * k rows by approximate score
+        pool = min(len(self.rows), k * self.rescore)
+        candidates = np.argpartition(-approx, pool - 1)[:pool]
+        if self.mode == "float32":
+            exact = approx[candidates]
+        else:
+            # Second pass: exact scores from the float32 vectors on disk
+            exact = self.vectors.read(candidates) @ query
+
+        top = np.argsort(-exact, kind="stable")[:k]
+        return [(self.row_ids[candidates[i]], float(exact[i])) for i in top]
+
+    # ----- on disk -----
+
+    def save(self):
+        """Write codes, IDs and quantizer state next to the vector file"""
+        if self.vectors is not None:
+            self.vectors.flush()
+        n = len(self.row_ids)
+        state = {f"quantizer_{name}": value for name, value in self.quantizer.state().items() if value is not None}
+        np.savez(os.path.join(self.directory, "codes.npz"),
+                 codes=self.codes[:n] if self.codes is not None else np.zeros(0), alive=self.alive[:n], **state)
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump({
+                "mode": self.mode,
+                "dim": self.dim,
+                "rescore": self.rescore,
+                "trained_on": self.trained_on,
+                "row_ids": self.row_ids,
+            }, f)
+
+    @classmethod
+    def load(cls, directory: str, mode: str = None, rescore: int = None) -> "QuantizedIndex":
+        """
+        Open a saved index
+
+        A different `mode` than the saved one re-encodes from the float32
+        vectors (no re-embedding needed).
+        """
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        index = cls(directory, mode=mode or meta["mode"], rescore=rescore)
+        if meta["dim"] is None:
+            return index
+
+        index._start(meta["dim"])
+        index.row_ids = meta["row_ids"]
+        index.rows = {doc_id: row for row, doc_id in enumerate(index.row_ids) if doc_id is not None}
+        index.free_rows = [row for row, doc_id in enumerate(index.row_ids) if doc_id is None]
+        index._grow_codes(len(index.row_ids))
+        with np.load(os.path.join(directory, "codes.npz")) as saved:
+            index.alive[:len(index.row_ids)] = saved["alive"]
+            if index.mode == meta["mode"]:
+                index.quantizer.load_state({
+                    name[len("quantizer_"):]: saved[name] for name in saved.files if name.startswith("quantizer_")
+                })
+                index.codes[:len(index.row_ids)] = saved["codes"]
+                index.trained_on = meta["trained_on"]
+                return index
+        index.retrain()
+        return index
+
+    @classmethod
+    def open(cls, directory: str, mode: str = "int8", rescore: int = None) -> "QuantizedIndex":
+        """Load the index in `directory` if there is one, else start an empty one"""
+        if os.path.exists(os.path.join(directory, "meta.json")):
+            return cls.load(directory, mode=mode, rescore=rescore)
+        return cls(directory, mode=mode, rescore=rescore)
+
+    def get_stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "vectors": len(self),
+            "bytes_per_vector": self.bytes_per_vector,
+            "memory_bytes": self.bytes_per_vector * len(self.row_ids),
+            "rescore": self.rescore,
+        }
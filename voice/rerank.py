@@ -0,0 +1,258 @@
+"""
+Rerank - Cross-encoder reranking stage for the RAG chain
+
+The notebook version (Advanced_RAG/03_reranking_cross_encoder.ipynb) calls
+cross_encoder.predict() on initial_k pairs per query. Here:
+
+    batching   pairs from all in-flight requests go through one MicroBatcher,
+               so concurrent questions share model calls
+    caching    (query, chunk) scores are kept in an LRU cache; repeated and
+               follow-up questions skip the model for chunks already scored,
+               and a pair already queued by another request is not queued again
+    budget     initial_k shrinks when the model is slow or busy, so reranking
+               stays within RERANK_BUDGET_MS; pairs still unscored at the
+               deadline keep their first-stage order behind the scored ones
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import wait
+
+from langchain_core.retrievers import BaseRetriever
+
+from answer_cache import normalize_query
+from micro_batch import MicroBatcher
+
+
+class PairScoreCache:
+    """
+    LRU cache of cross-encoder scores keyed by (normalized query, chunk)
+
+    Scores only depend on the two texts, so entries never go stale: chunk
+    keys are content hashes (KnowledgeIndex IDs already are).
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: tuple):
+        with self._lock:
+            score = self._scores.get(key)
+            if score is None:
+                self.stats["misses"] += 1
+                return None
+            self._scores.move_to_end(key)
+            self.stats["hits"] += 1
+            return score
+
+    def put(self, key: tuple, score: float):
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._scores),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            }
+
+
+def chunk_key(doc) -> str:
+    """Stable key for a chunk: its index ID, or a hash of its text"""
+    return doc.id or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+def load_cross_encoder(model: str):
+    """Default scorer: sentence-transformers CrossEncoder (pip install sentence-transformers)"""
+    from sentence_transformers import CrossEncoder
+
+    cross_encoder = CrossEncoder(model)
+    return lambda pairs: cross_encoder.predict(pairs, batch_size=len(pairs)).tolist()
+
+
+class CrossEncoderReranker:
+    """
+    Batched, cached cross-encoder with a per-request latency budget
+
+    Usage:
+        reranker = CrossEncoderReranker(latency_budget_ms=150)
+        reranker.rerank(query, docs, k=3)     # -> [(doc, score)] best first
+    """
+
+    def __init__(self, model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", scorer=None,
+                 max_initial_k: int = 20, min_initial_k: int = 5, latency_budget_ms: float = 150,
+                 max_batch_size: int = 32, max_wait_ms: float = 5, cache_entries: int = 10000):
+        """
+        Args:
+            model: Cross-encoder model name (ignored when scorer is given)
+            scorer: Optional function list of (query, text) -> list of scores
+            max_initial_k: Most candidates reranked per request
+            min_initial_k: Fewest candidates reranked, however slow the model is
+            latency_budget_ms: Target reranking time per request
+            max_batch_size: Most pairs per model call
+            max_wait_ms: How long a batch waits for pairs from other requests
+            cache_entries: Size of the pair score cache
+        """
+        self.model = model
+        self.scorer = scorer or load_cross_encoder(model)
+        self.max_initial_k = max_initial_k
+        self.min_initial_k = min(min_initial_k, max_initial_k)
+        self.budget = latency_budget_ms / 1000
+        self.cache = PairScoreCache(cache_entries)
+        self.batcher = MicroBatcher(self._score_batch, max_batch_size=max_batch_size,
+                                    max_wait_ms=max_wait_ms, name="rerank")
+
+        # Moving average of model time per pair (None until the first batch)
+        self.seconds_per_pair = None
+        self._pending = 0           # pairs submitted but not scored yet
+        self._in_flight = {}        # pair key -> Future, while it is queued
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "pairs_scored": 0, "over_budget": 0, "initial_k_total": 0}
+
+    # ----- scoring -----
+
+    def _score_batch(self, items: list) -> list:
+        """MicroBatcher handler: one model call for pairs from many requests"""
+        start = time.perf_counter()
+        try:
+            scores = self.scorer([(query, text) for _, query, text in items])
+            for (key, _, _), score in zip(items, scores):
+                self.cache.put(key, float(score))
+        finally:
+            with self._lock:
+                self._pending -= len(items)
+                for key, _, _ in items:
+                    self._in_flight.pop(key, None)
+        per_pair = (time.perf_counter() - start) / len(items)
+        with self._lock:
+            self.stats["pairs_scored"] += len(items)
+            previous = self.seconds_per_pair
+            self.seconds_per_pair = per_pair if previous is None else 0.8 * previous + 0.2 * per_pair
+        return scores
+
+    def initial_k(self) -> int:
+        """How many candidates fit in the budget, given model speed and the pairs queued ahead"""
+        with self._lock:
+            if self.seconds_per_pair is None:
+                return self.max_initial_k
+            affordable = int(self.budget / self.seconds_per_pair) - self._pending
+        return max(self.min_initial_k, min(self.max_initial_k, affordable))
+
+    def _prepare(self, query: str, docs: list):
+        """Cached scores and submitted futures for the first initial_k docs"""
+        docs = docs[:self.initial_k()]
+        query_key = normalize_query(query)
+        scores = {}
+        missing = {}
+        for i, doc in enumerate(docs):
+            key = (query_key, chunk_key(doc))
+            score = self.cache.get(key)
+            if score is not None:
+                scores[i] = score
+            else:
+                missing[i] = (key, query, doc.page_content)
+        futures = {}
+        with self._lock:
+            for i, item in missing.items():
+                # Same pair already queued by another request: share its result
+                future = self._in_flight.get(item[0])
+                if future is None:
+                    future = self._in_flight[item[0]] = self.batcher.submit(item)
+                    self._pending += 1
+                futures[i] = future
+            self.stats["requests"] += 1
+            self.stats["initial_k_total"] += len(docs)
+        return docs, scores, futures
+
+    def _order(self, docs: list, scores: dict, futures: dict, k: int) -> list:
+        """Scored docs by score, then any late ones in first-stage order"""
+        late = False
+        for i, future in futures.items():
+            if future.done() and not future.cancelled() and future.exception() is None:
+                scores[i] = float(future.result())
+            else:
+                late = True
+        if late:
+            with self._lock:
+                self.stats["over_budget"] += 1
+
+        ranked = sorted(scores, key=lambda i: scores[i], reverse=True)
+        ranked += [i for i in range(len(docs)) if i not in scores]
+        return [(docs[i], scores.get(i)) for i in ranked[:k]]
+
+    # ----- public API -----
+
+    def rerank(self, query: str, docs: list, k: int = 3) -> list:
+        """
+        Rerank first-stage candidates (best first)
+
+        Args:
+            query: User question
+            docs: Candidate Documents from the first stage, best first
+            k: How many to return
+
+        Returns:
+            [(doc, score)]; score is None for a candidate the model didn't
+            get to within the budget
+        """
+        docs, scores, futures = self._prepare(query, docs)
+        if futures:
+            wait(list(futures.values()), timeout=self.budget)
+        return self._order(docs, scores, futures, k)
+
+    async def arerank(self, query: str, docs: list, k: int = 3) -> list:
+        """Async version of rerank (doesn't block the event loop)"""
+        docs, scores, futures = self._prepare(query, docs)
+        if futures:
+            await asyncio.wait([asyncio.wrap_future(future) for future in futures.values()],
+                               timeout=self.budget)
+        return self._order(docs, scores, futures, k)
+
+    def get_stats(self) -> dict:
+        next_initial_k = self.initial_k()
+        with self._lock:
+            requests = self.stats["requests"]
+            stats = {
+                **self.stats,
+                "mean_initial_k": self.stats["initial_k_total"] / requests if requests else 0.0,
+                "ms_per_pair": self.seconds_per_pair * 1000 if self.seconds_per_pair else None,
+                "next_initial_k": next_initial_k,
+            }
+        return {**stats, "cache": self.cache.get_stats(), "batches": self.batcher.get_stats()}
+
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Two-stage retriever: first-stage candidates, then the cross-encoder
+
+    Usage:
+        base = index.as_retriever(k=20)     # or HybridRetriever(index=index, k=20)
+        retriever = RerankingRetriever(base=base, reranker=CrossEncoderReranker(), k=3)
+
+    The base retriever should return max_initial_k candidates; the reranker
+    decides per request how many of them it can afford to score.
+    """
+
+    base: BaseRetriever
+    reranker: CrossEncoderReranker
+    k: int = 3
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> list:
+        docs = self.base.invoke(query)
+        return [doc for doc, _ in self.reranker.rerank(query, docs, self.k)]
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> list:
+        docs = await self.base.ainvoke(query)
+        return [doc for doc, _ in await self.reranker.arerank(query, docs, self.k)]
@@ -0,0 +1,317 @@
+"""
+Shared Index - One builder process, many workers memory-mapping its output
+
+With N uvicorn workers every worker used to run initialize_rag: N Chroma
+clients, N copies of the vectors, N startup syncs. In shared mode a
+builder (build_index.py) runs the ingestion once and publishes a read-only
+snapshot; workers only open it:
+
+    shared_index/
+        CURRENT             name of the live generation ("gen-000007")
+        gen-000007/
+            manifest.json   generation, chunk count, dimensions, fingerprint
+            vectors.npy     unit-length float32 embeddings, one row per chunk
+            docs.jsonl      chunk text + metadata, one JSON line per row
+            doc_offsets.npy byte offset of every line (row i = offsets[i]:offsets[i + 1])
+            sorted_ids.npy  chunk IDs sorted + their rows, for ID lookups
+            sorted_rows.npy
+            bm25/           bm25_engine.CompiledBM25 over the chunk texts
+
+Every file is opened with np.load(mmap_mode="r") or mmap: pages live once
+in the OS page cache however many workers map them, and opening a
+generation reads almost nothing. A new generation is written to a temporary
+folder, renamed into place, and then CURRENT is replaced (os.replace, atomic);
+workers notice the new pointer within check_seconds and switch on their next
+query. Old generations are deleted later (keep=2): a worker still mapping
+one keeps reading it, the files only disappear once it lets go.
+
+A worker only serves a generation whose manifest matches its own
+embeddings (fingerprint: embedding model + chunking, and vector size).
+A mismatching one is refused at startup, and skipped with a log line
+(the old generation stays live) when it is published later.
+
+Search is always exact (NumPy over the mapped vectors): VECTOR_INDEX is
+ignored in shared mode.
+"""
+
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from bm25_engine import CompiledBM25
+from knowledge_index import ADD_BATCH_SIZE, IndexRetriever, ReadWriteLock
+from quantized_index import normalize
+
+
+CURRENT = "CURRENT"
+
+
+def read_pointer(root: str):
+    """Name of the live generation folder (None if nothing was published yet)"""
+    try:
+        with open(os.path.join(root, CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def generation_number(name: str) -> int:
+    return int(name.split("-")[1])
+
+
+# ===== BUILDER SIDE =====
+
+def publish_snapshot(index, root: str, keep: int = 2, page_size: int = ADD_BATCH_SIZE) -> str:
+    """
+    Export a KnowledgeIndex as a new read-only generation and make it live
+
+    Args:
+        index: KnowledgeIndex to export (read under its read lock)
+        root: Shared folder (created if missing)
+        keep: Generations kept on disk, the live one included
+        page_size: Chunks read from the collection at a time
+
+    Returns:
+        Folder of the new generation
+    """
+    os.makedirs(root, exist_ok=True)
+    generations = [name for name in os.listdir(root) if name.startswith("gen-")]
+    generation = max(map(generation_number, generations), default=0) + 1
+    name = f"gen-{generation:06d}"
+    building = os.path.join(root, f".{name}.tmp")
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+
+    collection = index.vectorstore._collection
+    with index.lock.read():
+        count = collection.count()
+        ids, texts = [], []
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        vectors = None
+        with open(os.path.join(building, "docs.jsonl"), "wb") as docs:
+            offset = 0
+            while offset < count:
+                page = collection.get(include=["embeddings", "documents", "metadatas"],
+                                      limit=page_size, offset=offset)
+                if not page["ids"]:
+                    break
+                embeddings = normalize(page["embeddings"])
+                if vectors is None:
+                    vectors = np.lib.format.open_memmap(
+                        os.path.join(building, "vectors.npy"), mode="w+",
+                        dtype=np.float32, shape=(count, embeddings.shape[1])
+                    )
+                vectors[offset:offset + len(embeddings)] = embeddings
+                for row, (cid, text, metadata) in enumerate(
+                        zip(page["ids"], page["documents"], page["metadatas"]), offset):
+                    docs.write(json.dumps({"id": cid, "text": text, "metadata": metadata or {}}).encode("utf-8") + b"\n")
+                    offsets[row + 1] = docs.tell()
+                ids.extend(page["ids"])
+                texts.extend(page["documents"])
+                offset += len(page["ids"])
+
+    if vectors is None:
+        vectors = np.lib.format.open_memmap(os.path.join(building, "vectors.npy"), mode="w+",
+                                            dtype=np.float32, shape=(0, 0))
+    vectors.flush()
+    del vectors
+    np.save(os.path.join(building, "doc_offsets.npy"), offsets[:len(ids) + 1])
+    order = np.argsort(np.array(ids, dtype=str), kind="stable")
+    np.save(os.path.join(building, "sorted_ids.npy"), np.array(ids, dtype=str)[order])
+    np.save(os.path.join(building, "sorted_rows.npy"), order.astype(np.int64))
+    CompiledBM25.build(ids, texts).save(os.path.join(building, "bm25"))
+    del texts
+    with open(os.path.join(building, "manifest.json"), "w") as f:
+        json.dump({
+            "generation": generation,
+            "chunks": len(ids),
+            "dim": int(np.load(os.path.join(building, "vectors.npy"), mmap_mode="r").shape[1]),
+            "fingerprint": index.fingerprint,
+            "created": time.time(),
+        }, f)
+
+    # Folder first, then the pointer: CURRENT never names a half-written generation
+    os.rename(building, os.path.join(root, name))
+    pointer = os.path.join(root, f".{CURRENT}.tmp")
+    with open(pointer, "w") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer, os.path.join(root, CURRENT))
+
+    for old in sorted(generations, key=generation_number)[:max(0, len(generations) + 1 - keep)]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return os.path.join(root, name)
+
+
+# ===== WORKER SIDE =====
+
+class IndexSnapshot:
+    """One published generation, memory-mapped and read-only"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.generation = self.manifest["generation"]
+
+        def load(name):
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        self.vectors = load("vectors.npy")
+        self.offsets = load("doc_offsets.npy")
+        self.sorted_ids = load("sorted_ids.npy")
+        self.sorted_rows = load("sorted_rows.npy")
+        self.keyword_index = CompiledBM25.load(os.path.join(directory, "bm25"))
+        with open(os.path.join(directory, "docs.jsonl"), "rb") as f:
+            self._docs = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if len(self) else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def document(self, row: int) -> Document:
+        record = json.loads(self._docs[self.offsets[row]:self.offsets[row + 1]])
+        return Document(page_content=record["text"], metadata=record["metadata"], id=record["id"])
+
+    def search(self, query_vector, k: int) -> list:
+        """Exact top-k by cosine similarity -> [(Document, score)]"""
+        if not len(self):
+            return []
+        scores = self.vectors @ normalize(query_vector)[0]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.document(int(row)), float(scores[row])) for row in top]
+
+    def get_documents(self, ids: list) -> list:
+        """Documents for chunk IDs, in the same order (None for unknown IDs)"""
+        docs = []
+        for cid in ids:
+            i = int(np.searchsorted(self.sorted_ids, cid))
+            found = i < len(self.sorted_ids) and self.sorted_ids[i] == cid
+            docs.append(self.document(int(self.sorted_rows[i])) if found else None)
+        return docs
+
+
+class SharedIndex:
+    """
+    Read-only stand-in for KnowledgeIndex over the live published generation
+
+    Usage:
+        index = SharedIndex("shared_index", query_embedder=QueryEmbedder(embeddings))
+        retriever = index.as_retriever(k=3)     # or HybridRetriever(index=index)
+
+    Offers what the retrievers and the answer cache use: embed_query,
+    search_by_vector, get_documents, keyword_index, lock and generation.
+    """
+
+    def __init__(self, root: str, query_embedder, fingerprint: str = None, dim: int = None,
+                 check_seconds: float = 1.0, wait_seconds: float = 0):
+        """
+        Args:
+            root: Folder the builder publishes to
+            query_embedder: embedding_service.QueryEmbedder for questions
+            fingerprint: Index fingerprint of this worker's settings (None = don't check)
+            dim: Size of this worker's query vectors (None = don't check)
+            check_seconds: How often CURRENT is looked at (at most once per query)
+            wait_seconds: How long to wait for a first generation before failing
+        """
+        self.root = root
+        self.query_embedder = query_embedder
+        self.fingerprint = fingerprint
+        self.dim = dim
+        self.check_seconds = check_seconds
+        # Snapshots never change: nobody takes the write side (kept for the retrievers)
+        self.lock = ReadWriteLock()
+        self.reloads = 0
+        self.rejected = 0           # generations skipped because they don't match
+        self._rejected_name = None
+        self._reload_lock = threading.Lock()
+
+        deadline = time.monotonic() + wait_seconds
+        while read_pointer(root) is None:
+            if time.monotonic() >= deadline:
+                raise FileNotFoundError(f"No index published in {root}/ yet (run: python build_index.py)")
+            time.sleep(1)
+        self._name = read_pointer(root)
+        self._snapshot = IndexSnapshot(os.path.join(root, self._name))
+        problem = self.incompatibility(self._snapshot)
+        if problem:
+            raise ValueError(f"Can't serve {self._snapshot.directory}: {problem}")
+        self._checked = time.monotonic()
+
+    def incompatibility(self, snapshot: IndexSnapshot) -> str:
+        """Why this worker can't search a snapshot ("" if it can)"""
+        manifest = snapshot.manifest
+        if self.fingerprint is not None and manifest["fingerprint"] != self.fingerprint:
+            return f"built as {manifest['fingerprint']!r}, this worker uses {self.fingerprint!r}"
+        # An empty generation has no vectors to compare
+        if self.dim is not None and manifest["chunks"] and manifest["dim"] != self.dim:
+            return f"{manifest['dim']}-dimensional vectors, this worker's embeddings have {self.dim}"
+        return ""
+
+    @property
+    def snapshot(self) -> IndexSnapshot:
+        """The live generation (switches to a newly published one first, if any)"""
+        if time.monotonic() - self._checked >= self.check_seconds:
+            with self._reload_lock:
+                if time.monotonic() - self._checked >= self.check_seconds:
+                    name = read_pointer(self.root)
+                    if name and name != self._name and name != self._rejected_name:
+                        snapshot = IndexSnapshot(os.path.join(self.root, name))
+                        problem = self.incompatibility(snapshot)
+                        if problem:
+                            # Keep answering from the old generation, log once per generation
+                            self._rejected_name = name
+                            self.rejected += 1
+                            print(f"Not switching to index {name}: {problem}")
+                        else:
+                            # The old snapshot is dropped once no query holds it
+                            self._snapshot = snapshot
+                            self._name = name
+                            self.reloads += 1
+                            print(f"Switched to index {name} ({len(self._snapshot)} chunks)")
+                    self._checked = time.monotonic()
+        return self._snapshot
+
+    @property
+    def generation(self) -> int:
+        return self.snapshot.generation
+
+    @property
+    def keyword_index(self) -> CompiledBM25:
+        return self.snapshot.keyword_index
+
+    def embed_query(self, query: str) -> list:
+        return self.query_embedder.embed_query(query)
+
+    async def aembed_query(self, query: str) -> list:
+        return await self.query_embedder.aembed_query(query)
+
+    def search_by_vector(self, query_vector: list, k: int) -> list:
+        """Nearest chunks to a query embedding -> [(Document, score)] best first"""
+        return self.snapshot.search(query_vector, k)
+
+    def get_documents(self, ids: list) -> list:
+        return self.snapshot.get_documents(ids)
+
+    def as_retriever(self, k: int = 3) -> IndexRetriever:
+        return IndexRetriever(index=self, k=k)
+
+    def get_stats(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            "mode": "shared",
+            "generation": snapshot.generation,
+            "total": len(snapshot),
+            "dim": snapshot.manifest["dim"],
+            "reloads": self.reloads,
+            "rejected": self.rejected,
+            "directory": snapshot.directory,
+        }
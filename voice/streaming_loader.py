@@ -0,0 +1,146 @@
+"""
+Streaming Loader - Load and split text files without reading them whole
+
+TextLoader reads a file into one Document and split_documents returns
+every chunk in a list. Here files are memory-mapped and decoded one window
+at a time, and chunks are yielded as soon as they are final, so memory use
+depends on the window size, not on the size of the file or the corpus.
+
+Chunks that straddle a window boundary are handled by carrying the
+unfinished tail (starting at the last chunk, which already holds its
+overlap with the chunk before) into the next window. A file that fits in
+one window is split exactly like split_documents would split it.
+"""
+
+import codecs
+import glob
+import mmap
+import os
+
+from langchain_core.documents import Document
+
+
+# How much of a file is decoded and split at once
+WINDOW_BYTES = 1024 * 1024
+
+# Where a window may be cut, best first (never in the middle of a paragraph
+# if it can be helped)
+CUT_SEPARATORS = ["\n\n", "\n", " "]
+
+
+def expand_paths(specs) -> list:
+    """
+    Turn files, directories and glob patterns into a sorted list of files
+
+    Args:
+        specs: One path/pattern or a list of them, e.g.
+               "knowledge_base.txt", "knowledge/", "docs/**/*.md"
+
+    Returns:
+        File paths (directories are walked recursively, hidden files skipped)
+    """
+    if isinstance(specs, (str, os.PathLike)):
+        specs = [specs]
+
+    paths = []
+    for spec in map(os.fspath, specs):
+        if os.path.isdir(spec):
+            for root, dirs, files in os.walk(spec):
+                dirs[:] = [name for name in dirs if not name.startswith(".")]
+                paths += [os.path.join(root, name) for name in files if not name.startswith(".")]
+        elif glob.has_magic(spec):
+            paths += [path for path in glob.glob(spec, recursive=True) if os.path.isfile(path)]
+        else:
+            paths.append(spec)
+
+    # Same file listed twice (e.g. a directory and a glob) -> index it once
+    return sorted(dict.fromkeys(paths))
+
+
+def iter_windows(path: str, window_bytes: int = WINDOW_BYTES, encoding: str = "utf-8"):
+    """
+    Yield a text file's content as decoded strings of about window_bytes each
+
+    The file is memory-mapped, so only the window being decoded is read in,
+    and pages already decoded are dropped from the mapping again (otherwise
+    they would count towards the process RSS). A multi-byte character cut
+    by a window edge is completed in the next one.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    # madvise needs page-aligned offsets
+    window_bytes = max(mmap.PAGESIZE, window_bytes // mmap.PAGESIZE * mmap.PAGESIZE)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            can_advise = hasattr(mapped, "madvise")
+            if can_advise:
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            for start in range(0, size, window_bytes):
+                text = decoder.decode(mapped[start:start + window_bytes])
+                if can_advise:
+                    mapped.madvise(mmap.MADV_DONTNEED, start, min(window_bytes, size - start))
+                if text:
+                    yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _cut_point(text: str) -> int:
+    """Position right after the last good separator (or the end if there is none)"""
+    for separator in CUT_SEPARATORS:
+        position = text.rfind(separator)
+        if position > 0:
+            return position + len(separator)
+    return len(text)
+
+
+def iter_split_text(windows, splitter):
+    """
+    Split a stream of text windows into chunks, lazily
+
+    Args:
+        windows: Iterable of strings (consecutive pieces of one text)
+        splitter: A LangChain TextSplitter (e.g. RecursiveCharacterTextSplitter)
+
+    Yields:
+        Chunk strings, in order, with the splitter's overlap also across windows
+    """
+    carry = ""
+    for window in windows:
+        # Only split up to a separator; the half-finished paragraph waits
+        cut = _cut_point(window)
+        text = carry + window[:cut]
+        pending = window[cut:]
+
+        chunks = splitter.split_text(text)
+        if len(chunks) < 2:
+            # Not even one final chunk yet, keep collecting
+            carry = text + pending
+            continue
+
+        # The last chunk may still grow with the next window: redo it from its start
+        yield from chunks[:-1]
+        last_start = text.rfind(chunks[-1])
+        carry = text[last_start:] + pending
+
+    if carry:
+        yield from splitter.split_text(carry)
+
+
+def iter_chunks(path: str, splitter, window_bytes: int = WINDOW_BYTES, encoding: str = "utf-8"):
+    """
+    Load and split one text file as a stream of chunk Documents
+
+    Args:
+        path: Text file
+        splitter: A LangChain TextSplitter
+        window_bytes: How much of the file to decode at once
+
+    Yields:
+        Documents with metadata["source"] = path (same as TextLoader)
+    """
+    for text in iter_split_text(iter_windows(path, window_bytes, encoding), splitter):
+        yield Document(page_content=text, metadata={"source": path})
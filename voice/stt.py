@@ -0,0 +1,226 @@
+"""
+STT - Pluggable speech-to-text backends
+
+Pick a backend with the STT_BACKEND env var (or set_stt_backend()):
+    google   Google Web Speech API via speech_recognition (default, needs network)
+    whisper  Local Whisper model on CPU (offline, no rate limits)
+
+The local backend loads its models once per process and keeps a pool of
+warm copies. Requests that arrive together (e.g. several uploads on the
+STT thread pool) are grouped into one batched model call.
+
+speech_recognition is only imported once audio is actually handled, so
+importing this module (e.g. in a text-only API worker) loads no audio library.
+"""
+
+import os
+import threading
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from micro_batch import MicroBatcher, ModelPool
+
+if TYPE_CHECKING:
+    import speech_recognition as sr
+
+
+# Whisper (and most local models) expect 16 kHz mono
+SAMPLE_RATE = 16000
+
+
+def audio_to_array(audio: "sr.AudioData") -> np.ndarray:
+    """speech_recognition AudioData -> float32 samples in [-1, 1] at 16 kHz"""
+    pcm = audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+# ============== STREAMS ==============
+
+class STTStream:
+    """
+    Incremental transcription session: feed() frames as they arrive, finish() for the text
+
+    The default keeps the frames and transcribes once at the end (what the
+    Google API needs); local engines can also offer partial() results.
+    """
+
+    def __init__(self, backend, sample_rate: int = SAMPLE_RATE, sample_width: int = 2):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self._chunks = []
+
+    def feed(self, pcm: bytes):
+        self._chunks.append(pcm)
+
+    def audio(self) -> "sr.AudioData":
+        import speech_recognition as sr
+
+        return sr.AudioData(b"".join(self._chunks), self.sample_rate, self.sample_width)
+
+    def partial(self):
+        """Transcript of the audio so far, or None if the backend can't do partials"""
+        return None
+
+    def finish(self) -> str:
+        return self.backend.transcribe(self.audio())
+
+
+class PartialSTTStream(STTStream):
+    """Stream for local engines: partial() re-transcribes the audio received so far"""
+
+    def partial(self):
+        import speech_recognition as sr
+
+        if not self._chunks:
+            return ""
+        try:
+            return self.backend.transcribe(self.audio())
+        except sr.UnknownValueError:
+            return ""
+
+
+# ============== BACKENDS ==============
+
+class STTBackend:
+    """
+    Base class: turn recorded audio into text
+
+    Raises sr.UnknownValueError when nothing intelligible was said and
+    sr.RequestError when the engine itself fails (same as speech_recognition).
+    """
+
+    name = "base"
+
+    def transcribe(self, audio: "sr.AudioData") -> str:
+        raise NotImplementedError
+
+    def start_stream(self, sample_rate: int = SAMPLE_RATE, sample_width: int = 2) -> STTStream:
+        """New incremental session for 16-bit (sample_width=2) PCM frames"""
+        return STTStream(self, sample_rate, sample_width)
+
+    def get_stats(self) -> dict:
+        return {}
+
+
+class GoogleSTT(STTBackend):
+    """Google Web Speech API (the original behaviour)"""
+
+    name = "google"
+
+    def __init__(self, language: str = "en-US"):
+        import speech_recognition as sr
+
+        self.language = language
+        self._recognizer = sr.Recognizer()
+
+    def transcribe(self, audio: "sr.AudioData") -> str:
+        return self._recognizer.recognize_google(audio, language=self.language)
+
+
+class LocalWhisperSTT(STTBackend):
+    """
+    Offline Whisper on CPU (Hugging Face transformers pipeline)
+
+    pool_size model copies are loaded at construction; each batch of
+    requests runs on one of them with batched inference.
+    """
+
+    name = "whisper"
+
+    def __init__(self, model: str = "openai/whisper-tiny.en", pool_size: int = 1,
+                 max_batch_size: int = 8, max_wait_ms: float = 20, threads_per_model: int = None):
+        import torch
+        from transformers import pipeline
+
+        # Split the CPU cores between the model copies
+        threads_per_model = threads_per_model or max(1, (os.cpu_count() or 1) // pool_size)
+        torch.set_num_threads(threads_per_model)
+
+        self.model = model
+        self.pool = ModelPool(
+            # chunk_length_s: uploads longer than Whisper's 30 s window are split
+            lambda: pipeline("automatic-speech-recognition", model=model, device="cpu", chunk_length_s=30),
+            size=pool_size
+        )
+        self.batcher = MicroBatcher(
+            self._transcribe_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            workers=pool_size,
+            name="stt"
+        )
+
+    def transcribe(self, audio: "sr.AudioData") -> str:
+        import speech_recognition as sr
+
+        text = self.batcher.process(audio_to_array(audio))
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+    def start_stream(self, sample_rate: int = SAMPLE_RATE, sample_width: int = 2) -> STTStream:
+        return PartialSTTStream(self, sample_rate, sample_width)
+
+    def _transcribe_batch(self, samples: list) -> list:
+        inputs = [{"raw": array, "sampling_rate": SAMPLE_RATE} for array in samples]
+        with self.pool.acquire() as pipe:
+            outputs = pipe(inputs, batch_size=len(inputs))
+        return [output["text"].strip() for output in outputs]
+
+    def warmup(self):
+        """Run one silent clip through every model copy"""
+        silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        for _ in range(self.pool.size):
+            self._transcribe_batch([silence])
+
+    def get_stats(self) -> dict:
+        return self.batcher.get_stats()
+
+
+def make_whisper_backend() -> LocalWhisperSTT:
+    """LocalWhisperSTT configured from env vars"""
+    backend = LocalWhisperSTT(
+        model=os.getenv("STT_LOCAL_MODEL", "openai/whisper-tiny.en"),
+        pool_size=int(os.getenv("STT_POOL_SIZE", "1")),
+        max_batch_size=int(os.getenv("STT_MAX_BATCH", "8")),
+        max_wait_ms=float(os.getenv("STT_BATCH_WAIT_MS", "20"))
+    )
+    backend.warmup()
+    return backend
+
+
+BACKENDS = {
+    "google": GoogleSTT,
+    "whisper": make_whisper_backend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_stt_backend() -> STTBackend:
+    """Backend in use (created from STT_BACKEND on first call)"""
+    global _backend
+
+    if _backend is None:
+        # Loading a local model is slow: make sure only one thread does it
+        with _backend_lock:
+            if _backend is None:
+                _backend = BACKENDS[os.getenv("STT_BACKEND", "google")]()
+    return _backend
+
+
+def set_stt_backend(backend: STTBackend):
+    """Swap the backend (e.g. a stub in tests)"""
+    global _backend
+    _backend = backend
+
+
+def get_stt_stats() -> dict:
+    """Backend name plus its batching stats (if any); doesn't load a backend that isn't loaded yet"""
+    backend = _backend
+    if backend is None:
+        return {"backend": os.getenv("STT_BACKEND", "google"), "loaded": False}
+    return {"backend": backend.name, "loaded": True, **backend.get_stats()}
@@ -0,0 +1,55 @@
+"""
+Startup ingestion drops chunks of knowledge files deleted while the app was down
+
+Run from the voice/ folder:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import voice_assistant  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Fresh folder per test, fake embeddings (no API calls)"""
+    monkeypatch.chdir(tmp_path)
+    # Chroma caches clients by path: a relative one would be shared across tests
+    monkeypatch.setattr(voice_assistant, "CHROMA_DIR", str(tmp_path / "chroma_db"))
+    monkeypatch.setattr(voice_assistant, "make_embeddings",
+                        lambda: (DeterministicFakeEmbedding(size=32), "fake-embedding"))
+    return tmp_path
+
+
+def test_deleted_file_is_removed_at_startup(tmp_path):
+    (tmp_path / "knowledge_base.txt").write_text("Store hours are 9 to 5.\n\nReturns take 30 days.\n")
+    os.makedirs(voice_assistant.KNOWLEDGE_DIR)
+    extra = os.path.join(voice_assistant.KNOWLEDGE_DIR, "extra.txt")
+    with open(extra, "w") as f:
+        f.write("Gift cards never expire.\n")
+
+    index = voice_assistant.build_knowledge_index("knowledge_base.txt")
+    assert index.indexed_sources() == {"knowledge_base.txt", extra}
+    assert index.indexed_ids(extra)
+
+    # Deleted while the app is down: the next startup must forget it
+    os.remove(extra)
+    index = voice_assistant.build_knowledge_index("knowledge_base.txt")
+    assert index.indexed_sources() == {"knowledge_base.txt"}
+    assert not index.indexed_ids(extra)
+    assert index.stats.total == len(index.indexed_ids("knowledge_base.txt"))
+
+
+def test_other_knowledge_path_replaces_the_old_one(tmp_path):
+    (tmp_path / "knowledge_base.txt").write_text("Store hours are 9 to 5.\n")
+    (tmp_path / "other.txt").write_text("Shipping is free over 50 dollars.\n")
+
+    voice_assistant.build_knowledge_index("knowledge_base.txt")
+    index = voice_assistant.build_knowledge_index("other.txt")
+    assert index.indexed_sources() == {"other.txt"}
@@ -0,0 +1,292 @@
+"""
+TTS - Pluggable text-to-speech backends and sentence-pipelined streaming
+
+Pick a backend with the TTS_BACKEND env var (or set_tts_backend()):
+    gtts     Google TTS (default, needs network, returns MP3)
+    pyttsx3  Local offline engine (no network, returns WAV)
+
+The configured backend is wrapped in a content-addressed audio cache
+(TTS_CACHE=0 turns it off), so repeated sentences are never re-synthesized.
+
+stream_speech() turns a stream of answer tokens into a stream of audio:
+each finished sentence is synthesized right away (several at once on the
+TTS thread pool) and audio is yielded in sentence order, so the first
+words can play while the LLM is still writing the rest. Every piece is a
+complete file; join_wav_stream() turns WAV pieces into one playable stream.
+"""
+
+import asyncio
+import io
+import os
+import re
+import struct
+import tempfile
+import threading
+import wave
+
+from audio_cache import AudioCache, audio_key
+
+
+# ============== BACKENDS ==============
+
+class TTSBackend:
+    """Base class: turn one piece of text into audio bytes"""
+
+    name = "base"
+    media_type = "audio/mpeg"
+
+    def synthesize(self, text: str) -> bytes:
+        raise NotImplementedError
+
+    def settings(self) -> dict:
+        """Voice settings that change the audio (part of the cache key)"""
+        return {}
+
+    def warmup(self):
+        """Load the engine now instead of on the first request"""
+
+
+class GTTSBackend(TTSBackend):
+    """Google TTS via gTTS (MP3 output)"""
+
+    name = "gtts"
+    media_type = "audio/mpeg"
+
+    def __init__(self, lang: str = "en", tld: str = "com", slow: bool = False):
+        self.lang = lang
+        self.tld = tld
+        self.slow = slow
+
+    def warmup(self):
+        from gtts import gTTS  # noqa: F401
+
+    def synthesize(self, text: str) -> bytes:
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=self.lang, tld=self.tld, slow=self.slow).write_to_fp(buffer)
+        return buffer.getvalue()
+
+    def settings(self) -> dict:
+        return {"lang": self.lang, "tld": self.tld, "slow": self.slow}
+
+
+class Pyttsx3Backend(TTSBackend):
+    """Offline TTS via pyttsx3 (WAV output, no network needed)"""
+
+    name = "pyttsx3"
+    media_type = "audio/wav"
+
+    def __init__(self, rate: int = 180, voice: str = None):
+        import pyttsx3
+
+        self.rate = rate
+        self.voice = voice
+        self._engine = pyttsx3.init()
+        self._engine.setProperty("rate", rate)
+        if voice:
+            self._engine.setProperty("voice", voice)
+        # The pyttsx3 engine is not thread-safe
+        self._lock = threading.Lock()
+
+    def synthesize(self, text: str) -> bytes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "speech.wav")
+            with self._lock:
+                self._engine.save_to_file(text, path)
+                self._engine.runAndWait()
+            with open(path, "rb") as f:
+                return f.read()
+
+    def settings(self) -> dict:
+        return {"rate": self.rate, "voice": self.voice}
+
+
+class CachedBackend(TTSBackend):
+    """Wraps a backend: audio for text it has already spoken comes from the cache"""
+
+    def __init__(self, backend: TTSBackend, cache: AudioCache):
+        self.backend = backend
+        self.cache = cache
+        self.name = backend.name
+        self.media_type = backend.media_type
+
+    def synthesize(self, text: str) -> bytes:
+        key = audio_key(text, self.backend.name, self.backend.settings())
+        audio = self.cache.get(key)
+        if audio is None:
+            audio = self.backend.synthesize(text)
+            self.cache.put(key, audio)
+        return audio
+
+    def settings(self) -> dict:
+        return self.backend.settings()
+
+    def warmup(self):
+        self.backend.warmup()
+
+
+BACKENDS = {
+    "gtts": GTTSBackend,
+    "pyttsx3": Pyttsx3Backend,
+}
+
+# Audio cache settings
+TTS_CACHE = os.getenv("TTS_CACHE", "1") == "1"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "audio_cache")
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "256"))
+TTS_CACHE_MEMORY_MB = int(os.getenv("TTS_CACHE_MEMORY_MB", "16"))
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_tts_backend() -> TTSBackend:
+    """Backend in use (created from TTS_BACKEND on first call, cached unless TTS_CACHE=0)"""
+    global _backend
+
+    if _backend is None:
+        # Concurrent first requests must share one engine and one audio cache
+        with _backend_lock:
+            if _backend is None:
+                backend = BACKENDS[os.getenv("TTS_BACKEND", "gtts")]()
+                if TTS_CACHE:
+                    cache = AudioCache(
+                        TTS_CACHE_DIR,
+                        max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024,
+                        memory_bytes=TTS_CACHE_MEMORY_MB * 1024 * 1024
+                    )
+                    backend = CachedBackend(backend, cache)
+                _backend = backend
+    return _backend
+
+
+def get_tts_cache_stats() -> dict:
+    """Bytes served from the audio cache vs synthesized, hits, evictions"""
+    backend = get_tts_backend()
+    if not isinstance(backend, CachedBackend):
+        return {"enabled": False}
+    return {"enabled": True, **backend.cache.get_stats()}
+
+
+def set_tts_backend(backend: TTSBackend):
+    """Swap the backend (e.g. a local engine or a stub in tests)"""
+    global _backend
+    _backend = backend
+
+
+# ============== SENTENCE PIPELINE ==============
+
+# End of a sentence: . ! or ? followed by whitespace
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Don't send tiny fragments ("Hi.") to TTS on their own
+MIN_SENTENCE_CHARS = 20
+
+
+async def split_sentences(tokens):
+    """
+    Group a stream of tokens into sentences
+
+    Args:
+        tokens: Async iterator of text pieces (LLM tokens)
+
+    Yields:
+        Sentences, as soon as each one is complete
+    """
+    buffer = ""
+    async for token in tokens:
+        buffer += token
+        start = 0
+        for match in SENTENCE_END.finditer(buffer):
+            # Short sentences stay in the buffer and join the next one
+            if match.start() - start >= MIN_SENTENCE_CHARS:
+                yield buffer[start:match.start()].strip()
+                start = match.end()
+        buffer = buffer[start:]
+
+    if buffer.strip():
+        yield buffer.strip()
+
+
+async def stream_speech(sentences, executor, backend: TTSBackend = None, max_pending: int = 4):
+    """
+    Synthesize sentences concurrently and yield their audio in order
+
+    Args:
+        sentences: Async iterator of sentences
+        executor: Thread pool the (blocking) backend runs on
+        backend: TTS backend (defaults to get_tts_backend())
+        max_pending: How many sentences may be synthesizing at once
+
+    Yields:
+        Audio bytes, one piece per sentence
+    """
+    backend = backend or get_tts_backend()
+    loop = asyncio.get_running_loop()
+    pending = asyncio.Queue(maxsize=max_pending)
+    done = object()
+
+    async def produce():
+        try:
+            async for sentence in sentences:
+                future = loop.run_in_executor(executor, backend.synthesize, sentence)
+                await pending.put(future)
+        except Exception as error:
+            await pending.put(error)
+        await pending.put(done)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await pending.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield await item
+    finally:
+        producer.cancel()
+
+
+# ============== WAV STREAMS ==============
+
+# Data size of a WAV stream whose length isn't known up front
+UNKNOWN_SIZE = 0xFFFFFFFF
+
+
+def wav_stream_header(channels: int, sample_width: int, frame_rate: int) -> bytes:
+    """PCM WAV header with "unknown" sizes, for audio that is still being produced"""
+    return b"".join([
+        b"RIFF", struct.pack("<I", UNKNOWN_SIZE), b"WAVE",
+        b"fmt ", struct.pack("<IHHIIHH", 16, 1, channels, frame_rate,
+                             frame_rate * channels * sample_width, channels * sample_width, sample_width * 8),
+        b"data", struct.pack("<I", UNKNOWN_SIZE),
+    ])
+
+
+async def join_wav_stream(pieces):
+    """
+    Turn WAV files (one per sentence) into one WAV stream
+
+    Concatenated WAV files don't play: most players stop at the second
+    header. This sends one header, then only the PCM frames of every piece.
+
+    Args:
+        pieces: Async iterator of complete WAV files, all in the same format
+
+    Yields:
+        The header + the first piece's frames, then the frames of each next piece
+    """
+    stream_format = None
+    async for piece in pieces:
+        with wave.open(io.BytesIO(piece), "rb") as wav:
+            piece_format = (wav.getnchannels(), wav.getsampwidth(), wav.getframerate())
+            frames = wav.readframes(wav.getnframes())
+        if stream_format is None:
+            stream_format = piece_format
+            yield wav_stream_header(*piece_format) + frames
+            continue
+        if piece_format != stream_format:
+            raise ValueError(f"WAV piece format {piece_format} differs from the stream's {stream_format}")
+        yield frames
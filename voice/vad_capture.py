@@ -0,0 +1,195 @@
+"""
+VAD Capture - Voice-activity-detected streaming capture
+
+Instead of recording a fixed number of seconds, audio frames are checked
+one by one: the utterance starts when speech is heard and ends after a
+short stretch of trailing silence. Every frame of the utterance is fed to
+the STT stream as it arrives, and the background-noise level is measured
+once and then kept up to date from the silent frames (no recalibration
+per question).
+"""
+
+import collections
+import time
+
+import numpy as np
+
+
+def frame_rms(frame: bytes) -> float:
+    """Loudness (root mean square) of a 16-bit PCM frame"""
+    samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+    return float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+
+
+class NoiseProfile:
+    """
+    Background noise level, measured once and then slowly adapted
+
+    Usage:
+        profile = NoiseProfile()
+        profile.calibrate(first_half_second_of_frames)
+        profile.update(frame_rms(silent_frame))   # keeps tracking the room
+    """
+
+    def __init__(self, adapt_rate: float = 0.05):
+        self.floor_rms = None
+        self.adapt_rate = adapt_rate
+
+    @property
+    def calibrated(self) -> bool:
+        return self.floor_rms is not None
+
+    def calibrate(self, frames: list):
+        self.floor_rms = float(np.mean([frame_rms(frame) for frame in frames])) if frames else 0.0
+
+    def update(self, rms: float):
+        """Blend in the level of a frame that was classified as silence"""
+        if self.floor_rms is None:
+            self.floor_rms = rms
+        else:
+            self.floor_rms += self.adapt_rate * (rms - self.floor_rms)
+
+
+class EnergyVAD:
+    """
+    Energy-based voice activity detector
+
+    A frame is speech when it is speech_ratio times louder than the noise
+    floor (and above min_threshold). An utterance ends after
+    trailing_silence_ms of silence.
+    """
+
+    def __init__(self, profile: NoiseProfile, frame_ms: int = 30, speech_ratio: float = 3.0,
+                 min_threshold: float = 300.0, trailing_silence_ms: int = 500,
+                 min_speech_ms: int = 150, preroll_ms: int = 300):
+        self.profile = profile
+        self.frame_ms = frame_ms
+        self.speech_ratio = speech_ratio
+        self.min_threshold = min_threshold
+        self.trailing_silence_frames = max(1, trailing_silence_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.preroll_frames = max(0, preroll_ms // frame_ms)
+
+    def threshold(self) -> float:
+        return max(self.min_threshold, (self.profile.floor_rms or 0.0) * self.speech_ratio)
+
+    def is_speech(self, frame: bytes) -> bool:
+        rms = frame_rms(frame)
+        speech = rms > self.threshold()
+        if not speech:
+            self.profile.update(rms)
+        return speech
+
+
+class UtteranceDetector:
+    """
+    Push-based utterance cutting (for audio that arrives in messages)
+
+    Usage:
+        detector = UtteranceDetector(vad)
+        for frame in incoming_frames:
+            for utterance_frame in detector.push(frame):
+                stt_stream.feed(utterance_frame)
+            if detector.ended:
+                ...                 # transcript time
+                detector.reset()
+    """
+
+    def __init__(self, vad: EnergyVAD, max_seconds: float = 30, max_wait_seconds: float = None):
+        self.vad = vad
+        self.max_frames = int(max_seconds * 1000 / vad.frame_ms)
+        self.max_wait_frames = int(max_wait_seconds * 1000 / vad.frame_ms) if max_wait_seconds else None
+        self.reset()
+
+    def reset(self):
+        self.started = False     # speech has been heard
+        self.ended = False       # trailing silence (or max length) reached
+        self.timed_out = False   # gave up waiting for speech
+        self._preroll = collections.deque(maxlen=self.vad.preroll_frames + self.vad.min_speech_frames)
+        self._speech_run = 0
+        self._silence_run = 0
+        self._waited = 0
+        self._sent = 0
+
+    def push(self, frame: bytes) -> list:
+        """
+        Feed one frame
+
+        Returns:
+            Frames that belong to the utterance: the pre-roll when speech
+            starts, then each frame until trailing silence; [] otherwise
+        """
+        if self.ended or self.timed_out:
+            return []
+
+        # 1. Wait for enough consecutive speech frames to call it speech
+        if not self.started:
+            self._waited += 1
+            self._preroll.append(frame)
+            self._speech_run = self._speech_run + 1 if self.vad.is_speech(frame) else 0
+            if self._speech_run >= self.vad.min_speech_frames:
+                self.started = True
+                self._sent = len(self._preroll)
+                return list(self._preroll)
+            if self.max_wait_frames and self._waited >= self.max_wait_frames:
+                self.timed_out = True
+            return []
+
+        # 2. Pass frames through until trailing silence
+        self._sent += 1
+        self._silence_run = 0 if self.vad.is_speech(frame) else self._silence_run + 1
+        if self._silence_run >= self.vad.trailing_silence_frames or self._sent >= self.max_frames:
+            self.ended = True
+        return [frame]
+
+
+def segment_utterance(frames, vad: EnergyVAD, max_seconds: float = 30):
+    """
+    Cut one utterance out of a stream of frames
+
+    Args:
+        frames: Iterator of 16-bit PCM frames (vad.frame_ms long each)
+        vad: Voice activity detector
+        max_seconds: Longest wait for speech, and longest utterance
+
+    Yields:
+        The utterance's frames (with a little pre-roll so the first
+        syllable isn't clipped), as soon as each one is known to belong
+        to it. Returns when trailing silence is heard.
+    """
+    detector = UtteranceDetector(vad, max_seconds=max_seconds, max_wait_seconds=max_seconds)
+    for frame in frames:
+        yield from detector.push(frame)
+        if detector.ended or detector.timed_out:
+            return
+
+
+def stream_transcribe(frames, vad: EnergyVAD, stt_stream, max_seconds: float = 30) -> dict:
+    """
+    Capture one utterance and transcribe it incrementally
+
+    Args:
+        frames: Iterator of 16-bit PCM frames
+        vad: Voice activity detector
+        stt_stream: STT stream (from STTBackend.start_stream) fed frame by frame
+        max_seconds: Longest utterance to capture
+
+    Returns:
+        {"text": ..., "speech_ms": ..., "end_to_transcript_ms": ...}
+        ("text" is None if no speech was heard)
+    """
+    speech_frames = 0
+    for frame in segment_utterance(frames, vad, max_seconds):
+        stt_stream.feed(frame)
+        speech_frames += 1
+
+    if not speech_frames:
+        return {"text": None, "speech_ms": 0, "end_to_transcript_ms": 0}
+
+    end_of_speech = time.perf_counter()
+    text = stt_stream.finish()
+    return {
+        "text": text,
+        "speech_ms": speech_frames * vad.frame_ms,
+        "end_to_transcript_ms": (time.perf_counter() - end_of_speech) * 1000,
+    }
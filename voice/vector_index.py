@@ -0,0 +1,502 @@
+"""
+Vector Index - Exact and HNSW nearest-neighbour search behind one interface
+
+RAG/rag_from_scratch.ipynb scores every document with sklearn's
+cosine_similarity and sorts them all. Here there are two engines with the
+same methods (and the same as quantized_index.QuantizedIndex):
+
+    ExactIndex   normalized float32 matrix, one matrix-vector product and
+                 argpartition for the top-k (exact, O(n) per query)
+    HNSWIndex    Hierarchical Navigable Small World graph: a query walks
+                 from a sparse top layer down to the full graph, visiting a
+                 few thousand vectors instead of all of them (approximate)
+
+    index.add(ids, vectors)       insert (or replace) vectors
+    index.remove(ids)             delete
+    index.search(vector, k)       -> [(id, cosine similarity)] best first
+    index.save() / Cls.load(dir)  .npz arrays + meta.json
+
+open_vector_index() picks an engine by name, including the quantized ones.
+"""
+
+import heapq
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from quantized_index import QUANTIZERS, QuantizedIndex, normalize
+
+
+class ExactIndex:
+    """
+    Brute-force cosine search over vectors held in memory
+
+    Usage:
+        index = ExactIndex()
+        index.add(["a", "b"], vectors)
+        index.search(query_vector, k=3)     # -> [("a", 0.91), ("b", 0.35)]
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory
+        self.vectors = None             # (capacity, dim) unit rows
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_ids = []               # row -> id (None = free)
+        self.rows = {}                  # id -> row
+        self.free_rows = []
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def ids(self) -> list:
+        return list(self.rows)
+
+    def add(self, ids: list, vectors):
+        """Insert or replace vectors"""
+        if not len(ids):
+            return
+        vectors = normalize(vectors)
+        self.remove([doc_id for doc_id in ids if doc_id in self.rows])
+        rows = []
+        for doc_id in ids:
+            row = self.free_rows.pop() if self.free_rows else len(self.row_ids)
+            if row == len(self.row_ids):
+                self.row_ids.append(doc_id)
+            else:
+                self.row_ids[row] = doc_id
+            self.rows[doc_id] = row
+            rows.append(row)
+        self._grow(len(self.row_ids), vectors.shape[1])
+        self.vectors[rows] = vectors
+        self.alive[rows] = True
+
+    def remove(self, ids: list):
+        """Delete vectors (unknown IDs are ignored); their rows are reused"""
+        for doc_id in ids:
+            row = self.rows.pop(doc_id, None)
+            if row is not None:
+                self.alive[row] = False
+                self.row_ids[row] = None
+                self.free_rows.append(row)
+
+    def _grow(self, rows: int, dim: int):
+        if self.vectors is not None and rows <= len(self.vectors):
+            return
+        capacity = max(rows, 2 * len(self.alive), 1024)
+        vectors = np.zeros((capacity, dim), dtype=np.float32)
+        alive = np.zeros(capacity, dtype=bool)
+        if self.vectors is not None:
+            vectors[:len(self.vectors)] = self.vectors
+            alive[:len(self.alive)] = self.alive
+        self.vectors, self.alive = vectors, alive
+
+    def search(self, query_vector, k: int = 3) -> list:
+        """Exact top-k by cosine similarity"""
+        if not self.rows:
+            return []
+        n = len(self.row_ids)
+        scores = self.vectors[:n] @ normalize(query_vector)[0]
+        scores[~self.alive[:n]] = -np.inf
+        k = min(k, len(self.rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.row_ids[row], float(scores[row])) for row in top]
+
+    def save(self, directory: str = None):
+        directory = directory or self.directory
+        os.makedirs(directory, exist_ok=True)
+        n = len(self.row_ids)
+        vectors = self.vectors[:n] if self.vectors is not None else np.zeros((0, 0), dtype=np.float32)
+        np.savez(os.path.join(directory, "exact.npz"), vectors=vectors, alive=self.alive[:n])
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"engine": "exact", "row_ids": self.row_ids}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "ExactIndex":
+        index = cls(directory)
+        with open(os.path.join(directory, "meta.json")) as f:
+            index.row_ids = json.load(f)["row_ids"]
+        with np.load(os.path.join(directory, "exact.npz")) as saved:
+            if len(index.row_ids):
+                index.vectors, index.alive = saved["vectors"].copy(), saved["alive"].copy()
+        index.rows = {doc_id: row for row, doc_id in enumerate(index.row_ids) if doc_id is not None}
+        index.free_rows = [row for row, doc_id in enumerate(index.row_ids) if doc_id is None]
+        return index
+
+    def get_stats(self) -> dict:
+        return {"engine": "exact", "vectors": len(self)}
+
+
+class HNSWIndex:
+    """
+    HNSW graph index (Malkov & Yashunin), NumPy vectors + Python graph walk
+
+    Usage:
+        index = HNSWIndex(M=16, ef_construction=100, ef_search=64)
+        index.add(ids, vectors)
+        index.search(query_vector, k=3)
+
+    M sets the links per node (memory, recall), ef_construction the build
+    effort, ef_search the query effort (recall vs latency; raise it at
+    query time). Deleted vectors stay in the graph as pass-through nodes
+    and are only skipped in results; rebuild() drops them once many pile up.
+    """
+
+    def __init__(self, directory: str = None, M: int = 16, ef_construction: int = 100,
+                 ef_search: int = 64, seed: int = 0):
+        self.directory = directory
+        self.M = M
+        self.M0 = 2 * M                 # the bottom layer gets twice the links
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.level_mult = 1 / math.log(M)
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+
+        self.count = 0                  # rows used (live + deleted)
+        self.vectors = None             # (capacity, dim) unit rows
+        self.levels = np.zeros(0, dtype=np.int8)
+        self.graph0 = None              # (capacity, M0) bottom-layer links, -1 padded
+        self.degree0 = None
+        self.upper = {}                 # node -> [links on layer 1, layer 2, ...]
+        self.deleted = np.zeros(0, dtype=bool)
+        self.entry = -1
+        self.max_level = -1
+
+        self.row_ids = []               # row -> id (None once deleted)
+        self.rows = {}                  # id -> row
+        self._scratch = threading.local()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def ids(self) -> list:
+        return list(self.rows)
+
+    # ----- graph helpers -----
+
+    def _neighbors(self, node: int, level: int) -> np.ndarray:
+        if level == 0:
+            return self.graph0[node, :self.degree0[node]]
+        return self.upper[node][level - 1]
+
+    def _set_neighbors(self, node: int, level: int, links: np.ndarray):
+        if level == 0:
+            self.graph0[node, :len(links)] = links
+            self.graph0[node, len(links):] = -1
+            self.degree0[node] = len(links)
+        else:
+            self.upper[node][level - 1] = np.asarray(links, dtype=np.int32)
+
+    def _visit_marks(self):
+        """Per-thread visited array + a fresh tag (no clearing between searches)"""
+        scratch = self._scratch
+        marks = getattr(scratch, "marks", None)
+        if marks is None or len(marks) < len(self.levels):
+            marks = scratch.marks = np.zeros(len(self.levels), dtype=np.uint32)
+            scratch.tag = 0
+        scratch.tag += 1
+        if scratch.tag == np.iinfo(np.uint32).max:
+            marks[:] = 0
+            scratch.tag = 1
+        return marks, scratch.tag
+
+    def _greedy(self, query: np.ndarray, node: int, similarity: float, level: int):
+        """Move to the closest neighbour until none is closer (upper layers)"""
+        while True:
+            links = self._neighbors(node, level)
+            if not len(links):
+                return node, similarity
+            sims = self.vectors[links] @ query
+            best = int(np.argmax(sims))
+            if sims[best] <= similarity:
+                return node, similarity
+            node, similarity = int(links[best]), float(sims[best])
+
+    def _search_layer(self, query: np.ndarray, entries: list, ef: int, level: int) -> list:
+        """Best-first search on one layer, returns up to ef (similarity, node) best first"""
+        marks, tag = self._visit_marks()
+        candidates = [(-sim, node) for sim, node in entries]
+        results = list(entries)
+        heapq.heapify(candidates)
+        heapq.heapify(results)
+        for _, node in entries:
+            marks[node] = tag
+
+        vectors = self.vectors
+        neighbors = self._neighbors
+        push, pop, replace = heapq.heappush, heapq.heappop, heapq.heapreplace
+        while candidates:
+            neg_sim, node = pop(candidates)
+            full = len(results) >= ef
+            if full and -neg_sim < results[0][0]:
+                break
+            links = neighbors(node, level)
+            links = links[marks[links] != tag]
+            if not len(links):
+                continue
+            marks[links] = tag
+            sims = vectors[links] @ query
+            if full:
+                better = sims > results[0][0]
+                sims, links = sims[better], links[better]
+            for sim, link in zip(sims.tolist(), links.tolist()):
+                if len(results) < ef:
+                    push(results, (sim, link))
+                elif sim > results[0][0]:
+                    replace(results, (sim, link))
+                else:
+                    continue
+                push(candidates, (-sim, link))
+        return sorted(results, reverse=True)
+
+    def _select(self, scored: list, m: int) -> np.ndarray:
+        """
+        Neighbour selection heuristic: skip a candidate that is closer to an
+        already chosen neighbour than to the node (keeps links spread out),
+        then top up with the closest skipped ones
+        """
+        nodes = np.array([node for _, node in scored], dtype=np.int32)
+        if len(nodes) <= m:
+            return nodes
+        sims = np.array([sim for sim, _ in scored], dtype=np.float32)
+        between = self.vectors[nodes] @ self.vectors[nodes].T
+        closest = np.full(len(nodes), -np.inf, dtype=np.float32)  # to any chosen one
+        chosen = []
+        skipped = []
+        for i in range(len(nodes)):
+            if closest[i] < sims[i]:
+                chosen.append(i)
+                if len(chosen) == m:
+                    break
+                np.maximum(closest, between[i], out=closest)
+            else:
+                skipped.append(i)
+        chosen += skipped[:m - len(chosen)]
+        return nodes[chosen]
+
+    # ----- updates -----
+
+    def _grow(self, rows: int, dim: int):
+        if self.vectors is not None and rows <= len(self.vectors):
+            return
+        capacity = max(rows, 2 * len(self.levels), 1024)
+
+        def grown(old, shape, dtype, fill=0):
+            new = np.full(shape, fill, dtype=dtype)
+            if old is not None:
+                new[:len(old)] = old
+            return new
+
+        self.vectors = grown(self.vectors, (capacity, dim), np.float32)
+        self.graph0 = grown(self.graph0, (capacity, self.M0), np.int32, -1)
+        self.degree0 = grown(self.degree0, capacity, np.int32)
+        self.levels = grown(self.levels, capacity, np.int8)
+        self.deleted = grown(self.deleted, capacity, bool)
+
+    def add(self, ids: list, vectors):
+        """Insert or replace vectors (one graph insertion each)"""
+        if not len(ids):
+            return
+        vectors = normalize(vectors)
+        self.remove([doc_id for doc_id in ids if doc_id in self.rows])
+        self._grow(self.count + len(ids), vectors.shape[1])
+        for doc_id, vector in zip(ids, vectors):
+            row = self.count
+            self.count += 1
+            self.vectors[row] = vector
+            self.row_ids.append(doc_id)
+            self.rows[doc_id] = row
+            self._insert(row)
+
+    def _insert(self, row: int):
+        query = self.vectors[row]
+        level = min(int(-math.log(1 - self._rng.random()) * self.level_mult), 16)
+        self.levels[row] = level
+        if level:
+            self.upper[row] = [np.zeros(0, dtype=np.int32) for _ in range(level)]
+        if self.entry < 0:
+            self.entry, self.max_level = row, level
+            return
+
+        node = self.entry
+        similarity = float(self.vectors[node] @ query)
+        for layer in range(self.max_level, level, -1):
+            node, similarity = self._greedy(query, node, similarity, layer)
+
+        entries = [(similarity, node)]
+        for layer in range(min(level, self.max_level), -1, -1):
+            found = self._search_layer(query, entries, self.ef_construction, layer)
+            links = self._select(found, self.M)
+            self._set_neighbors(row, layer, links)
+
+            # Link back, pruning neighbours that now have too many links
+            limit = self.M0 if layer == 0 else self.M
+            for neighbor in links.tolist():
+                current = self._neighbors(neighbor, layer)
+                if len(current) < limit:
+                    self._set_neighbors(neighbor, layer, np.append(current, row).astype(np.int32))
+                    continue
+                pool = np.append(current, row).astype(np.int32)
+                sims = self.vectors[pool] @ self.vectors[neighbor]
+                order = np.argsort(-sims)
+                self._set_neighbors(neighbor, layer, self._select(
+                    [(float(sims[i]), int(pool[i])) for i in order], limit
+                ))
+            entries = found
+
+        if level > self.max_level:
+            self.entry, self.max_level = row, level
+
+    def remove(self, ids: list):
+        """Delete vectors (unknown IDs are ignored)"""
+        for doc_id in ids:
+            row = self.rows.pop(doc_id, None)
+            if row is not None:
+                self.deleted[row] = True
+                self.row_ids[row] = None
+
+    @property
+    def deleted_share(self) -> float:
+        """Share of the graph's nodes that are deleted (they still cost search time and memory)"""
+        return (self.count - len(self.rows)) / self.count if self.count else 0.0
+
+    def rebuilt(self) -> "HNSWIndex":
+        """
+        New graph over the live vectors only (this index is only read, so
+        searches can go on while it is built)
+        """
+        live = [row for row in range(self.count) if not self.deleted[row]]
+        fresh = HNSWIndex(self.directory, self.M, self.ef_construction, self.ef_search, self.seed)
+        if live:
+            fresh.add([self.row_ids[row] for row in live], self.vectors[live])
+        return fresh
+
+    def rebuild(self):
+        """Re-insert the live vectors into a fresh graph (drops deleted nodes)"""
+        self.__dict__.update(self.rebuilt().__dict__)
+
+    # ----- search -----
+
+    def search(self, query_vector, k: int = 3, ef: int = None) -> list:
+        """
+        Approximate top-k by cosine similarity
+
+        Args:
+            query_vector: Query embedding
+            k: Results wanted
+            ef: Candidate list size (default ef_search; higher = better recall, slower)
+        """
+        if not self.rows:
+            return []
+        query = normalize(query_vector)[0]
+        node = self.entry
+        similarity = float(self.vectors[node] @ query)
+        for layer in range(self.max_level, 0, -1):
+            node, similarity = self._greedy(query, node, similarity, layer)
+
+        # Deleted nodes still take up candidate slots: widen the search to compensate
+        ef = max(ef or self.ef_search, k)
+        if self.count > len(self.rows):
+            ef = int(ef * self.count / len(self.rows)) + 1
+        found = self._search_layer(query, [(similarity, node)], ef, 0)
+        hits = [(self.row_ids[node], sim) for sim, node in found if not self.deleted[node]]
+        return hits[:k]
+
+    # ----- on disk -----
+
+    def save(self, directory: str = None):
+        directory = directory or self.directory
+        os.makedirs(directory, exist_ok=True)
+        n = self.count
+        upper_nodes = sorted(self.upper)
+        upper_links = [links for node in upper_nodes for links in self.upper[node]]
+        np.savez(
+            os.path.join(directory, "hnsw.npz"),
+            vectors=self.vectors[:n] if n else np.zeros((0, 0), dtype=np.float32),
+            levels=self.levels[:n],
+            graph0=self.graph0[:n] if n else np.zeros((0, self.M0), dtype=np.int32),
+            degree0=self.degree0[:n] if n else np.zeros(0, dtype=np.int32),
+            deleted=self.deleted[:n],
+            upper_nodes=np.array(upper_nodes, dtype=np.int64),
+            upper_sizes=np.array([len(links) for links in upper_links], dtype=np.int32),
+            upper_links=np.concatenate(upper_links) if upper_links else np.zeros(0, dtype=np.int32),
+        )
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({
+                "engine": "hnsw",
+                "M": self.M,
+                "ef_construction": self.ef_construction,
+                "ef_search": self.ef_search,
+                "seed": self.seed,
+                "entry": self.entry,
+                "max_level": self.max_level,
+                "row_ids": self.row_ids,
+            }, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "HNSWIndex":
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        index = cls(directory, meta["M"], meta["ef_construction"], meta["ef_search"], meta["seed"])
+        index.entry, index.max_level = meta["entry"], meta["max_level"]
+        index.row_ids = meta["row_ids"]
+        index.count = len(index.row_ids)
+        index.rows = {doc_id: row for row, doc_id in enumerate(index.row_ids) if doc_id is not None}
+        # Carry on with a different level sequence than the one already used
+        index._rng = np.random.default_rng([meta["seed"], index.count])
+
+        with np.load(os.path.join(directory, "hnsw.npz")) as saved:
+            if index.count:
+                index.vectors = saved["vectors"].copy()
+                index.graph0 = saved["graph0"].copy()
+                index.degree0 = saved["degree0"].copy()
+            index.levels = saved["levels"].copy()
+            index.deleted = saved["deleted"].copy()
+            sizes = saved["upper_sizes"]
+            links = np.split(saved["upper_links"], np.cumsum(sizes)[:-1]) if len(sizes) else []
+            position = 0
+            for node in saved["upper_nodes"].tolist():
+                level = int(index.levels[node])
+                index.upper[node] = [array.astype(np.int32) for array in links[position:position + level]]
+                position += level
+        return index
+
+    def get_stats(self) -> dict:
+        return {
+            "engine": "hnsw",
+            "vectors": len(self),
+            "deleted": self.count - len(self.rows),
+            "max_level": self.max_level,
+            "M": self.M,
+            "ef_search": self.ef_search,
+        }
+
+
+ENGINES = {
+    "exact": ExactIndex,
+    "hnsw": HNSWIndex,
+}
+
+
+def open_vector_index(kind: str, directory: str, rescore: int = None):
+    """
+    Load the vector index saved in `directory`, or start an empty one
+
+    Args:
+        kind: "exact", "hnsw", or a quantized mode ("float32", "int8", "pq", "binary")
+        directory: Where it is saved (exact / hnsw use a subfolder named after the kind)
+        rescore: Re-score factor (quantized modes only)
+    """
+    if kind in QUANTIZERS:
+        return QuantizedIndex.open(directory, mode=kind, rescore=rescore)
+    if kind not in ENGINES:
+        raise ValueError(f"Unknown vector index {kind!r}, choose from {list(ENGINES) + list(QUANTIZERS)}")
+    engine = ENGINES[kind]
+    directory = os.path.join(directory, kind)
+    if os.path.exists(os.path.join(directory, "meta.json")):
+        return engine.load(directory)
+    return engine(directory)
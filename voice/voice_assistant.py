@@ -1,18 +1,31 @@
 """
 Voice Assistant - STT -> RAG -> TTS Pipeline
+
+Importing this module is cheap: speech_recognition, LangChain, Chroma and
+OpenAI are imported inside the functions that use them, so each backend
+loads on first use (or in warm_up()) and a text-only server never loads
+an audio library. Profile: python benchmarks/startup_benchmark.py
 """
 
 import os
-from datetime import datetime
-import speech_recognition as sr
-from gtts import gTTS
-from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_chroma import Chroma
-from langchain_classic.chains import RetrievalQA
+import io
+import asyncio
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from embedding_service import QueryEmbedder
+from stt import get_stt_backend
+from vad_capture import NoiseProfile, EnergyVAD, stream_transcribe
+from answer_cache import AnswerCache
+from audio_retention import AudioRetention
+from audio_store import save_audio
+from tts import get_tts_backend, join_wav_stream, split_sentences, stream_speech
+
+# Before the settings below: they are read from the environment (a few ms)
 load_dotenv()
 
 
@@ -28,6 +41,8 @@ def record_and_transcribe(duration: int = 25) -> str:
     Returns:
         Transcribed text
     """
+    import speech_recognition as sr
+
     recognizer = sr.Recognizer()
 
     with sr.Microphone() as source:
@@ -41,8 +56,8 @@ def record_and_transcribe(duration: int = 25) -> str:
         print("Processing...")
 
     try:
-        # Using Google's free speech recognition API
-        text = recognizer.recognize_google(audio)
+        # Google's free speech recognition API by default (see STT_BACKEND in stt.py)
+        text = get_stt_backend().transcribe(audio)
         return text
     except sr.UnknownValueError:
         return "[Could not understand audio]"
@@ -50,24 +65,125 @@ def record_and_transcribe(duration: int = 25) -> str:
         return f"[API Error: {e}]"
 
 
+# Background noise level: measured on the first turn, then kept up to date
+# from the silent frames, so later turns start listening immediately
+noise_profile = NoiseProfile()
+
+# Capture settings for listen_and_transcribe
+FRAME_MS = 30               # length of one microphone frame
+CALIBRATION_MS = 500        # how long the one-time noise measurement takes
+TRAILING_SILENCE_MS = 600   # pause that ends the question
+
+
+def listen_and_transcribe(max_seconds: int = 30) -> str:
+    """
+    Listen until the user stops talking, transcribing as the audio arrives
+
+    Unlike record_and_transcribe there is no fixed duration: voice activity
+    detection ends the recording after a short pause.
+
+    Args:
+        max_seconds: Longest wait for speech, and longest question
+
+    Returns:
+        Transcribed text
+    """
+    import speech_recognition as sr
+
+    sample_rate = 16000
+    vad = EnergyVAD(noise_profile, frame_ms=FRAME_MS, trailing_silence_ms=TRAILING_SILENCE_MS)
+
+    with sr.Microphone(sample_rate=sample_rate, chunk_size=sample_rate * FRAME_MS // 1000) as source:
+        frames = iter(lambda: source.stream.read(source.CHUNK), None)
+
+        if not noise_profile.calibrated:
+            print("Measuring background noise (first time only)...")
+            noise_profile.calibrate([next(frames) for _ in range(CALIBRATION_MS // FRAME_MS)])
+
+        print("Listening... (speak now, I'll stop when you pause)")
+        stt_stream = get_stt_backend().start_stream(source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        try:
+            result = stream_transcribe(frames, vad, stt_stream, max_seconds)
+        except sr.UnknownValueError:
+            return "[Could not understand audio]"
+        except sr.RequestError as e:
+            return f"[API Error: {e}]"
+
+    if result["text"] is None:
+        return "[No speech detected]"
+
+    print(f"Heard {result['speech_ms'] / 1000:.1f}s of speech, "
+          f"transcript ready {result['end_to_transcript_ms']:.0f} ms after you stopped")
+    return result["text"]
+
+
+@contextmanager
+def open_audio(audio):
+    """
+    Open audio for speech_recognition from a path, bytes or a file object
+
+    Bytes and file objects (e.g. an upload's SpooledTemporaryFile) are read
+    in place - no copy, no temp file. Only non-WAV data is written to a temp
+    file, because speech_recognition probes AIFF/FLAC on one stream without
+    rewinding it.
+
+    Args:
+        audio: Path, bytes-like object, or binary file-like object
+
+    Yields:
+        sr.AudioFile source
+    """
+    import speech_recognition as sr
+
+    if isinstance(audio, (str, os.PathLike)):
+        with sr.AudioFile(os.fspath(audio)) as source:
+            yield source
+        return
+
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        # BytesIO over a bytes object shares its buffer (no copy)
+        stream = io.BytesIO(audio)
+    elif audio.seekable():
+        stream = audio
+        stream.seek(0)
+    else:
+        stream = io.BytesIO(audio.read())
+
+    is_wav = stream.read(4) == b"RIFF"
+    stream.seek(0)
+    if is_wav:
+        with sr.AudioFile(stream) as source:
+            yield source
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".audio") as tmp:
+        tmp.write(stream.read())
+        tmp.flush()
+        with sr.AudioFile(tmp.name) as source:
+            yield source
+
+
 # This function can be used to transcribe pre-recorded audio files
-def transcribe_file(audio_path: str) -> str:
+def transcribe_file(audio) -> str:
     """
-    Transcribe audio from a file
+    Transcribe audio from a file (or from audio already in memory)
 
     Args:
-        audio_path: Path to audio file (wav, flac, aiff)
+        audio: Path to audio file (wav, flac, aiff), audio bytes,
+               or a binary file object such as UploadFile.file
 
     Returns:
         Transcribed text
     """
+    import speech_recognition as sr
+
     recognizer = sr.Recognizer()
 
-    with sr.AudioFile(audio_path) as source:
+    with open_audio(audio) as source:
         audio = recognizer.record(source)
 
     try:
-        text = recognizer.recognize_google(audio)
+        text = get_stt_backend().transcribe(audio)
         return text
     except sr.UnknownValueError:
         return "[Could not understand audio]"
@@ -80,50 +196,509 @@ def transcribe_file(audio_path: str) -> str:
 # Global variable to store the QA chain (initialize once, reuse)
 qa_chain = None
 
+# Persistent vector index (embeddings survive restarts)
+knowledge_index = None
+
+# The chain's pieces, kept so answers can also be streamed token by token
+retriever = None
+llm = None
+
+# Index settings - changing any of these re-embeds the affected chunks
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+EMBEDDING_MODEL = "text-embedding-ada-002"
+CHROMA_DIR = "chroma_db"
+
+# Embeddings: "openai" (EMBEDDING_MODEL over the API) or "local" (LOCAL_EMBED_MODEL
+# on CPU with ONNX Runtime, no network calls). LOCAL_EMBED_PROCESSES worker
+# processes share the cores for ingestion (LOCAL_EMBED_THREADS each, 0 = auto)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+LOCAL_EMBED_MODEL = os.getenv("LOCAL_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_EMBED_QUANTIZED = os.getenv("LOCAL_EMBED_QUANTIZED", "1") == "1"
+LOCAL_EMBED_THREADS = int(os.getenv("LOCAL_EMBED_THREADS", "0")) or None
+LOCAL_EMBED_PROCESSES = int(os.getenv("LOCAL_EMBED_PROCESSES", "0"))
+
+# Question embeddings: concurrent questions wait up to QUERY_EMBED_WAIT_MS (or until
+# QUERY_EMBED_BATCH_SIZE are queued) and go out as one embedding call;
+# QUERY_EMBED_CACHE_SIZE recent questions are remembered
+QUERY_EMBED_BATCH_SIZE = int(os.getenv("QUERY_EMBED_BATCH_SIZE", "64"))
+QUERY_EMBED_WAIT_MS = float(os.getenv("QUERY_EMBED_WAIT_MS", "5"))
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "1024"))
+
+# "dense" = vector search only, "hybrid" = BM25 keywords + vectors fused
+# (HYBRID_FUSION: "rrf" or "weighted", HYBRID_SPARSE_WEIGHT: keyword share)
+RETRIEVER = os.getenv("RETRIEVER", "dense")
+HYBRID_FUSION = os.getenv("HYBRID_FUSION", "rrf")
+HYBRID_SPARSE_WEIGHT = float(os.getenv("HYBRID_SPARSE_WEIGHT", "0.5"))
+
+# Dense search: "chroma" (float32, Chroma's own index), "exact" (in-memory
+# brute force), "hnsw" (in-memory graph, approximate) or a compressed in-memory
+# index re-scored from float32 vectors on disk: "int8" (4x smaller), "pq" or
+# "binary" (32x smaller); VECTOR_RESCORE = candidates re-scored per result
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "chroma")
+VECTOR_RESCORE = int(os.getenv("VECTOR_RESCORE", "0")) or None
+VECTOR_INDEX_DIR = "vector_index"
+# HNSW keeps deleted vectors in its graph: rebuild it once they pass this share
+VECTOR_REBUILD_DELETED = float(os.getenv("VECTOR_REBUILD_DELETED", "0.2"))
+
+# RERANKER=cross-encoder reranks up to RERANK_INITIAL_K candidates per question,
+# fewer when the model can't score them within RERANK_BUDGET_MS
+RERANKER = os.getenv("RERANKER", "none")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_INITIAL_K = int(os.getenv("RERANK_INITIAL_K", "20"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+reranker = None
+
+# PARENT_CHILD=1: search small child chunks, answer with the larger parent chunk
+# around them (parent texts live in PARENT_DIR, children only store the parent ID)
+PARENT_CHILD = os.getenv("PARENT_CHILD", "0") == "1"
+PARENT_CHUNK_SIZE = 1500
+PARENT_CHUNK_OVERLAP = 100
+CHILD_CHUNK_SIZE = 300
+CHILD_CHUNK_OVERLAP = 30
+PARENT_DIR = "parent_store"
+parent_store = None
+
+# Files added at runtime through ingest_files() / POST /knowledge are kept here
+KNOWLEDGE_DIR = "knowledge"
+
+# Multi-worker mode: build_index.py publishes the index into SHARED_INDEX_DIR and
+# every worker memory-maps the live generation instead of building its own
+# (read-only: updates go through the builder). Empty = each process builds its index
+SHARED_INDEX_DIR = os.getenv("SHARED_INDEX_DIR", "")
+
+# Embedding ingestion: chunks per request, requests in parallel, and the
+# account's rate limits (0 = unlimited) so big corpora back off instead of failing
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+EMBED_TPM = float(os.getenv("EMBED_TPM", "0"))
+EMBED_RPM = float(os.getenv("EMBED_RPM", "0"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+
+# Streams files through load -> split -> embed -> upsert (set up in initialize_rag)
+ingest_pipeline = None
+
+# Answer cache: repeats and near-repeats skip retrieval + LLM entirely
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_ENTRIES", "1000")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+)
+
+
+def load_and_split(path: str):
+    """
+    Load a text file and split it into chunks, streaming (metadata["source"] = path)
 
-def initialize_rag(knowledge_path: str = "knowledge_base.txt"):
+    The file is read in windows (memory-mapped), so even a file larger than
+    RAM is fine. Plain text only, for simplicity and to avoid extra dependencies.
+
+    Args:
+        path: Path to a text file
+
+    Yields:
+        Chunk Documents
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from streaming_loader import iter_chunks
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
+    )
+    yield from iter_chunks(path, splitter)
+
+
+def load_parent_child(path: str):
     """
-    Initialize RAG pipeline: Load → Split → Embed → Store
+    Split a text file into parent chunks (into parent_store) and yield their children
 
     Args:
-        knowledge_path: Path to knowledge base text file
+        path: Path to a text file
+
+    Yields:
+        Child chunk Documents (metadata["parent_id"] = the parent's ID)
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from parent_store import iter_parent_child
+
+    parent_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=PARENT_CHUNK_SIZE,
+        chunk_overlap=PARENT_CHUNK_OVERLAP
+    )
+    child_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHILD_CHUNK_SIZE,
+        chunk_overlap=CHILD_CHUNK_OVERLAP
+    )
+    yield from iter_parent_child(path, parent_splitter, child_splitter, parent_store)
+
+
+def make_ingest_pipeline(index: "KnowledgeIndex") -> "IngestionPipeline":
+    """Ingestion pipeline for the index, configured from the EMBED_* settings"""
+    from ingestion import IngestionPipeline
+
+    return IngestionPipeline(
+        index,
+        load=load_parent_child if PARENT_CHILD else load_and_split,
+        batch_size=EMBED_BATCH_SIZE,
+        workers=EMBED_WORKERS,
+        tokens_per_minute=EMBED_TPM,
+        requests_per_minute=EMBED_RPM,
+        max_retries=EMBED_MAX_RETRIES
+    )
+
+
+def compile_keyword_index():
+    """
+    Snapshot the BM25 index into its vectorized form (hybrid mode only)
+
+    Called after each ingestion run: keyword searches then take a few ms
+    even over millions of chunks. Any later write drops the snapshot, and
+    search falls back to the plain inverted index until the next call.
+    """
+    if knowledge_index is None or knowledge_index.keyword_index is None:
+        return
+    # Read lock: writes wait, searches carry on
+    with knowledge_index.lock.read():
+        knowledge_index.keyword_index.compile()
+
+
+def finish_index_update():
+    """After ingestion: compile the keyword index, compact and save the vector index (if enabled)"""
+    compile_keyword_index()
+    if knowledge_index is not None and knowledge_index.vector_index is not None:
+        if knowledge_index.compact_vector_index(VECTOR_REBUILD_DELETED):
+            print(f"Vector index rebuilt without deleted vectors ({len(knowledge_index.vector_index)} left)")
+        with knowledge_index.lock.read():
+            knowledge_index.vector_index.save()
+
+
+def make_embeddings():
+    """
+    Embeddings for EMBEDDING_BACKEND
 
     Returns:
-        RetrievalQA chain
+        (embeddings, model name used in the index fingerprint and collection name)
     """
-    global qa_chain
+    if EMBEDDING_BACKEND == "local":
+        from local_embeddings import LocalEmbeddings
 
-    # 1. Load document
-    loader = TextLoader(knowledge_path, encoding="utf-8") 
-    # text loader instead of PyPDFLoader for simplicity and to avoid extra dependencies
-    documents = loader.load()
+        embeddings = LocalEmbeddings(
+            model=LOCAL_EMBED_MODEL,
+            quantized=LOCAL_EMBED_QUANTIZED,
+            threads=LOCAL_EMBED_THREADS,
+            processes=LOCAL_EMBED_PROCESSES
+        )
+        return embeddings, embeddings.name
+    from langchain_openai import OpenAIEmbeddings
 
-    # 2. Split into chunks
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=50
+    return OpenAIEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL
+
+
+def make_fingerprint(embedding_model: str) -> str:
+    """Index fingerprint for the current chunking settings and embedding model"""
+    from knowledge_index import index_fingerprint
+
+    if PARENT_CHILD:
+        return (index_fingerprint(CHILD_CHUNK_SIZE, CHILD_CHUNK_OVERLAP, embedding_model)
+                + f"|parents={PARENT_CHUNK_SIZE}/{PARENT_CHUNK_OVERLAP}")
+    return index_fingerprint(CHUNK_SIZE, CHUNK_OVERLAP, embedding_model)
+
+
+def make_query_embedder(embeddings) -> QueryEmbedder:
+    return QueryEmbedder(
+        embeddings,
+        max_batch_size=QUERY_EMBED_BATCH_SIZE,
+        max_wait_ms=QUERY_EMBED_WAIT_MS,
+        cache_entries=QUERY_EMBED_CACHE_SIZE
     )
-    chunks = splitter.split_documents(documents)
 
-    # 3. Create embeddings and vector store
-    embeddings = OpenAIEmbeddings()
-    vectorstore = Chroma.from_documents(chunks, embeddings)
 
-    # 4. Create retriever
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+def build_knowledge_index(knowledge_path: str = "knowledge_base.txt") -> "KnowledgeIndex":
+    """
+    Load → Split → Embed → Store: bring the on-disk index up to date
+
+    Used by initialize_rag and by build_index.py (the shared-mode builder).
+    Chunks of files that were indexed before but no longer exist are dropped.
+
+    Args:
+        knowledge_path: Knowledge base text file, directory or glob
+                        (e.g. "docs/**/*.txt")
+
+    Returns:
+        The KnowledgeIndex (also kept in the knowledge_index global)
+    """
+    global knowledge_index, ingest_pipeline, parent_store
+    from knowledge_index import KnowledgeIndex, collection_name_for
+    from streaming_loader import expand_paths
+
+    # 1. Files to index: the knowledge base plus anything ingested earlier
+    specs = [knowledge_path]
+    if os.path.isdir(KNOWLEDGE_DIR):
+        specs.append(KNOWLEDGE_DIR)
+    paths = expand_paths(specs)
+
+    # 2. Open the on-disk vector store (and parent store)
+    embeddings, embedding_model = make_embeddings()
+    if PARENT_CHILD:
+        from parent_store import ParentStore
+
+        parent_store = ParentStore(PARENT_DIR)
+    knowledge_index = KnowledgeIndex(
+        embeddings,
+        persist_dir=CHROMA_DIR,
+        fingerprint=make_fingerprint(embedding_model),
+        embedding_model=embedding_model,
+        query_embedder=make_query_embedder(embeddings)
+    )
+
+    # In-memory vector index: loaded from disk and topped up from the collection
+    if VECTOR_INDEX != "chroma":
+        from vector_index import open_vector_index
+
+        knowledge_index.enable_vector_index(
+            # One folder per embedding model, like the Chroma collections (vector sizes differ)
+            open_vector_index(VECTOR_INDEX, os.path.join(VECTOR_INDEX_DIR, collection_name_for(embedding_model)),
+                              rescore=VECTOR_RESCORE)
+        )
+
+    # Keyword index for hybrid search: built from disk, then kept in step by every write
+    if RETRIEVER == "hybrid":
+        from hybrid_search import BM25Index
+
+        knowledge_index.enable_keyword_index(BM25Index())
+
+    # 3. Files indexed on an earlier run that are gone now (deleted from knowledge/,
+    #    or a different knowledge_path): ingestion only touches the files it is given
+    gone = sorted(knowledge_index.indexed_sources() - {path for path in paths if os.path.isfile(path)})
+    removed = knowledge_index.remove_sources(gone).deleted if gone else 0
+
+    # 4. Load, split and embed only new/changed chunks (batched, in parallel)
+    ingest_pipeline = make_ingest_pipeline(knowledge_index)
+    progress = ingest_pipeline.run(paths)
+    print(f"Index: {progress.chunks_reused} cached, {progress.chunks_embedded} embedded, "
+          f"{progress.chunks_deleted + removed} removed"
+          + (f" ({len(gone)} file(s) no longer present)" if gone else ""))
+    finish_index_update()
+    return knowledge_index
+
+
+def open_shared_index() -> "SharedIndex":
+    """Worker side of multi-worker mode: map the published index, embed nothing"""
+    global knowledge_index, parent_store
+    from shared_index import SharedIndex
+
+    if VECTOR_INDEX != "chroma":
+        print(f"VECTOR_INDEX={VECTOR_INDEX} is ignored in shared mode (exact search over the snapshot)")
+    embeddings, embedding_model = make_embeddings()
+    query_embedder = make_query_embedder(embeddings)
+    # Generations built with another model / chunking (or vector size) are refused
+    knowledge_index = SharedIndex(
+        SHARED_INDEX_DIR,
+        query_embedder=query_embedder,
+        fingerprint=make_fingerprint(embedding_model),
+        dim=len(query_embedder.embed_query("dimension check"))
+    )
+    if PARENT_CHILD:
+        from parent_store import ParentStore
+
+        parent_store = ParentStore(PARENT_DIR, read_only=True)
+    print(f"Opened shared index generation {knowledge_index.generation} "
+          f"({len(knowledge_index.snapshot)} chunks)")
+    return knowledge_index
+
+
+def initialize_rag(knowledge_path: str = "knowledge_base.txt"):
+    """
+    Initialize RAG pipeline: Load → Split → Embed → Store (or open the shared
+    index), then retriever + QA chain
+
+    Args:
+        knowledge_path: Knowledge base text file, directory or glob
+                        (e.g. "docs/**/*.txt")
+
+    Returns:
+        RetrievalQA chain
+    """
+    global qa_chain, retriever, llm, reranker
+    from langchain_openai import ChatOpenAI
+    from langchain_classic.chains import RetrievalQA
+
+    if SHARED_INDEX_DIR:
+        open_shared_index()
+    else:
+        build_knowledge_index(knowledge_path)
+
+    # 4. Create retriever (reads the live index, so ingestion needs no rebuild)
+    # Children: fetch a few per parent we want, several usually share one
+    final_k = 3 * 3 if PARENT_CHILD else 3
+    # With a reranker the first stage fetches more candidates for it to choose from
+    first_stage_k = max(RERANK_INITIAL_K, final_k) if RERANKER == "cross-encoder" else final_k
+    if RETRIEVER == "hybrid":
+        from hybrid_search import HybridRetriever
+
+        retriever = HybridRetriever(
+            index=knowledge_index,
+            k=first_stage_k,
+            fusion=HYBRID_FUSION,
+            sparse_weight=HYBRID_SPARSE_WEIGHT
+        )
+    else:
+        retriever = knowledge_index.as_retriever(k=first_stage_k)
+
+    if RERANKER == "cross-encoder":
+        from rerank import CrossEncoderReranker, RerankingRetriever
+
+        reranker = CrossEncoderReranker(
+            model=RERANK_MODEL,
+            max_initial_k=RERANK_INITIAL_K,
+            latency_budget_ms=RERANK_BUDGET_MS
+        )
+        retriever = RerankingRetriever(base=retriever, reranker=reranker, k=final_k)
+
+    if PARENT_CHILD:
+        from parent_store import ParentChildRetriever
+
+        retriever = ParentChildRetriever(child_retriever=retriever, store=parent_store, k=3)
 
     # 5. Create QA chain
     llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
     qa_chain = RetrievalQA.from_chain_type(
         llm=llm,
         chain_type="stuff",
-        retriever=retriever
+        retriever=retriever,
+        return_source_documents=True    # sources are stored in the answer cache
     )
 
     print("RAG pipeline initialized!")
     return qa_chain
 
 
+# Requests that arrive before the RAG pipeline is up wait for one initialization
+_rag_lock = threading.Lock()
+
+
+def ensure_rag():
+    """initialize_rag() on first use, once, however many requests are waiting for it"""
+    if qa_chain is None:
+        with _rag_lock:
+            if qa_chain is None:
+                initialize_rag()
+
+
+def ingest_files(paths: list) -> dict:
+    """
+    Add or update source files in the live index (no restart needed)
+
+    Only chunks that changed are embedded; chunks that vanished from a
+    file are deleted. Questions keep being answered during the update.
+
+    Args:
+        paths: New or edited text files (directories and globs are expanded)
+
+    Returns:
+        Chunk counts for this update (hits, misses, deleted, total) and
+        embedding throughput (chunks_per_second)
+    """
+    if SHARED_INDEX_DIR:
+        raise RuntimeError("Shared index mode is read-only: update the files and run build_index.py")
+    from streaming_loader import expand_paths
+
+    ensure_rag()
+    paths = expand_paths(paths)
+    progress = ingest_pipeline.run(paths)
+    finish_index_update()
+    print(f"Ingested {len(paths)} file(s): {progress.chunks_embedded} embedded, {progress.chunks_deleted} removed")
+    return {
+        "hits": progress.chunks_reused,
+        "misses": progress.chunks_embedded,
+        "deleted": progress.chunks_deleted,
+        "total": knowledge_index.stats.total,
+        "chunks_per_second": progress.chunks_per_second,
+    }
+
+
+def remove_files(paths: list) -> dict:
+    """
+    Remove source files from the live index
+
+    Args:
+        paths: Paths that were ingested earlier
+
+    Returns:
+        Chunk counts for this update
+    """
+    if SHARED_INDEX_DIR:
+        raise RuntimeError("Shared index mode is read-only: update the files and run build_index.py")
+    ensure_rag()
+    change = knowledge_index.remove_sources(paths)
+    finish_index_update()
+    return change.as_dict()
+
+
+def get_index_stats() -> dict:
+    """Chunk hit/miss counts since startup, plus progress of the latest ingestion run"""
+    if knowledge_index is None:
+        return {}
+    if SHARED_INDEX_DIR:
+        stats = knowledge_index.get_stats()
+    else:
+        stats = {**knowledge_index.stats.as_dict(), "ingest": ingest_pipeline.get_stats()}
+        if knowledge_index.vector_index is not None:
+            stats["vector_index"] = knowledge_index.vector_index.get_stats()
+    if parent_store is not None:
+        stats["parent_store"] = parent_store.get_stats()
+    return stats
+
+
+def get_cache_stats() -> dict:
+    """Answer cache hit rates, size and evictions"""
+    return answer_cache.get_stats()
+
+
+def get_embedding_stats() -> dict:
+    """Question embedding cache and batch-size histogram ({} before initialize_rag)"""
+    if knowledge_index is None:
+        return {}
+    stats = knowledge_index.query_embedder.get_stats()
+    embeddings = knowledge_index.query_embedder.embeddings
+    if EMBEDDING_BACKEND == "local":
+        # Local model: texts embedded, threads / processes and padding overhead
+        stats["local_model"] = embeddings.get_stats()
+    return stats
+
+
+def get_rerank_stats() -> dict:
+    """Reranker pair cache, batch sizes and adaptive initial_k ({} when disabled)"""
+    if reranker is None:
+        return {}
+    return reranker.get_stats()
+
+
+def source_info(doc) -> dict:
+    """Small, JSON-friendly description of a retrieved chunk"""
+    return {
+        "id": doc.id,
+        "source": doc.metadata.get("source"),
+        "preview": doc.page_content[:100],
+    }
+
+
+def cache_lookup(query: str, query_vector: list):
+    """Exact tier first, then the semantic tier"""
+    generation = knowledge_index.generation
+    return (answer_cache.get_exact(query, generation)
+            or answer_cache.get_similar(query_vector, generation))
+
+
+def cache_store(query: str, query_vector: list, response: dict, generation: int):
+    """Remember a chain response (answer + sources) for later repeats"""
+    answer_cache.put(query, query_vector, {
+        "answer": response["result"],
+        "sources": [source_info(doc) for doc in response.get("source_documents", [])],
+    }, generation)
+
+
 def get_response(query: str) -> str:
     """
     Get response from RAG pipeline
@@ -134,26 +709,57 @@ def get_response(query: str) -> str:
     Returns:
         Response text (to be sent to TTS)
     """
-    global qa_chain
+    ensure_rag()
 
-    if qa_chain is None:
-        initialize_rag()
+    # Repeated question? Skip retrieval and the LLM call
+    # (the embedding is memoized, so the retriever won't embed it again)
+    query_vector = knowledge_index.embed_query(query)
+    cached = cache_lookup(query, query_vector)
+    if cached:
+        return cached["answer"]
 
+    generation = knowledge_index.generation
     response = qa_chain.invoke(query)
+    cache_store(query, query_vector, response, generation)
     return response["result"]
 
 
 # ============== STEP 3: TEXT-TO-SPEECH ==============
 
-# Create folder for audio responses
+# Folder for audio responses (created when the first one is saved)
 AUDIO_DIR = "audio_responses"
-os.makedirs(AUDIO_DIR, exist_ok=True)
+
+# Limits for AUDIO_DIR, enforced by a background sweeper (started by the API server)
+audio_retention = AudioRetention(
+    AUDIO_DIR,
+    max_bytes=int(os.getenv("AUDIO_MAX_MB", "500")) * 1024 * 1024,
+    max_age_seconds=float(os.getenv("AUDIO_MAX_AGE_HOURS", "24")) * 3600,
+    max_files=int(os.getenv("AUDIO_MAX_FILES", "10000")),
+    interval_seconds=float(os.getenv("AUDIO_SWEEP_SECONDS", "60"))
+)
+
+# Set SAVE_AUDIO_RESPONSES=0 to answer from memory without writing files
+SAVE_AUDIO_RESPONSES = os.getenv("SAVE_AUDIO_RESPONSES", "1") == "1"
+
+
+def synthesize_speech(text: str) -> bytes:
+    """
+    Convert text to speech in memory (no file written)
+
+    Args:
+        text: Text to convert to speech
+
+    Returns:
+        Audio bytes (format: get_tts_backend().media_type)
+    """
+    return get_tts_backend().synthesize(text)
 
 
 def text_to_speech(text: str) -> str:
     """
-    Convert text to speech using Google TTS
-    Saves with timestamp to preserve all responses
+    Convert text to speech using the configured TTS backend (Google TTS by default)
+    Saves with timestamp + random suffix to preserve all responses
+    (concurrent requests never share or overwrite a file)
 
     Args:
         text: Text to convert to speech
@@ -161,12 +767,11 @@ def text_to_speech(text: str) -> str:
     Returns:
         Path to generated audio file
     """
-    # Generate unique filename with timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_path = os.path.join(AUDIO_DIR, f"response_{timestamp}.mp3")
+    extension = "wav" if get_tts_backend().media_type == "audio/wav" else "mp3"
 
-    tts = gTTS(text=text, lang='en')
-    tts.save(output_path)
+    # Unique name, written to a temp file and renamed into place
+    os.makedirs(AUDIO_DIR, exist_ok=True)
+    output_path = save_audio(synthesize_speech(text), AUDIO_DIR, extension)
     print(f"Audio saved: {output_path}")
     return output_path
 
@@ -176,6 +781,160 @@ def play_audio(audio_path: str):
     os.system(f'start {audio_path}')
 
 
+# ============== ASYNC API (used by the FastAPI app) ==============
+
+# STT and TTS libraries are blocking, so they run on small dedicated thread
+# pools. The pool size caps how many run at once; the event loop stays free.
+STT_WORKERS = int(os.getenv("STT_WORKERS", "8"))
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "8"))
+stt_executor = ThreadPoolExecutor(max_workers=STT_WORKERS, thread_name_prefix="stt")
+tts_executor = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
+
+
+async def atranscribe_file(audio) -> str:
+    """Async version of transcribe_file (runs on the STT thread pool)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(stt_executor, transcribe_file, audio)
+
+
+async def aget_response(query: str) -> str:
+    """
+    Async version of get_response
+
+    Retrieval embeds the query with an async API call and the LLM is
+    awaited with ainvoke, so no thread is held while waiting on OpenAI.
+    """
+    if qa_chain is None:
+        await asyncio.to_thread(ensure_rag)
+
+    query_vector = await knowledge_index.aembed_query(query)
+    cached = cache_lookup(query, query_vector)
+    if cached:
+        return cached["answer"]
+
+    generation = knowledge_index.generation
+    response = await qa_chain.ainvoke(query)
+    cache_store(query, query_vector, response, generation)
+    return response["result"]
+
+
+async def astream_response(query: str):
+    """
+    Stream the RAG answer as it is generated
+
+    Same retriever, prompt and model as qa_chain, but the answer comes
+    back token by token instead of all at once.
+
+    Args:
+        query: User question
+
+    Yields:
+        {"type": "sources", "sources": [...]} once retrieval finishes, then
+        {"type": "token", "text": "..."} for every piece the LLM produces
+    """
+    if qa_chain is None:
+        await asyncio.to_thread(ensure_rag)
+
+    # Cached answer: send it as a single token
+    query_vector = await knowledge_index.aembed_query(query)
+    cached = cache_lookup(query, query_vector)
+    if cached:
+        yield {"type": "sources", "sources": cached["sources"]}
+        yield {"type": "token", "text": cached["answer"]}
+        return
+
+    # 1. Retrieve and tell the client what we found straight away
+    generation = knowledge_index.generation
+    docs = await retriever.ainvoke(query)
+    yield {"type": "sources", "sources": [source_info(doc) for doc in docs]}
+
+    # 2. Build the same "stuff" prompt RetrievalQA uses and stream the LLM
+    from langchain_classic.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
+
+    prompt = PROMPT_SELECTOR.get_prompt(llm)
+    messages = prompt.format_messages(
+        context="\n\n".join(doc.page_content for doc in docs),
+        question=query
+    )
+    answer = ""
+    async for chunk in llm.astream(messages):
+        if chunk.content:
+            answer += chunk.content
+            yield {"type": "token", "text": chunk.content}
+
+    cache_store(query, query_vector, {"result": answer, "source_documents": docs}, generation)
+
+
+async def atext_to_speech(text: str) -> str:
+    """Async version of text_to_speech (runs on the TTS thread pool)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(tts_executor, text_to_speech, text)
+
+
+async def asynthesize_speech(text: str) -> bytes:
+    """Async version of synthesize_speech (runs on the TTS thread pool)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(tts_executor, synthesize_speech, text)
+
+
+async def astream_speech_response(query: str):
+    """
+    Answer a question as a stream of audio, one sentence at a time
+
+    Each sentence is sent to TTS as soon as the LLM finishes it, so the
+    first audio arrives after the first sentence instead of the full answer.
+
+    Args:
+        query: User question
+
+    Yields:
+        Audio bytes per sentence (format: get_tts_backend().media_type; WAV
+        backends give one header and then raw PCM, so the stream is one file)
+    """
+    async def tokens():
+        async for event in astream_response(query):
+            if event["type"] == "token":
+                yield event["text"]
+
+    audio = stream_speech(split_sentences(tokens()), tts_executor)
+    if get_tts_backend().media_type == "audio/wav":
+        audio = join_wav_stream(audio)
+    async for piece in audio:
+        yield piece
+
+
+# ============== STARTUP ==============
+
+# Backends the API server loads at startup ("rag", "stt", "tts", comma-separated);
+# the others load on their first request. A local STT model is warmed by default
+# (loading it takes seconds); WARMUP=rag keeps a text-only worker free of audio libraries
+STT_IS_LOCAL = os.getenv("STT_BACKEND", "google") != "google"
+WARMUP = os.getenv("WARMUP", "rag,stt" if STT_IS_LOCAL else "rag")
+
+
+def warm_up(backends: str = None) -> dict:
+    """
+    Import and initialize backends now instead of on their first request
+
+    Args:
+        backends: Comma-separated "rag", "stt", "tts" (default: WARMUP)
+
+    Returns:
+        Seconds each backend took
+    """
+    loaders = {
+        "rag": ensure_rag,
+        "stt": get_stt_backend,             # speech_recognition (+ local model)
+        "tts": lambda: get_tts_backend().warmup(),
+    }
+    timings = {}
+    for name in filter(None, (part.strip() for part in (WARMUP if backends is None else backends).split(","))):
+        start = time.perf_counter()
+        loaders[name]()
+        timings[name] = round(time.perf_counter() - start, 3)
+    return timings
+
+
 # ============== FULL PIPELINE ==============
 
 def voice_assistant():
@@ -193,8 +952,8 @@ def voice_assistant():
         # Ask user to speak
         input("\nPress ENTER when ready to speak, then ask your question...")
 
-        # Step 1: STT - Listen and transcribe
-        user_text = record_and_transcribe(duration=20)
+        # Step 1: STT - Listen until a pause and transcribe
+        user_text = listen_and_transcribe()
         print(f"You said: {user_text}")
 
         if user_text.startswith("["):  # Error message
@@ -0,0 +1,289 @@
+"""
+Voice Session - Full-duplex voice conversation over one WebSocket
+
+The client streams raw microphone audio (16-bit mono PCM, 16 kHz) up as
+binary messages. The server cuts it into utterances with the VAD, sends
+partial transcripts while the user is still talking, and as soon as the
+question is complete streams back answer tokens (JSON) and synthesized
+audio (binary, one message per sentence).
+
+Every stage starts as soon as its input is ready:
+    - STT is fed frame by frame while the user speaks
+    - the answer starts streaming the moment the transcript is final
+    - each sentence goes to TTS as soon as the LLM finishes it
+The socket keeps receiving audio while an answer plays, so the user can
+interrupt (barge in): new speech cancels the answer in progress.
+
+Client -> server:
+    binary                          PCM audio, any chunk size
+    {"type": "start", "sample_rate": 16000}   optional, before the audio
+                                    (8000-48000 Hz, anything else closes the socket)
+    {"type": "end"}                 question is finished (push-to-talk)
+
+Server -> client:
+    {"type": "ready", "sample_rate": ..., "audio_media_type": ...}
+    {"type": "speech_start"}
+    {"type": "partial_transcript", "text": ...}   local STT backends only
+    {"type": "transcript", "text": ..., "timings": {...}}
+    {"type": "sources", ...} / {"type": "token", ...}   as in /ws/ask
+    {"type": "audio", "index": n, "bytes": ..., "timings": {...}}
+        followed by one binary message with that sentence's audio
+    {"type": "done", "answer": ..., "timings": {...}}
+    {"type": "interrupted"} / {"type": "error", "detail": ...}
+"""
+
+import asyncio
+import json
+import os
+import time
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from stt import get_stt_backend
+from tts import get_tts_backend, split_sentences, stream_speech
+from vad_capture import NoiseProfile, EnergyVAD, UtteranceDetector
+from voice_assistant import (
+    astream_response,
+    stt_executor,
+    tts_executor,
+    FRAME_MS,
+    TRAILING_SILENCE_MS,
+)
+
+
+# How often to send a partial transcript while the user is talking
+PARTIAL_INTERVAL_MS = int(os.getenv("VOICE_PARTIAL_INTERVAL_MS", "1000"))
+# Longest single utterance
+MAX_UTTERANCE_SECONDS = 30
+# Sample rates a client may ask for in its "start" message
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+
+def elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def parse_sample_rate(value):
+    """Client's sample rate as an int, or None if it isn't one we can frame"""
+    try:
+        sample_rate = int(value)
+    except (TypeError, ValueError):
+        return None
+    return sample_rate if MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE else None
+
+
+class VoiceSession:
+    """
+    One connected client
+
+    Usage (inside a FastAPI websocket endpoint):
+        await VoiceSession(websocket).run()
+    """
+
+    def __init__(self, websocket: WebSocket, sample_rate: int = 16000):
+        self.websocket = websocket
+        self.sample_rate = sample_rate
+        self.stt = None                     # loaded in run(), off the event loop
+        self._send_lock = asyncio.Lock()    # answer task and receive loop both send
+        self._answer_task = None
+        self._partial_task = None
+
+    def _configure(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.frame_bytes = sample_rate * FRAME_MS // 1000 * 2
+        # on_audio() slices frames of this size: zero would loop forever on the event loop
+        assert self.frame_bytes > 0, f"sample rate {sample_rate} gives empty frames"
+        # Each session learns its own noise floor from the silent frames
+        self.vad = EnergyVAD(NoiseProfile(), frame_ms=FRAME_MS, trailing_silence_ms=TRAILING_SILENCE_MS)
+        self.detector = UtteranceDetector(self.vad, max_seconds=MAX_UTTERANCE_SECONDS)
+        self._buffer = b""
+        self._new_utterance()
+
+    def _new_utterance(self):
+        self.detector.reset()
+        self.stt_stream = self.stt.start_stream(self.sample_rate)
+        self._speech_frames = 0
+        self._frames_at_last_partial = 0
+
+    # ----- sending -----
+
+    async def send_json(self, message: dict):
+        async with self._send_lock:
+            await self.websocket.send_json(message)
+
+    async def send_audio(self, header: dict, audio: bytes):
+        # Header and audio go out back to back, nothing can slip in between
+        async with self._send_lock:
+            await self.websocket.send_json(header)
+            await self.websocket.send_bytes(audio)
+
+    # ----- main loop -----
+
+    async def run(self):
+        await self.websocket.accept()
+        # The first call loads the model (slow): keep it off the event loop
+        self.stt = await asyncio.to_thread(get_stt_backend)
+        tts = await asyncio.to_thread(get_tts_backend)
+        self._configure(self.sample_rate)
+        await self.send_json({
+            "type": "ready",
+            "sample_rate": self.sample_rate,
+            "frame_ms": FRAME_MS,
+            "audio_media_type": tts.media_type,
+        })
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    await self.on_audio(message["bytes"])
+                elif message.get("text"):
+                    try:
+                        control = json.loads(message["text"])
+                    except json.JSONDecodeError:
+                        control = None
+                    if not isinstance(control, dict):
+                        await self.send_json({"type": "error", "detail": "Control messages must be JSON objects"})
+                        continue
+                    if not await self.on_control(control):
+                        await self.websocket.close(code=1008)
+                        break
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in (self._answer_task, self._partial_task):
+                if task is not None:
+                    task.cancel()
+
+    async def on_control(self, message: dict) -> bool:
+        """Handle a JSON control message, False if the session has to be closed"""
+        if message.get("type") == "start":
+            sample_rate = parse_sample_rate(message.get("sample_rate", self.sample_rate))
+            if sample_rate is None:
+                await self.send_json({
+                    "type": "error",
+                    "detail": f"sample_rate must be an integer from {MIN_SAMPLE_RATE} to {MAX_SAMPLE_RATE}",
+                })
+                return False
+            self._configure(sample_rate)
+        elif message.get("type") == "end" and self._speech_frames:
+            await self.end_utterance()
+        return True
+
+    async def on_audio(self, data: bytes):
+        """Split incoming audio into VAD frames and feed the current utterance"""
+        self._buffer += data
+        while len(self._buffer) >= self.frame_bytes:
+            frame = self._buffer[:self.frame_bytes]
+            self._buffer = self._buffer[self.frame_bytes:]
+
+            was_started = self.detector.started
+            for utterance_frame in self.detector.push(frame):
+                self.stt_stream.feed(utterance_frame)
+                self._speech_frames += 1
+
+            if self.detector.started and not was_started:
+                await self.on_speech_start()
+            if self.detector.ended:
+                await self.end_utterance()
+            elif self.detector.started:
+                self.maybe_send_partial()
+
+    async def on_speech_start(self):
+        # Barge-in: the user talking over the answer cancels it
+        if self._answer_task is not None and not self._answer_task.done():
+            self._answer_task.cancel()
+            await self.send_json({"type": "interrupted"})
+        await self.send_json({"type": "speech_start"})
+
+    # ----- STT -----
+
+    def maybe_send_partial(self):
+        """Start a partial transcription if enough new audio came in (one at a time)"""
+        new_ms = (self._speech_frames - self._frames_at_last_partial) * FRAME_MS
+        if new_ms < PARTIAL_INTERVAL_MS:
+            return
+        if self._partial_task is not None and not self._partial_task.done():
+            return
+        self._frames_at_last_partial = self._speech_frames
+        self._partial_task = asyncio.create_task(self._send_partial(self.stt_stream))
+
+    async def _send_partial(self, stt_stream):
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(stt_executor, stt_stream.partial)
+        # None: the backend can't do partials; also drop results for a finished utterance
+        if text and stt_stream is self.stt_stream:
+            await self.send_json({"type": "partial_transcript", "text": text})
+
+    async def end_utterance(self):
+        """Final transcript for the utterance, then start answering it"""
+        import speech_recognition as sr
+
+        stt_stream = self.stt_stream
+        speech_ms = self._speech_frames * FRAME_MS
+        self._new_utterance()
+
+        end_of_speech = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            text = await loop.run_in_executor(stt_executor, stt_stream.finish)
+        except sr.UnknownValueError:
+            await self.send_json({"type": "error", "detail": "Could not understand audio"})
+            return
+        except sr.RequestError as e:
+            await self.send_json({"type": "error", "detail": f"STT error: {e}"})
+            return
+
+        await self.send_json({
+            "type": "transcript",
+            "text": text,
+            "timings": {"speech_ms": speech_ms, "stt_ms": elapsed_ms(end_of_speech)},
+        })
+        self._answer_task = asyncio.create_task(self.answer(text, end_of_speech))
+
+    # ----- RAG + TTS -----
+
+    async def answer(self, question: str, end_of_speech: float):
+        """
+        Stream tokens and per-sentence audio for one question
+
+        Timings are milliseconds since the transcript was ready
+        (end_to_first_audio_ms counts from the end of speech).
+        """
+        start = time.perf_counter()
+        timings = {}
+        answer = ""
+
+        async def tokens():
+            nonlocal answer
+            async for event in astream_response(question):
+                if event["type"] == "sources":
+                    timings["retrieval_ms"] = elapsed_ms(start)
+                    await self.send_json(event)
+                elif event["type"] == "token":
+                    timings.setdefault("first_token_ms", elapsed_ms(start))
+                    answer += event["text"]
+                    await self.send_json(event)
+                    yield event["text"]
+            timings["llm_ms"] = elapsed_ms(start)
+
+        try:
+            index = 0
+            async for audio in stream_speech(split_sentences(tokens()), tts_executor):
+                if index == 0:
+                    timings["first_audio_ms"] = elapsed_ms(start)
+                    timings["end_to_first_audio_ms"] = elapsed_ms(end_of_speech)
+                await self.send_audio(
+                    {"type": "audio", "index": index, "bytes": len(audio),
+                     "timings": {"audio_ms": elapsed_ms(start)}},
+                    audio
+                )
+                index += 1
+            timings["total_ms"] = elapsed_ms(start)
+            await self.send_json({"type": "done", "answer": answer, "timings": timings})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.send_json({"type": "error", "detail": f"Answer failed: {e}"})